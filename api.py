@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import sys
+import threading
+from datetime import date, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit, unquote
+
+import pandas as pd
+
+from database import (read_sql, read_sql_escritorios, escritorios, banco_do_codigo, versao_escritorios, ensure_schema,
+                      load_parcelas, load_resumo_mensal, buscar_clientes)
+from formatacao import numero_mes
+from instrumentacao import medir
+
+# API HTTP local (somente leitura) para integrações: planilhas de contabilidade, lembretes por
+# WhatsApp etc. Usa o mesmo pool de conexões e as mesmas funções de leitura do aplicativo.
+# A senha do e-GOV nunca sai por aqui.
+
+API_HOST = '127.0.0.1'
+API_PORT = 8502
+
+POR_PAGINA_PADRAO = 100
+POR_PAGINA_MAX = 1000
+
+# Colunas de clientes expostas pela API (senha_egov fica de fora)
+COLUNAS_CLIENTE = 'codigo, nome, contato, cpf, tipo_acao, valor_honorarios, resumo_caso, data_cadastro'
+COLUNAS_PARCELA = 'codigo_cliente, numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago'
+
+SQL_API_CLIENTES = f'SELECT {COLUNAS_CLIENTE} FROM clientes ORDER BY codigo LIMIT ? OFFSET ?'
+SQL_API_CLIENTES_TOTAL = 'SELECT COUNT(*) AS total FROM clientes'
+SQL_API_CLIENTE = f'SELECT {COLUNAS_CLIENTE} FROM clientes WHERE codigo = ?'
+SQL_API_PARCELAS = f'''
+    SELECT {COLUNAS_PARCELA} FROM parcelas
+    WHERE (? IS NULL OR pago = ?)
+    ORDER BY codigo_cliente, numero_parcela LIMIT ? OFFSET ?
+    '''
+SQL_API_PARCELAS_TOTAL = 'SELECT COUNT(*) AS total FROM parcelas WHERE (? IS NULL OR pago = ?)'
+SQL_API_VENCIDAS = '''
+    SELECT p.codigo_cliente, c.nome, c.contato, p.numero_parcela, p.valor_parcela, p.data_pagamento
+    FROM parcelas p
+    JOIN clientes c ON p.codigo_cliente = c.codigo
+    WHERE p.pago = 0 AND p.data_pagamento <= ?
+    ORDER BY p.data_pagamento, p.codigo_cliente, p.numero_parcela
+    LIMIT ? OFFSET ?
+    '''
+SQL_API_VENCIDAS_TOTAL = 'SELECT COUNT(*) AS total FROM parcelas WHERE pago = 0 AND data_pagamento <= ?'
+
+# Muda a cada início do processo, para que uma ETag antiga nunca coincida com dados novos
+# depois que os contadores de versão recomeçarem do zero
+_instancia = os.urandom(8).hex()
+
+
+class ErroApi(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+# Parâmetros de paginação: ?pagina=1&por_pagina=100
+def paginacao(params):
+    try:
+        pagina = int(params.get('pagina', 1))
+        por_pagina = int(params.get('por_pagina', POR_PAGINA_PADRAO))
+    except ValueError:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, 'pagina e por_pagina devem ser números inteiros')
+    if pagina < 1 or not 1 <= por_pagina <= POR_PAGINA_MAX:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, f'pagina >= 1 e por_pagina entre 1 e {POR_PAGINA_MAX}')
+    return pagina, por_pagina
+
+def parametro_pago(params):
+    valor = params.get('pago')
+    if valor is None:
+        return None
+    if valor not in ('0', '1'):
+        raise ErroApi(HTTPStatus.BAD_REQUEST, 'pago deve ser 0 ou 1')
+    return int(valor)
+
+def parametro_data(params, nome, padrao):
+    valor = params.get(nome)
+    if valor is None:
+        return padrao
+    try:
+        return date.fromisoformat(valor)
+    except ValueError:
+        raise ErroApi(HTTPStatus.BAD_REQUEST, f'{nome} deve estar no formato AAAA-MM-DD')
+
+# Converte um DataFrame em lista de dicionários prontos para JSON (NaN vira null)
+def registros(df):
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict('records')
+
+def pagina_json(df, total, pagina, por_pagina):
+    return {
+        'dados': registros(df),
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'total': int(total),
+        'paginas': max(1, math.ceil(total / por_pagina)),
+    }
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, date, pd.Timestamp)):
+        return valor.isoformat()
+    if hasattr(valor, 'item'):
+        return valor.item()
+    raise TypeError(f'{type(valor).__name__} não é serializável em JSON')
+
+
+# Página de uma listagem de todos os escritórios. A consulta termina em LIMIT ? OFFSET ?; com mais
+# de um escritório, cada um devolve suas linhas até o fim da página pedida e a página sai da
+# junção delas, reordenada por `ordem` (como em buscar_clientes)
+def pagina_escritorios(query, params, ordem, pagina, por_pagina):
+    inicio = (pagina - 1) * por_pagina
+    if len(escritorios()) == 1:
+        return read_sql(query, params + (por_pagina, inicio))
+    df = read_sql_escritorios(query, params + (inicio + por_pagina, 0), ordem=ordem)
+    return df.iloc[inicio:inicio + por_pagina].reset_index(drop=True)
+
+def total_escritorios(query, params=()):
+    return read_sql_escritorios(query, params)['total'].sum()
+
+# Dados de um cliente, lidos no banco do escritório dono do código
+def carregar_cliente(codigo):
+    try:
+        banco = banco_do_codigo(codigo)
+    except ValueError:
+        raise ErroApi(HTTPStatus.NOT_FOUND, f'cliente {codigo} não encontrado')
+    df = read_sql(SQL_API_CLIENTE, (codigo,), banco)
+    if df.empty:
+        raise ErroApi(HTTPStatus.NOT_FOUND, f'cliente {codigo} não encontrado')
+    return df
+
+
+# Rotas: cada uma recebe (partes do caminho, parâmetros) e devolve o objeto JSON
+
+def rota_clientes(partes, params):
+    pagina, por_pagina = paginacao(params)
+    busca = params.get('busca')
+    if busca:
+        df, total = buscar_clientes(busca, pagina, por_pagina)
+    else:
+        total = total_escritorios(SQL_API_CLIENTES_TOTAL)
+        df = pagina_escritorios(SQL_API_CLIENTES, (), 'codigo', pagina, por_pagina)
+    return pagina_json(df, total, pagina, por_pagina)
+
+def rota_cliente(partes, params):
+    codigo = partes[1]
+    cliente = registros(carregar_cliente(codigo))[0]
+    cliente['parcelas'] = registros(load_parcelas(codigo))
+    return cliente
+
+def rota_parcelas_cliente(partes, params):
+    codigo = partes[1]
+    carregar_cliente(codigo)
+    return {'dados': registros(load_parcelas(codigo))}
+
+def rota_parcelas(partes, params):
+    pagina, por_pagina = paginacao(params)
+    pago = parametro_pago(params)
+    total = total_escritorios(SQL_API_PARCELAS_TOTAL, (pago, pago))
+    df = pagina_escritorios(SQL_API_PARCELAS, (pago, pago), ['codigo_cliente', 'numero_parcela'], pagina, por_pagina)
+    return pagina_json(df, total, pagina, por_pagina)
+
+def rota_vencidas(partes, params):
+    pagina, por_pagina = paginacao(params)
+    ate = parametro_data(params, 'ate', date.today()).strftime('%Y-%m-%d')
+    total = total_escritorios(SQL_API_VENCIDAS_TOTAL, (ate,))
+    df = pagina_escritorios(SQL_API_VENCIDAS, (ate,), ['data_pagamento', 'codigo_cliente', 'numero_parcela'], pagina, por_pagina)
+    resposta = pagina_json(df, total, pagina, por_pagina)
+    resposta['ate'] = ate
+    return resposta
+
+def rota_resumo_mensal(partes, params):
+    pago = parametro_pago(params)
+    resumos = []
+    for situacao in ((pago,) if pago is not None else (1, 0)):
+        df = load_resumo_mensal(bool(situacao)).rename(columns={'mes': 'mes_nome', 'valor_parcela': 'total'})
+        df.insert(0, 'pago', bool(situacao))
+        df.insert(1, 'mes', df['mes_nome'].map(numero_mes))
+        resumos.extend(registros(df))
+    return {'dados': resumos}
+
+def rota_saude(partes, params):
+    return {'status': 'ok'}
+
+# (quantidade de partes do caminho, primeira parte, última parte) -> rota
+ROTAS = {
+    (1, 'clientes', 'clientes'): rota_clientes,
+    (2, 'clientes', None): rota_cliente,
+    (3, 'clientes', 'parcelas'): rota_parcelas_cliente,
+    (1, 'parcelas', 'parcelas'): rota_parcelas,
+    (1, 'vencidas', 'vencidas'): rota_vencidas,
+    (1, 'resumo-mensal', 'resumo-mensal'): rota_resumo_mensal,
+    (1, 'saude', 'saude'): rota_saude,
+}
+
+def encontrar_rota(partes):
+    if not partes:
+        return None
+    return ROTAS.get((len(partes), partes[0], partes[-1])) or ROTAS.get((len(partes), partes[0], None))
+
+# ETag fraca: versão dos dados do banco + endereço pedido + data de hoje (as vencidas mudam à
+# meia-noite). Com a mesma versão, a resposta é a mesma, então um If-None-Match igual é
+# respondido com 304 sem consultar nada.
+def etag(caminho):
+    versao = versao_escritorios()
+    chave = f'{_instancia}:{versao}:{date.today()}:{caminho}'
+    return 'W/"' + hashlib.sha1(chave.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = 'HonorariosAPI/1.0'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        partes = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        params = {chave: valores[-1] for chave, valores in parse_qs(url.query).items()}
+        with medir(f'GET {url.path}', 'api', self.path):
+            rota = encontrar_rota(partes)
+            if rota is None:
+                return self.responder(HTTPStatus.NOT_FOUND, {'erro': 'rota não encontrada'})
+            tag = etag(self.path)
+            if tag in [t.strip() for t in self.headers.get('If-None-Match', '').split(',')]:
+                return self.responder(HTTPStatus.NOT_MODIFIED, None, tag)
+            try:
+                corpo = rota(partes, params)
+            except ErroApi as exc:
+                return self.responder(exc.status, {'erro': exc.mensagem})
+            self.responder(HTTPStatus.OK, corpo, tag)
+
+    def responder(self, status, corpo, tag=None):
+        dados = b'' if corpo is None else json.dumps(corpo, ensure_ascii=False, default=_json_default).encode('utf-8')
+        self.send_response(status)
+        if tag:
+            self.send_header('ETag', tag)
+            self.send_header('Cache-Control', 'no-cache')
+        if corpo is not None:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        if dados:
+            self.wfile.write(dados)
+
+    # Sem uma linha no console para cada requisição; as lentas vão para o log de operações lentas
+    def log_message(self, format, *args):
+        pass
+
+
+def criar_servidor(host=API_HOST, port=API_PORT):
+    ensure_schema()
+    servidor = ThreadingHTTPServer((host, port), ApiHandler)
+    servidor.daemon_threads = True
+    return servidor
+
+# Inicia a API numa thread em segundo plano (usado pelo launcher.py) e devolve o servidor
+def iniciar_em_segundo_plano(host=API_HOST, port=API_PORT):
+    servidor = criar_servidor(host, port)
+    threading.Thread(target=servidor.serve_forever, name='api-http', daemon=True).start()
+    return servidor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='API HTTP local, somente leitura, com os dados do controle de honorários.')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--porta', type=int, default=API_PORT)
+    args = parser.parse_args(argv)
+
+    servidor = criar_servidor(args.host, args.porta)
+    print(f'API em http://{args.host}:{args.porta}/ (Ctrl+C para encerrar)')
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
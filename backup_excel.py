@@ -0,0 +1,99 @@
+import atexit
+import queue
+import threading
+import time
+from datetime import datetime
+
+# Espera este tempo sem novas alterações antes de exportar (agrupa rajadas de gravações)
+DEBOUNCE_SECONDS = 2.0
+
+# Nunca deixa o backup mais velho que isto enquanto houver alterações chegando
+MAX_STALENESS_SECONDS = 30.0
+
+
+# Thread em segundo plano que exporta o backup Excel depois das alterações no banco.
+# As funções de gravação só avisam que algo mudou e retornam logo após o commit;
+# várias alterações seguidas viram uma única exportação.
+class ExcelBackupWriter:
+    def __init__(self, export, debounce=DEBOUNCE_SECONDS, max_staleness=MAX_STALENESS_SECONDS):
+        self.export = export
+        self.debounce = debounce
+        self.max_staleness = max_staleness
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._thread = None
+        self._pending = 0
+        self._running = False
+        self._last_backup = None
+        self._last_error = None
+
+    # Registra uma alteração a ser incluída no próximo backup
+    def request(self):
+        with self._lock:
+            self._pending += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='excel-backup', daemon=True)
+                self._thread.start()
+        self._queue.put(None)
+
+    def _wait_for_quiet(self):
+        self._queue.get()  # Bloqueia até a primeira alteração
+        first = last = time.monotonic()
+        while True:
+            timeout = min(last + self.debounce, first + self.max_staleness) - time.monotonic()
+            if timeout <= 0:
+                return
+            try:
+                self._queue.get(timeout=timeout)
+                last = time.monotonic()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while True:
+            self._wait_for_quiet()
+            self._flush()
+
+    def _flush(self):
+        with self._export_lock:
+            self._export_pending()
+
+    def _export_pending(self):
+        with self._lock:
+            exported = self._pending
+            if not exported:
+                return
+            self._running = True
+        try:
+            self.export()
+        except Exception as exc:
+            with self._lock:
+                self._last_error = f'{datetime.now():%d/%m/%Y %H:%M:%S} {exc}'
+            # Tenta de novo na próxima janela, mantendo as alterações pendentes
+            self._queue.put(None)
+        else:
+            with self._lock:
+                self._pending -= exported
+                self._last_backup = datetime.now()
+                self._last_error = None
+        finally:
+            with self._lock:
+                self._running = False
+
+    # Exporta imediatamente o que estiver pendente (usado ao encerrar o processo)
+    def flush(self):
+        self._flush()
+
+    def status(self):
+        with self._lock:
+            return {
+                'last_backup': self._last_backup,
+                'pending': self._pending,
+                'running': self._running,
+                'last_error': self._last_error,
+            }
+
+    def register_atexit(self):
+        atexit.register(self.flush)
+        return self
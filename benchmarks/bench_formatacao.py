@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from formatacao import formatar_valor, formatar_valores, formatar_datas, nomes_meses
+
+
+# Compara a formatação linha a linha (.apply) com a vetorizada sobre `linhas` valores sintéticos
+def medir(nome, func, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append(time.perf_counter() - inicio)
+    return nome, min(tempos), resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmark da formatação de valores, datas e meses.')
+    parser.add_argument('--linhas', type=int, default=1_000_000)
+    parser.add_argument('--repeticoes', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(42)
+    valores = pd.Series(np.round(rng.uniform(0, 50_000, args.linhas), 2))
+    datas = pd.Series(pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 3650, args.linhas), unit='D'))
+    meses = pd.Series(rng.integers(1, 13, args.linhas))
+
+    comparacoes = [
+        (medir('valores .apply(formatar_valor)', lambda: valores.apply(formatar_valor), args.repeticoes),
+         medir('formatar_valores', lambda: formatar_valores(valores), args.repeticoes)),
+        (medir("datas .apply(strftime)", lambda: datas.apply(lambda x: x.strftime('%d/%m/%Y')), args.repeticoes),
+         medir('formatar_datas', lambda: formatar_datas(datas), args.repeticoes)),
+        (medir("meses .apply(strptime/strftime '%B')",
+               lambda: meses.apply(lambda x: datetime.strptime(str(x), '%m').strftime('%B')), args.repeticoes),
+         medir('nomes_meses', lambda: nomes_meses(meses), args.repeticoes)),
+    ]
+
+    print(f'{args.linhas:,} linhas, melhor de {args.repeticoes}')
+    for (nome_antigo, antigo, _), (nome_novo, novo, _) in comparacoes:
+        print(f'{nome_antigo:<40} {antigo:8.3f}s')
+        print(f'{nome_novo:<40} {novo:8.3f}s  ({antigo / novo:.1f}x)')
+
+    # O resultado vetorizado é o mesmo da formatação linha a linha
+    assert (comparacoes[0][0][2] == comparacoes[0][1][2]).all()
+    assert (comparacoes[1][0][2] == comparacoes[1][1][2]).all()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import database
+from database import load_data, load_lista_clientes, load_cliente, query_cache
+from dados_sinteticos import gerar_banco
+
+
+# Memória de uma sessão na CONSULTA DE CLIENTES: o DataFrame que cada rerun recebe (o cache
+# entrega uma cópia) e o pico alocado para montá-lo a partir do banco
+def medir_sessao(nome, carregar):
+    query_cache.clear()
+    tracemalloc.start()
+    try:
+        dfs = carregar()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    retido = sum(int(df.memory_usage(deep=True).sum()) for df in dfs)
+    return nome, retido, pico
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Memória da listagem de clientes por sessão: SELECT * antigo x listagem enxuta.')
+    parser.add_argument('--banco', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clientes_sintetico.db'))
+    parser.add_argument('--clientes', type=int, default=50_000, help='clientes gerados se o banco não existir')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.banco):
+        print(f'Gerando {args.clientes} clientes em {args.banco}...', flush=True)
+        gerar_banco(args.banco, args.clientes)
+    database.DB_PATH = args.banco
+    database.ensure_schema()
+
+    codigo = database.read_sql('SELECT codigo FROM clientes LIMIT 1')['codigo'].iloc[0]
+    antes = medir_sessao('antes: load_data() (SELECT *)', lambda: [load_data()])
+    depois = medir_sessao('depois: listagem + 1 cliente', lambda: [load_lista_clientes(), load_cliente(codigo)])
+
+    print(f"{'':<32} {'RETIDO POR RERUN':>18} {'PICO AO CARREGAR':>18}")
+    for nome, retido, pico in (antes, depois):
+        print(f'{nome:<32} {retido / 1024 / 1024:15.1f} MB {pico / 1024 / 1024:15.1f} MB')
+    print(f'{"redução":<32} {antes[1] / depois[1]:16.1f}x {antes[2] / depois[2]:16.1f}x')
+    print('dtypes da listagem:', ', '.join(f'{c}={t}' for c, t in load_lista_clientes().dtypes.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
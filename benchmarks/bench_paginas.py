@@ -0,0 +1,258 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import database
+import relatorio_pdf
+import tarefas
+from database import (load_data, load_lista_clientes, load_cliente, load_parcelas, load_all_parcelas_with_client_details,
+                      load_parcelas_pagas_agrupadas, load_parcelas_nao_pagas_agrupadas,
+                      buscar_clientes, save_to_excel, query_cache)
+from formatacao import formatar_valores, formatar_datas
+from previsao import relatorio_previsao
+from dados_sinteticos import gerar_banco
+
+# Cenários cronometrados: nome -> (função, pesado). Os pesados (exportação e leitura do Excel
+# inteiro) rodam menos vezes, ver --repeticoes-pesados.
+CENARIOS = {}
+
+def cenario(nome, pesado=False):
+    def registrar(func):
+        CENARIOS[nome] = (func, pesado)
+        return func
+    return registrar
+
+
+# Estado compartilhado pelos cenários: banco, códigos de cliente sorteados e arquivos temporários
+class Contexto:
+    def __init__(self, banco, semente, pasta):
+        self.banco = banco
+        self.rng = random.Random(semente)
+        self.pasta = pasta
+        self.codigos = database.read_sql('SELECT codigo FROM clientes')['codigo'].tolist()
+        self.excel = os.path.join(pasta, 'backup_benchmark.xlsx')
+        self.hoje = date(2025, 1, 1)
+        # Relatórios pré-calculados num arquivo temporário, já calculados uma vez (como o agendador faz)
+        tarefas.RELATORIOS_PATH = os.path.join(pasta, 'relatorios_prontos.db')
+        for nome in tarefas.TAREFAS:
+            tarefas.executar_tarefa(nome)
+
+    def cliente_qualquer(self):
+        return self.rng.choice(self.codigos)
+
+
+@cenario('load_data')
+def bench_load_data(ctx):
+    load_data()
+
+@cenario('load_lista_clientes')
+def bench_load_lista_clientes(ctx):
+    load_lista_clientes()
+
+@cenario('load_parcelas')
+def bench_load_parcelas(ctx):
+    load_parcelas(ctx.cliente_qualquer())
+
+@cenario('load_all_parcelas_with_client_details')
+def bench_load_all_parcelas_with_client_details(ctx):
+    load_all_parcelas_with_client_details()
+
+@cenario('save_to_excel', pesado=True)
+def bench_save_to_excel(ctx):
+    save_to_excel(ctx.excel)
+
+@cenario('ler_backup_excel', pesado=True)
+def bench_ler_backup_excel(ctx):
+    if not os.path.exists(ctx.excel):
+        save_to_excel(ctx.excel)
+    pd.read_excel(ctx.excel, sheet_name=None, engine='openpyxl')
+
+@cenario('generate_pdf')
+def bench_generate_pdf(ctx):
+    codigo = ctx.cliente_qualquer()
+    cliente_info = load_cliente(codigo).iloc[0]
+    generate_pdf_sem_cache(cliente_info, load_parcelas(codigo))
+
+def generate_pdf_sem_cache(cliente_info, parcelas):
+    relatorio_pdf._cache.clear()
+    return relatorio_pdf.generate_pdf(cliente_info, parcelas)
+
+# Os cenários de página repetem o caminho de dados de cada página de controle_financeiro.py,
+# sem a parte de desenho do Streamlit. PARCELAS VENCIDAS e VALORES A RECEBER leem o resultado
+# pré-calculado (tarefas.resultado_pronto); o cálculo em si é medido nos cenários tarefa_*.
+
+@cenario('pagina_consulta')
+def bench_pagina_consulta(ctx):
+    load_lista_clientes()
+    buscar_clientes(ctx.rng.choice(['silva', 'maria sou', 'aposentadoria', 'joão santos']))
+
+@cenario('pagina_detalhe_financeiro')
+def bench_pagina_detalhe_financeiro(ctx):
+    codigo = ctx.cliente_qualquer()
+    load_cliente(codigo).iloc[0]
+    parcelas = load_parcelas(codigo)
+    pd.DataFrame({
+        'numero_parcela': parcelas['numero_parcela'],
+        'valor_parcela': parcelas['valor_parcela'].astype(float),
+        'pago': parcelas['pago'].fillna(False).astype(bool),
+        'data_pagamento': pd.to_datetime(parcelas['data_pagamento'], format='%Y-%m-%d').dt.date,
+        'conta_deposito': parcelas['conta_deposito'].fillna('').astype(str),
+    })
+
+@cenario('pagina_parcelas_vencidas')
+def bench_pagina_parcelas_vencidas(ctx):
+    parcelas_vencidas, _, _ = tarefas.resultado_pronto('parcelas_vencidas')
+    parcelas_vencidas['valor_parcela'].sum()
+    parcelas_vencidas['valor_parcela'] = formatar_valores(parcelas_vencidas['valor_parcela'])
+
+@cenario('pagina_parcelas_pagas')
+def bench_pagina_parcelas_pagas(ctx):
+    df_parcelas_pagas = load_parcelas_pagas_agrupadas()
+    df_parcelas_pagas['valor_parcela'] = formatar_valores(df_parcelas_pagas['valor_parcela'])
+
+@cenario('pagina_valores_a_receber')
+def bench_pagina_valores_a_receber(ctx):
+    df_agrupado = load_parcelas_nao_pagas_agrupadas()
+    df_agrupado['valor_parcela'].sum()
+    df_agrupado['valor_parcela'] = formatar_valores(df_agrupado['valor_parcela'])
+    df_detalhado, _, _ = tarefas.resultado_pronto('parcelas_a_receber')
+    df_detalhado = df_detalhado[['nome', 'valor_parcela', 'data_pagamento']]
+    df_detalhado['valor_parcela'] = formatar_valores(df_detalhado['valor_parcela'])
+    df_detalhado['data_pagamento'] = formatar_datas(df_detalhado['data_pagamento'])
+
+# Cálculo em segundo plano dos relatórios dessas páginas: consulta, compactação e gravação
+@cenario('tarefa_parcelas_vencidas')
+def bench_tarefa_parcelas_vencidas(ctx):
+    tarefas.executar_tarefa('parcelas_vencidas')
+
+@cenario('tarefa_parcelas_a_receber')
+def bench_tarefa_parcelas_a_receber(ctx):
+    tarefas.executar_tarefa('parcelas_a_receber')
+
+@cenario('pagina_previsao')
+def bench_pagina_previsao(ctx):
+    geral, por_cliente, projecao = relatorio_previsao(ctx.hoje)
+    por_cliente = por_cliente[por_cliente['EM ATRASO'] > 0]
+    por_cliente['EM ATRASO'] = formatar_valores(por_cliente['EM ATRASO'])
+
+
+# Cada execução começa com os caches vazios, para medir o caminho completo até o banco
+def executar(func, ctx):
+    query_cache.clear()
+    tarefas.cache_relatorios.clear()
+    inicio = time.perf_counter()
+    func(ctx)
+    return time.perf_counter() - inicio
+
+# Pico de memória alocada pelo Python (pandas/NumPy incluídos) numa execução extra do cenário.
+# Memória interna do SQLite não entra nesta conta.
+def medir_memoria(func, ctx):
+    query_cache.clear()
+    tarefas.cache_relatorios.clear()
+    tracemalloc.start()
+    try:
+        func(ctx)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def medir(func, ctx, repeticoes, pesado=False):
+    if not pesado:
+        executar(func, ctx)  # aquecimento: importações e páginas do banco no cache do sistema
+    tempos = [executar(func, ctx) for _ in range(repeticoes)]
+    p50, p95 = np.percentile(tempos, [50, 95])
+    return {
+        'repeticoes': repeticoes,
+        'p50_ms': round(p50 * 1000, 3),
+        'p95_ms': round(p95 * 1000, 3),
+        'min_ms': round(min(tempos) * 1000, 3),
+        'max_ms': round(max(tempos) * 1000, 3),
+        'pico_memoria_mb': round(medir_memoria(func, ctx) / 1024 / 1024, 2),
+    }
+
+def versao_git():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Mostra a variação do p50/p95 em relação a um resultado anterior
+def comparar(resultados, anterior):
+    print(f"\nComparação com {anterior['executado_em']} ({anterior.get('commit') or '?'}):")
+    for nome, atual in resultados.items():
+        antigo = anterior['cenarios'].get(nome)
+        if not antigo:
+            continue
+        variacoes = [f"{chave} {(atual[chave] / antigo[chave] - 1) * 100:+.0f}%" for chave in ('p50_ms', 'p95_ms') if antigo[chave]]
+        print(f"{nome:<40} {'  '.join(variacoes)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark do caminho de dados de cada página com um banco sintético.')
+    parser.add_argument('--banco', default=os.path.join(RAIZ, 'benchmarks', 'clientes_sintetico.db'),
+                        help='banco sintético; é gerado se não existir (ou com --gerar)')
+    parser.add_argument('--gerar', action='store_true', help='gera o banco de novo mesmo que já exista')
+    parser.add_argument('--clientes', type=int, default=50_000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--repeticoes-pesados', type=int, default=2)
+    parser.add_argument('--cenarios', nargs='*', choices=sorted(CENARIOS), help='roda só estes cenários')
+    parser.add_argument('--saida', help='arquivo JSON com os resultados (padrão: benchmarks/resultados/<data>.json)')
+    parser.add_argument('--comparar', help='JSON de uma execução anterior para comparar')
+    args = parser.parse_args(argv)
+
+    if args.gerar or not os.path.exists(args.banco):
+        print(f'Gerando {args.banco} ({args.clientes} clientes, semente {args.semente})...')
+        gerar_banco(args.banco, args.clientes, args.semente)
+    database.DB_PATH = args.banco
+    database.create_or_update_table()
+
+    totais = database.read_sql('SELECT (SELECT COUNT(*) FROM clientes) AS clientes, (SELECT COUNT(*) FROM parcelas) AS parcelas').iloc[0]
+    print(f"{totais['clientes']} clientes, {totais['parcelas']} parcelas", flush=True)
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        ctx = Contexto(args.banco, args.semente, pasta)
+        for nome in args.cenarios or CENARIOS:
+            func, pesado = CENARIOS[nome]
+            resultados[nome] = medir(func, ctx, args.repeticoes_pesados if pesado else args.repeticoes, pesado)
+            r = resultados[nome]
+            print(f"{nome:<40} p50 {r['p50_ms']:10.1f} ms   p95 {r['p95_ms']:10.1f} ms   pico {r['pico_memoria_mb']:8.1f} MB", flush=True)
+
+    saida = {
+        'executado_em': datetime.now().isoformat(timespec='seconds'),
+        'commit': versao_git(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'plataforma': platform.platform(),
+        'banco': {'clientes': int(totais['clientes']), 'parcelas': int(totais['parcelas']), 'semente': args.semente},
+        'cenarios': resultados,
+    }
+    caminho = args.saida or os.path.join(RAIZ, 'benchmarks', 'resultados', f"{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(saida, f, ensure_ascii=False, indent=2)
+    print(f'Resultados -> {caminho}')
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            comparar(resultados, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
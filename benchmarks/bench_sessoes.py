@@ -0,0 +1,357 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+import database
+from database import (add_cliente, add_parcelas, load_parcelas, update_parcelas, excel_backup, retry_on_lock,
+                      is_lock_error)
+from instrumentacao import iniciar_rerun
+from dados_sinteticos import gerar_banco
+from bench_paginas import CENARIOS, versao_git
+
+# Teste de carga: várias pessoas usando o aplicativo ao mesmo tempo sobre uma cópia do banco.
+# Cada sessão é uma thread que repete o caminho de dados das páginas (sem o desenho do
+# Streamlit), sorteando a operação pelo --mix. Com --processos > 1 as sessões se dividem entre
+# processos, como cópias do aplicativo abertas em máquinas diferentes sobre o mesmo arquivo.
+# No final, o banco é conferido: cadastros confirmados que sumiram ou foram gravados duas
+# vezes e edições de parcelas confirmadas que foram desfeitas por outra sessão.
+
+MIX_PADRAO = 'cadastro=1,parcela=3,relatorio=6'
+
+# Páginas sorteadas nas operações de relatório (cenários do bench_paginas.py)
+PAGINAS = ('pagina_consulta', 'pagina_detalhe_financeiro', 'pagina_parcelas_vencidas', 'pagina_parcelas_pagas',
+           'pagina_valores_a_receber', 'pagina_previsao')
+
+# Prefixo do nome dos clientes cadastrados pelo teste
+PREFIXO_NOME = 'CARGA'
+
+NOMES_EDICOES = {'baixa': 'baixa', 'valor': 'mudança de valor'}
+
+# Um BEGIN IMMEDIATE mais demorado que isto esperou outro escritor dentro do busy_timeout do
+# SQLite (sem bloqueio ele leva microssegundos)
+ESPERA_MINIMA_BEGIN = 0.002
+
+
+def ler_mix(texto):
+    mix = {}
+    for parte in texto.split(','):
+        nome, _, peso = parte.partition('=')
+        if nome.strip() not in OPERACOES:
+            raise argparse.ArgumentTypeError(f"Operação desconhecida: {nome.strip()}. Disponíveis: {', '.join(OPERACOES)}")
+        mix[nome.strip()] = float(peso or 1)
+    return mix
+
+
+# Estado de uma sessão simulada. Também serve de contexto para os cenários do bench_paginas.py.
+class Sessao:
+    def __init__(self, numero, total, execucao, semente, codigos, disputados, pausa):
+        self.numero = numero
+        self.total = total
+        self.execucao = execucao
+        self.rng = random.Random(semente * 1000 + numero)
+        self.codigos = codigos
+        self.disputados = disputados
+        self.pausa = pausa
+        self.hoje = date(2025, 1, 1)
+        self.contador = 0
+        self.registros = []    # (operação, início, duração, erro, espera no BEGIN IMMEDIATE)
+        self.cadastros = []    # (nome, código, parcelas) confirmados
+        self.edicoes = []      # (código, número da parcela, tipo, valor, lida em, confirmada em) confirmadas
+
+    def cliente_qualquer(self):
+        return self.rng.choice(self.codigos)
+
+    # Valor único em todo o teste, para reconhecer no banco qual edição ficou gravada
+    def marcador(self):
+        self.contador += 1
+        return round(1 + (self.contador * self.total + self.numero) / 100, 2)
+
+
+# Operações: nome -> função(sessao). Cada uma confirma (grava na sessão) só o que o aplicativo
+# teria mostrado como gravado ao usuário.
+OPERACOES = {}
+
+def operacao(nome):
+    def registrar(func):
+        OPERACOES[nome] = func
+        return func
+    return registrar
+
+
+# CADASTRO DE CLIENTE seguido do cálculo das parcelas no DETALHE FINANCEIRO
+@operacao('cadastro')
+def op_cadastro(sessao):
+    nome = f'{PREFIXO_NOME} {sessao.execucao} {sessao.numero}-{sessao.contador}'
+    sessao.contador += 1
+    numero_parcelas = sessao.rng.randint(1, 24)
+    codigo = add_cliente(None, nome, '(11) 99999-0000', '000.000.000-00', '', 'APOSENTADORIA', 6000.0,
+                         'TESTE DE CARGA', sessao.hoje)
+    add_parcelas(codigo, numero_parcelas, 6000.0 / numero_parcelas)
+    sessao.cadastros.append((nome, codigo, numero_parcelas))
+
+# Edição de uma parcela no DETALHE FINANCEIRO: a página carrega as parcelas, a pessoa altera uma
+# (dá baixa ou muda o valor) e salva a linha inteira como estava na tela. Os clientes vêm de um
+# grupo pequeno (--disputados) para que sessões diferentes editem o mesmo cliente.
+@operacao('parcela')
+def op_parcela(sessao):
+    codigo = sessao.rng.choice(sessao.disputados)
+    parcelas = load_parcelas(codigo)
+    lida_em = time.time()
+    if parcelas.empty:
+        return
+    em_aberto = parcelas[~parcelas['pago'].astype(bool)]
+    if not em_aberto.empty:
+        parcelas = em_aberto  # quem abre o detalhe quase sempre mexe numa parcela em aberto
+    linha = parcelas.iloc[sessao.rng.randrange(len(parcelas))]
+    time.sleep(sessao.rng.uniform(0, sessao.pausa))  # tempo da pessoa editando a tabela
+    valor, pago = float(linha['valor_parcela']), bool(linha['pago'])
+    if not pago and sessao.rng.random() < 0.5:
+        tipo, pago = 'baixa', True
+    else:
+        tipo, valor = 'valor', sessao.marcador()
+    update_parcelas(codigo, [(linha['numero_parcela'], valor, date.fromisoformat(linha['data_pagamento']),
+                              linha['tipo_pagamento'], linha['conta_deposito'], pago)])
+    sessao.edicoes.append((codigo, int(linha['numero_parcela']), tipo, valor, lida_em, time.time()))
+
+@operacao('relatorio')
+def op_relatorio(sessao):
+    CENARIOS[sessao.rng.choice(PAGINAS)][0](sessao)
+
+
+# Roda uma sessão até `fim` (time.time()), sorteando as operações pelo mix
+def rodar_sessao(sessao, mix, inicio, fim):
+    nomes, pesos = list(mix), list(mix.values())
+    time.sleep(max(0.0, inicio - time.time()))
+    while time.time() < fim:
+        nome = sessao.rng.choices(nomes, pesos)[0]
+        rerun = iniciar_rerun(nome)  # as medições do instrumentacao.py mostram as esperas no BEGIN
+        comeco = time.perf_counter()
+        erro = None
+        try:
+            OPERACOES[nome](sessao)
+        except sqlite3.OperationalError as exc:
+            erro = 'banco bloqueado' if is_lock_error(exc) else f'sqlite: {exc}'
+        except Exception as exc:
+            erro = f'{type(exc).__name__}: {exc}'
+        duracao = time.perf_counter() - comeco
+        espera = sum(span.duracao for span in rerun.spans
+                     if span.detalhe == 'BEGIN IMMEDIATE' and span.duracao >= ESPERA_MINIMA_BEGIN)
+        sessao.registros.append((nome, comeco, duracao, erro, espera))
+
+# Um processo do teste: roda as sessões `numeros` em threads e devolve o que cada uma registrou,
+# mais as esperas por bloqueio e o estado do backup Excel deste processo
+def rodar_processo(banco, pasta, numeros, total, execucao, semente, disputados, pausa, mix, inicio, fim):
+    database.DB_PATH = banco
+    os.chdir(pasta)  # backup_clientes.xlsx de todos os processos vai para a mesma pasta temporária
+    codigos = database.read_sql('SELECT codigo FROM clientes')['codigo'].tolist()
+    antes = retry_on_lock.stats()
+    sessoes = [Sessao(n, total, execucao, semente, codigos, disputados, pausa) for n in numeros]
+    threads = [threading.Thread(target=rodar_sessao, args=(s, mix, inicio, fim), name=f'sessao-{s.numero}') for s in sessoes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    excel_backup.flush()
+    depois = retry_on_lock.stats()
+    return {
+        'registros': [r for s in sessoes for r in s.registros],
+        'cadastros': [c for s in sessoes for c in s.cadastros],
+        'edicoes': [e for s in sessoes for e in s.edicoes],
+        'bloqueios': {chave: depois[chave] - antes[chave] for chave in depois},
+        'backup_excel': excel_backup.status()['last_error'],
+    }
+
+
+# Confere o banco depois do teste. Devolve {problema: [exemplos]}.
+def conferir(banco, execucao, cadastros, edicoes):
+    conn = sqlite3.connect(banco)
+    try:
+        gravados = pd.read_sql_query('SELECT c.nome, c.codigo, COUNT(p.numero_parcela) AS parcelas FROM clientes c '
+                                     'LEFT JOIN parcelas p ON p.codigo_cliente = c.codigo WHERE c.nome LIKE ? GROUP BY c.codigo',
+                                     conn, params=(f'{PREFIXO_NOME} {execucao} %',))
+        codigos = sorted({edicao[0] for edicao in edicoes})
+        finais = pd.read_sql_query(f"SELECT codigo_cliente, numero_parcela, valor_parcela, pago FROM parcelas "
+                                   f"WHERE codigo_cliente IN ({', '.join('?' * len(codigos))})", conn, params=codigos)
+    finally:
+        conn.close()
+
+    problemas = defaultdict(list)
+    por_nome = Counter(gravados['nome'])
+    parcelas_gravadas = dict(zip(gravados['nome'], gravados['parcelas']))
+    confirmados = set()
+    for nome, codigo, numero_parcelas in cadastros:
+        confirmados.add(nome)
+        if por_nome[nome] == 0:
+            problemas['cadastro perdido'].append(codigo)
+        elif parcelas_gravadas[nome] != numero_parcelas:
+            problemas['parcelas do cadastro diferentes'].append(f'{codigo}: {parcelas_gravadas[nome]} de {numero_parcelas}')
+    problemas['cadastro duplicado'] = [nome for nome, vezes in por_nome.items() if vezes > 1]
+    # Gravado sem ter sido confirmado: a operação falhou para o usuário, que vai cadastrar de novo
+    problemas['cadastro gravado sem confirmação'] = sorted(set(por_nome) - confirmados)
+
+    # Parcelas: uma baixa confirmada nunca pode voltar a "não paga" (o teste não desfaz baixas) e o
+    # valor final tem de ser o da última mudança de valor confirmada. Além do estado final, cada
+    # edição confirmada de outro tipo entre a leitura e a gravação de uma edição da mesma parcela
+    # foi sobrescrita pela cópia antiga da linha (mesmo que uma edição posterior a refaça).
+    # A ordem vem do horário em que cada leitura/gravação voltou para a sessão, então duas
+    # gravações quase simultâneas podem se inverter.
+    edicoes = sorted(edicoes, key=lambda edicao: edicao[5])
+    por_parcela = defaultdict(list)
+    for edicao in edicoes:
+        por_parcela[edicao[0], edicao[1]].append(edicao)
+    for (codigo, numero), deste in por_parcela.items():
+        for _, _, tipo, _, lida_em, confirmada_em in deste:
+            for _, _, outro_tipo, _, _, outra_confirmada_em in deste:
+                if outro_tipo != tipo and lida_em < outra_confirmada_em < confirmada_em:
+                    problemas[f'{NOMES_EDICOES[outro_tipo]} sobrescrita por cópia antiga'].append(f'{codigo}/{numero}')
+
+    finais = {(c, int(n)): (round(v, 2), bool(p)) for c, n, v, p in finais.itertuples(index=False)}
+    ultimo_valor = {}
+    for codigo, numero, tipo, valor, _, _ in edicoes:
+        valor_final, pago_final = finais.get((codigo, numero), (None, None))
+        if valor_final is None:
+            problemas['parcela editada sumiu'].append(f'{codigo}/{numero}')
+        elif tipo == 'baixa' and not pago_final:
+            problemas['baixa desfeita'].append(f'{codigo}/{numero}')
+        elif tipo == 'valor':
+            ultimo_valor[codigo, numero] = round(valor, 2)
+    for (codigo, numero), valor in ultimo_valor.items():
+        if finais[codigo, numero][0] != valor:
+            problemas['valor desfeito'].append(f'{codigo}/{numero}')
+    return {problema: exemplos for problema, exemplos in problemas.items() if exemplos}
+
+
+def percentis(duracoes):
+    p50, p95, p99 = np.percentile(duracoes, [50, 95, 99]) if duracoes else (0, 0, 0)
+    return {'p50_ms': round(p50 * 1000, 3), 'p95_ms': round(p95 * 1000, 3), 'p99_ms': round(p99 * 1000, 3),
+            'max_ms': round(max(duracoes, default=0) * 1000, 3)}
+
+def resumir(registros, segundos):
+    resumo = {}
+    for nome in sorted({r[0] for r in registros}) + ['total']:
+        deste = [r for r in registros if nome in ('total', r[0])]
+        erros = Counter(r[3] for r in deste if r[3])
+        resumo[nome] = {
+            'operacoes': len(deste),
+            'por_segundo': round(len(deste) / segundos, 2),
+            'erros': dict(erros),
+            'esperas_begin': sum(1 for r in deste if r[4]),
+            'segundos_espera_begin': round(sum(r[4] for r in deste), 3),
+            **percentis([r[2] for r in deste if not r[3]]),
+        }
+    return resumo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Teste de carga: várias sessões simultâneas sobre uma cópia do banco.')
+    parser.add_argument('--banco', default=os.path.join(RAIZ, 'benchmarks', 'clientes_sintetico.db'),
+                        help='banco de origem; o teste grava numa cópia (gerado se não existir)')
+    parser.add_argument('--clientes', type=int, default=50_000, help='clientes gerados se o banco não existir')
+    parser.add_argument('--sessoes', type=int, default=8, help='sessões simultâneas')
+    parser.add_argument('--processos', type=int, default=1, help='processos entre os quais as sessões se dividem')
+    parser.add_argument('--duracao', type=float, default=20, help='segundos de teste')
+    parser.add_argument('--mix', type=ler_mix, default=MIX_PADRAO, help=f'pesos das operações (padrão: {MIX_PADRAO})')
+    parser.add_argument('--disputados', type=int, default=20, help='clientes cujas parcelas as sessões editam')
+    parser.add_argument('--pausa', type=float, default=0.2, help='segundos (no máximo) entre abrir e salvar uma edição')
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help='arquivo JSON com os resultados')
+    args = parser.parse_args(argv)
+    mix = args.mix
+
+    if not os.path.exists(args.banco):
+        print(f'Gerando {args.clientes} clientes em {args.banco}...', flush=True)
+        gerar_banco(args.banco, args.clientes, args.semente)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = os.path.join(pasta, 'clientes.db')
+        origem, destino = sqlite3.connect(args.banco), sqlite3.connect(banco)
+        origem.backup(destino)
+        origem.close()
+        destino.close()
+        database.DB_PATH = banco
+        database.create_or_update_table()
+
+        rng = random.Random(args.semente)
+        em_aberto = database.read_sql('SELECT DISTINCT codigo_cliente FROM parcelas WHERE pago = 0 ORDER BY codigo_cliente')['codigo_cliente'].tolist()
+        disputados = rng.sample(em_aberto, min(args.disputados, len(em_aberto)))
+        execucao = datetime.now().strftime('%H%M%S')
+        processos = max(1, min(args.processos, args.sessoes))
+        grupos = [list(range(p, args.sessoes, processos)) for p in range(processos)]
+        inicio = time.time() + (2 if processos > 1 else 0.1)  # tempo para os processos subirem
+        fim = inicio + args.duracao
+        parametros = [(banco, pasta, numeros, args.sessoes, execucao, args.semente, disputados, args.pausa, mix, inicio, fim)
+                      for numeros in grupos]
+
+        print(f'{args.sessoes} sessões em {processos} processo(s) por {args.duracao:.0f}s, mix {mix}...', flush=True)
+        if processos == 1:
+            resultados = [rodar_processo(*parametros[0])]
+        else:
+            with multiprocessing.get_context('spawn').Pool(processos) as pool:
+                resultados = pool.starmap(rodar_processo, parametros)
+        os.chdir(RAIZ)
+
+        registros = [r for resultado in resultados for r in resultado['registros']]
+        cadastros = [c for resultado in resultados for c in resultado['cadastros']]
+        edicoes = [e for resultado in resultados for e in resultado['edicoes']]
+        problemas = conferir(banco, execucao, cadastros, edicoes)
+        for pool in database._pools.values():
+            pool.close_all()
+
+    resumo = resumir(registros, args.duracao)
+    bloqueios = {chave: round(sum(r['bloqueios'][chave] for r in resultados), 3) for chave in resultados[0]['bloqueios']}
+    erros_excel = [r['backup_excel'] for r in resultados if r['backup_excel']]
+
+    print(f"\n{'OPERAÇÃO':<12} {'QTDE':>7} {'OPS/S':>8} {'P50':>9} {'P95':>9} {'P99':>9} {'MÁX':>9} {'ESPERAS':>8}  ERROS")
+    for nome, r in resumo.items():
+        erros = ', '.join(f'{erro}: {vezes}' for erro, vezes in r['erros'].items()) or '-'
+        print(f"{nome:<12} {r['operacoes']:>7} {r['por_segundo']:>8.1f} {r['p50_ms']:>7.1f}ms {r['p95_ms']:>7.1f}ms "
+              f"{r['p99_ms']:>7.1f}ms {r['max_ms']:>7.1f}ms {r['esperas_begin']:>8}  {erros}")
+    total = resumo['total']
+    print(f"\nESPERAS PELO BLOQUEIO DE ESCRITA (BEGIN IMMEDIATE): {total['esperas_begin']} ({total['segundos_espera_begin']:.2f}s)")
+    print(f"RETENTATIVAS DO retry_on_lock: {bloqueios['lock_waits']} ({bloqueios['lock_wait_seconds']:.2f}s), "
+          f"DESISTÊNCIAS: {bloqueios['failures']}")
+    print(f"BACKUP EXCEL: {'; '.join(erros_excel) if erros_excel else 'sem erros'}")
+    print(f'CADASTROS CONFIRMADOS: {len(cadastros)}, EDIÇÕES DE PARCELAS CONFIRMADAS: {len(edicoes)}')
+    if problemas:
+        for problema, exemplos in problemas.items():
+            print(f"GRAVAÇÕES COM PROBLEMA - {problema}: {len(exemplos)} (ex.: {', '.join(map(str, exemplos[:5]))})")
+    else:
+        print('NENHUMA GRAVAÇÃO PERDIDA OU DUPLICADA')
+
+    if args.saida:
+        saida = {
+            'executado_em': datetime.now().isoformat(timespec='seconds'),
+            'commit': versao_git(),
+            'python': platform.python_version(),
+            'plataforma': platform.platform(),
+            'parametros': {'sessoes': args.sessoes, 'processos': processos, 'duracao': args.duracao, 'mix': mix,
+                           'disputados': args.disputados, 'pausa': args.pausa, 'semente': args.semente},
+            'operacoes': resumo,
+            'bloqueios': bloqueios,
+            'backup_excel': erros_excel,
+            'problemas': {problema: len(exemplos) for problema, exemplos in problemas.items()},
+        }
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(saida, f, ensure_ascii=False, indent=2)
+        print(f'Resultados -> {args.saida}')
+    return 1 if problemas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import SQL_INSERT_CLIENTE, create_or_update_table, transaction, avancar_sequencia
+from importacao import SQL_INSERT_PARCELA_COMPLETA
+
+PRIMEIROS_NOMES = ('JOÃO', 'MARIA', 'JOSÉ', 'ANA', 'ANTÔNIO', 'FRANCISCA', 'CARLOS', 'ADRIANA', 'PAULO', 'JULIANA',
+                   'PEDRO', 'MÁRCIA', 'LUCAS', 'FERNANDA', 'LUIZ', 'PATRÍCIA', 'MARCOS', 'ALINE', 'GABRIEL', 'SANDRA',
+                   'RAFAEL', 'CAMILA', 'DANIEL', 'AMANDA', 'MARCELO', 'BRUNA', 'BRUNO', 'JÉSSICA', 'EDUARDO', 'LETÍCIA',
+                   'FÁBIO', 'JÚLIA', 'RODRIGO', 'LUCIANA', 'ROBERTO', 'VANESSA', 'SÉRGIO', 'MARIANA', 'CLÁUDIO', 'GABRIELA')
+SOBRENOMES = ('SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'RODRIGUES', 'FERREIRA', 'ALVES', 'PEREIRA', 'LIMA', 'GOMES',
+              'COSTA', 'RIBEIRO', 'MARTINS', 'CARVALHO', 'ALMEIDA', 'LOPES', 'SOARES', 'FERNANDES', 'VIEIRA', 'BARBOSA',
+              'ROCHA', 'DIAS', 'NASCIMENTO', 'ANDRADE', 'MOREIRA', 'NUNES', 'MARQUES', 'MACHADO', 'MENDES', 'FREITAS',
+              'CARDOSO', 'RAMOS', 'GONÇALVES', 'SANTANA', 'TEIXEIRA', 'ARAÚJO', 'PADILHA', 'SIQUEIRA', 'MOHR', 'CHEDID')
+TIPOS_ACAO = ('APOSENTADORIA', 'APOSENTADORIA ESPECIAL', 'AUXÍLIO-DOENÇA', 'BPC/LOAS', 'PENSÃO POR MORTE',
+              'REVISÃO DE BENEFÍCIO', 'SALÁRIO-MATERNIDADE', 'INDENIZAÇÃO', 'TRABALHISTA')
+CONTAS = ('', 'BANCO DO BRASIL', 'CAIXA', 'ITAÚ', 'SICREDI')
+
+# Duração dos planos de parcelamento (meses) e o peso de cada uma; média de ~20 parcelas por cliente
+PRAZOS = np.array([1, 3, 6, 10, 12, 18, 24, 30, 36])
+PESOS_PRAZOS = np.array([1, 3, 6, 8, 16, 16, 20, 15, 15], dtype=float)
+
+# Parcelas vencidas que já foram pagas; o restante fica em aberto (inadimplência)
+TAXA_PAGAMENTO = 0.92
+
+TAMANHO_LOTE = 20_000
+
+
+# Função para gerar CPFs válidos (com os dígitos verificadores), já formatados
+def gerar_cpfs(rng, quantidade):
+    digitos = rng.integers(0, 10, size=(quantidade, 11))
+    for posicao in (9, 10):
+        pesos = np.arange(posicao + 1, 1, -1)
+        resto = (digitos[:, :posicao] * pesos).sum(axis=1) * 10 % 11
+        digitos[:, posicao] = np.where(resto == 10, 0, resto)
+    texto = [''.join(map(str, linha)) for linha in digitos.tolist()]
+    return [f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}' for cpf in texto]
+
+# Função para gerar os clientes: lista de tuplas no formato de SQL_INSERT_CLIENTE
+def gerar_clientes(rng, quantidade, hoje):
+    primeiros = rng.choice(PRIMEIROS_NOMES, quantidade)
+    meios = rng.choice(SOBRENOMES, quantidade)
+    ultimos = rng.choice(SOBRENOMES, quantidade)
+    cpfs = gerar_cpfs(rng, quantidade)
+    telefones = rng.integers(10, 100, quantidade), rng.integers(90000, 100000, quantidade), rng.integers(0, 10000, quantidade)
+    senhas = rng.integers(100000, 1000000, quantidade)
+    tipos = rng.choice(TIPOS_ACAO, quantidade)
+    honorarios = np.round(rng.lognormal(np.log(6000), 0.6, quantidade), -1)
+    cadastro = rng.integers(0, 5 * 365, quantidade)
+
+    clientes = []
+    for i in range(quantidade):
+        clientes.append((
+            f'{i + 1:04d}',
+            f'{primeiros[i]} {meios[i]} {ultimos[i]}',
+            f'({telefones[0][i]}) {telefones[1][i]}-{telefones[2][i]:04d}',
+            cpfs[i],
+            str(senhas[i]),
+            tipos[i],
+            float(honorarios[i]),
+            f'{tipos[i]} - PROCESSO {rng.integers(1000000, 9999999)}',
+            (hoje - timedelta(days=int(cadastro[i]))).strftime('%Y-%m-%d'),
+        ))
+    return clientes
+
+# Função para gerar as parcelas de um lote de clientes: tuplas no formato de SQL_INSERT_PARCELA_COMPLETA
+def gerar_parcelas_clientes(rng, clientes, hoje):
+    prazos = rng.choice(PRAZOS, len(clientes), p=PESOS_PRAZOS / PESOS_PRAZOS.sum())
+    parcelas = []
+    for cliente, prazo in zip(clientes, prazos.tolist()):
+        codigo, honorarios, cadastro = cliente[0], cliente[6], date.fromisoformat(cliente[8])
+        valor = round(honorarios / prazo, 2)
+        pagas = rng.random(prazo) < TAXA_PAGAMENTO
+        for numero in range(1, prazo + 1):
+            vencimento = cadastro + timedelta(days=30 * numero)
+            pago = int(vencimento <= hoje and bool(pagas[numero - 1]))
+            conta = CONTAS[numero % len(CONTAS)] if pago else ''
+            parcelas.append((codigo, numero, valor, vencimento.strftime('%Y-%m-%d'), 'PIX' if pago else None, conta, pago))
+    return parcelas
+
+
+# Função para criar um banco sintético em `caminho` com o esquema do aplicativo (gatilhos, índices
+# e resumo mensal incluídos). Com a mesma semente, o banco gerado é sempre o mesmo.
+def gerar_banco(caminho, clientes=50_000, semente=42, hoje=None, progresso=None):
+    hoje = hoje or date(2025, 1, 1)
+    for sufixo in ('', '-wal', '-shm'):
+        if os.path.exists(caminho + sufixo):
+            os.remove(caminho + sufixo)
+
+    database.DB_PATH = caminho
+    create_or_update_table()
+    rng = np.random.default_rng(semente)
+
+    total_parcelas = 0
+    todos = gerar_clientes(rng, clientes, hoje)
+    for inicio in range(0, len(todos), TAMANHO_LOTE):
+        lote = todos[inicio:inicio + TAMANHO_LOTE]
+        parcelas = gerar_parcelas_clientes(rng, lote, hoje)
+        with transaction() as conn:
+            conn.executemany(SQL_INSERT_CLIENTE, lote)
+            conn.executemany(SQL_INSERT_PARCELA_COMPLETA, parcelas)
+            avancar_sequencia(conn, [lote[-1][0]])
+        total_parcelas += len(parcelas)
+        if progresso:
+            progresso(inicio + len(lote), total_parcelas)
+    return clientes, total_parcelas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera um clientes.db sintético para os benchmarks.')
+    parser.add_argument('caminho', nargs='?', default='benchmarks/clientes_sintetico.db')
+    parser.add_argument('--clientes', type=int, default=50_000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    inicio = time.perf_counter()
+    clientes, parcelas = gerar_banco(args.caminho, args.clientes, args.semente,
+                                     progresso=lambda c, p: print(f'\r{c} clientes, {p} parcelas', end='', flush=True))
+    print(f'\n{clientes} clientes e {parcelas} parcelas em {time.perf_counter() - inicio:.1f}s -> {args.caminho}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
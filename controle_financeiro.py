@@ -1,14 +1,23 @@
 import streamlit as st
 import pandas as pd
-from datetime import datetime, timedelta
-import sqlite3
-import locale
+from datetime import datetime
 import os
 import sys
-from fpdf import FPDF
-import time
-
-locale.setlocale(locale.LC_ALL, 'pt_BR.UTF-8')
+import io
+from formatacao import formatar_telefone, formatar_cpf, formatar_valor, formatar_valores, formatar_datas, numero_mes
+import instrumentacao
+from instrumentacao import iniciar_rerun, medir, marcar_primeira_renderizacao
+from database import (ensure_schema, add_cliente, load_lista_clientes, load_cliente, load_parcelas,
+                      update_cliente, delete_cliente, parcelas_alteradas,
+                      add_parcelas, add_single_parcela, update_parcelas, excel_backup, query_cache, retry_on_lock, proximo_codigo,
+                      load_parcelas_pagas_agrupadas, load_parcelas_nao_pagas_agrupadas, buscar_clientes, escritorios)
+from snapshots import agendador as snapshot_scheduler
+from previsao import relatorio_previsao, FAIXAS
+from tarefas import agendador as tarefas_agendador, executar_tarefa, resultado_pronto
+from renegociacao import previa_renegociacao, aplicar_renegociacao, ErroRenegociacao
+
+# Quantidade de clientes por página nos resultados da busca
+RESULTADOS_POR_PAGINA = 50
 
 # Função para obter o caminho relativo ao executável
 def resource_path(relative_path):
@@ -16,309 +25,17 @@ def resource_path(relative_path):
     base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
     return os.path.join(base_path, relative_path)
 
-# Função para criar ou atualizar a tabela no banco de dados
-def create_or_update_table():
-    conn = sqlite3.connect(resource_path('clientes.db'))
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS clientes
-                 (codigo TEXT PRIMARY KEY, nome TEXT, contato TEXT, cpf TEXT, senha_egov TEXT, tipo_acao TEXT,
-                  valor_honorarios REAL, resumo_caso TEXT, data_cadastro TEXT)''')
-    c.execute('''CREATE TABLE IF NOT EXISTS parcelas
-                 (codigo_cliente TEXT, numero_parcela INTEGER, valor_parcela REAL, data_pagamento TEXT, tipo_pagamento TEXT, conta_deposito TEXT, pago BOOLEAN, PRIMARY KEY (codigo_cliente, numero_parcela))''')
-    conn.commit()
-    conn.close()
-
-# Função para adicionar cliente no banco de dados
-def add_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        data_cadastro = data_cadastro.strftime('%d/%m/%Y')  # Convertendo datetime.date para string
-        c.execute('INSERT INTO clientes (codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-                  (codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        add_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro)
-
-# Função para carregar dados do banco de dados
-def load_data():
-    conn = sqlite3.connect(resource_path('clientes.db'))
-    df = pd.read_sql_query('SELECT * FROM clientes', conn)
-    conn.close()
-    return df
-
-# Função para carregar parcelas do banco de dados
-def load_parcelas(codigo_cliente):
-    conn = sqlite3.connect(resource_path('clientes.db'))
-    df = pd.read_sql_query('SELECT * FROM parcelas WHERE codigo_cliente = ?', conn, params=(codigo_cliente,))
-    conn.close()
-    return df
-
-# Função para carregar todas as parcelas do banco de dados
-def load_all_parcelas():
-    conn = sqlite3.connect(resource_path('clientes.db'))
-    df = pd.read_sql_query('SELECT * FROM parcelas', conn)
-    conn.close()
-    return df
-
-# Função para carregar todas as parcelas com detalhes dos clientes
-def load_all_parcelas_with_client_details():
-    conn = sqlite3.connect(resource_path('clientes.db'))
-    query = '''
-    SELECT p.codigo_cliente, p.numero_parcela, p.valor_parcela, p.data_pagamento, p.conta_deposito, p.pago, c.nome
-    FROM parcelas p
-    JOIN clientes c ON p.codigo_cliente = c.codigo
-    '''
-    df = pd.read_sql_query(query, conn)
-    df['data_pagamento'] = pd.to_datetime(df['data_pagamento'], format='%d/%m/%Y')
-    conn.close()
-    return df
-
-# Função para gerar código único
-def generate_code(df):
-    if df.empty:
-        return '0001'
-    else:
-        last_code = df['codigo'].iloc[-1]
-        new_code = int(last_code) + 1
-        return f'{new_code:04d}'
-
-# Função para formatar o telefone
-def formatar_telefone(telefone):
-    telefone = ''.join(filter(str.isdigit, telefone))
-    if len(telefone) == 11:
-        return f'({telefone[:2]}) {telefone[2:7]}-{telefone[7:]}'
-    else:
-        return telefone
+# Cronometragem deste rerun; o painel de depuração da barra lateral mostra a do rerun anterior
+st.session_state.ultimo_rerun = st.session_state.get('rerun_atual')
+st.session_state.rerun_atual = iniciar_rerun(st.session_state.get('page', ''))
 
-# Função para formatar o CPF
-def formatar_cpf(cpf):
-    cpf = ''.join(filter(str.isdigit, cpf))
-    if len(cpf) == 11:
-        return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
-    else:
-        return cpf
-
-# Função para formatar valores monetários
-def formatar_valor(valor):
-    return f'R$ {valor:,.2f}'.replace(',', 'X').replace('.', ',').replace('X', '.')
-
-# Função para atualizar cliente no banco de dados
-def update_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        data_cadastro = data_cadastro.strftime('%d/%m/%Y')  # Convertendo datetime.date para string
-        c.execute('UPDATE clientes SET nome=?, contato=?, cpf=?, senha_egov=?, tipo_acao=?, valor_honorarios=?, resumo_caso=?, data_cadastro=? WHERE codigo=?',
-                  (nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro, codigo))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        update_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro)
-
-# Função para excluir cliente do banco de dados
-def delete_cliente(codigo):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        c.execute('DELETE FROM clientes WHERE codigo=?', (codigo,))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        delete_cliente(codigo)
-
-# Função para adicionar parcelas no banco de dados
-def add_parcelas(codigo_cliente, numero_parcelas, valor_parcela):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        for i in range(1, numero_parcelas + 1):
-            data_pagamento = (datetime.today() + timedelta(days=(i-1) * 30)).strftime('%d/%m/%Y')
-            c.execute('INSERT INTO parcelas (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, pago) VALUES (?, ?, ?, ?, ?)',
-                      (codigo_cliente, i, valor_parcela, data_pagamento, False))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        add_parcelas(codigo_cliente, numero_parcelas, valor_parcela)
-
-# Função para adicionar uma única parcela no banco de dados
-def add_single_parcela(codigo_cliente, valor_parcela, data_pagamento, conta_deposito):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        c.execute('SELECT MAX(numero_parcela) FROM parcelas WHERE codigo_cliente = ?', (codigo_cliente,))
-        max_parcela = c.fetchone()[0]
-        if max_parcela is None:
-            max_parcela = 0
-        numero_parcela = max_parcela + 1
-        data_pagamento = data_pagamento.strftime('%d/%m/%Y')
-        c.execute('INSERT INTO parcelas (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, conta_deposito, pago) VALUES (?, ?, ?, ?, ?, ?)',
-                  (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, conta_deposito, False))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        add_single_parcela(codigo_cliente, valor_parcela, data_pagamento, conta_deposito)
-
-# Função para atualizar parcela no banco de dados
-def update_parcela(codigo_cliente, numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago):
-    try:
-        conn = sqlite3.connect(resource_path('clientes.db'), timeout=10)
-        c = conn.cursor()
-        data_pagamento = datetime.strptime(data_pagamento, '%d/%m/%Y').strftime('%d/%m/%Y')  # Convertendo string para o formato correto
-        c.execute('UPDATE parcelas SET valor_parcela=?, data_pagamento=?, tipo_pagamento=?, conta_deposito=?, pago=? WHERE codigo_cliente=? AND numero_parcela=?',
-                  (valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago, codigo_cliente, numero_parcela))
-        conn.commit()
-        conn.close()
-        save_to_excel()
-    except sqlite3.OperationalError:
-        time.sleep(1)
-        update_parcela(codigo_cliente, numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago)
-
-# Função para carregar parcelas pagas agrupadas por mês e ano da planilha Excel
-def load_parcelas_pagas_agrupadas_from_excel():
-    for _ in range(5):  # Tenta 5 vezes
-        try:
-            df_parcelas = pd.read_excel('backup_clientes.xlsx', sheet_name='Parcelas')
-            df_parcelas_pagas = df_parcelas[df_parcelas['pago'] == True]
-            df_parcelas_pagas['data_pagamento'] = pd.to_datetime(df_parcelas_pagas['data_pagamento'], format='%d/%m/%Y')
-            df_parcelas_pagas['mes'] = df_parcelas_pagas['data_pagamento'].dt.month
-            df_parcelas_pagas['ano'] = df_parcelas_pagas['data_pagamento'].dt.year
-            df_agrupado = df_parcelas_pagas.groupby(['mes', 'ano']).agg({'valor_parcela': 'sum'}).reset_index()
-            df_agrupado['mes'] = df_agrupado['mes'].apply(lambda x: datetime.strptime(str(x), '%m').strftime('%B'))
-            return df_agrupado
-        except PermissionError:
-            time.sleep(1)  # Espera 1 segundo antes de tentar novamente
-
-# Função para carregar todas as parcelas não pagas da planilha Excel
-def load_parcelas_nao_pagas_from_excel():
-    for _ in range(5):  # Tenta 5 vezes
-        try:
-            df_parcelas = pd.read_excel('backup_clientes.xlsx', sheet_name='Parcelas')
-            df_parcelas_nao_pagas = df_parcelas[df_parcelas['pago'] == False]
-            df_parcelas_nao_pagas['data_pagamento'] = pd.to_datetime(df_parcelas_nao_pagas['data_pagamento'], format='%d/%m/%Y')
-            df_parcelas_nao_pagas['mes'] = df_parcelas_nao_pagas['data_pagamento'].dt.month
-            df_parcelas_nao_pagas['ano'] = df_parcelas_nao_pagas['data_pagamento'].dt.year
-            df_agrupado = df_parcelas_nao_pagas.groupby(['mes', 'ano']).agg({'valor_parcela': 'sum'}).reset_index()
-            df_agrupado['mes'] = df_agrupado['mes'].apply(lambda x: datetime.strptime(str(x), '%m').strftime('%B'))
-            return df_agrupado, df_parcelas_nao_pagas
-        except PermissionError:
-            time.sleep(1)  # Espera 1 segundo antes de tentar novamente
-
-# Função para formatar data para exibição
-def formatar_data(data):
-    if pd.isnull(data):
-        return ''
-    else:
-        return datetime.strptime(data, '%Y-%m-%d').strftime('%d/%m/%Y')
+# Criar ou atualizar a tabela (só no primeiro rerun do processo)
+with medir('ensure_schema'):
+    ensure_schema()
 
-# Função para salvar os dados em um arquivo Excel
-def save_to_excel():
-    for _ in range(5):  # Tenta 5 vezes
-        try:
-            conn = sqlite3.connect(resource_path('clientes.db'))
-            df_clientes = pd.read_sql_query('SELECT * FROM clientes', conn)
-            df_parcelas = pd.read_sql_query('SELECT * FROM parcelas', conn)
-            conn.close()
-
-            with pd.ExcelWriter('backup_clientes.xlsx') as writer:
-                df_clientes.to_excel(writer, sheet_name='Clientes', index=False)
-                df_parcelas.to_excel(writer, sheet_name='Parcelas', index=False)
-            break  # Sai do loop se a operação for bem-sucedida
-        except PermissionError:
-            time.sleep(1)  # Espera 1 segundo antes de tentar novamente
-
-# Classe para criar PDF
-class PDF(FPDF):
-    def header(self):
-        self.image(resource_path('LOGO.png'), 10, 8, 33)
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, 'Relatório de Parcelas', 0, 1, 'C')
-        self.ln(10)
-
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, 'Página %s de %s' % (self.page_no(), '{nb}'), 0, 0, 'C')
-        self.line(10, self.get_y() - 5, 200, self.get_y() - 5)
-
-    def chapter_title(self, title):
-        self.set_font('Arial', 'B', 12)
-        self.cell(0, 10, title, 0, 1, 'L')
-        self.ln(5)
-
-    def chapter_body(self, body):
-        self.set_font('Arial', '', 12)
-        self.multi_cell(0, 10, body)
-        self.ln()
-
-def generate_pdf(cliente_info, parcelas):
-    pdf = PDF()
-    pdf.alias_nb_pages()
-    pdf.add_page()
-
-    # Nome do cliente
-    pdf.chapter_title(f"Nome do Cliente: {cliente_info['nome']}")
-
-    # Tipo de Ação
-    pdf.chapter_title(f"Tipo de Ação: {cliente_info['tipo_acao']}")
-
-    # Valor dos Honorários
-    pdf.chapter_title(f"Valor Total dos Honorários: {formatar_valor(cliente_info['valor_honorarios'])}")
-
-    # Detalhamento das Parcelas
-    pdf.chapter_title("Detalhamento das Parcelas:")
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(30, 10, 'Nº da Parcela', 1)
-    pdf.cell(30, 10, 'Valor', 1)
-    pdf.cell(50, 10, 'Data de Vencimento', 1)
-    pdf.cell(30, 10, 'Pagamento', 1)
-    pdf.cell(50, 10, 'Data do Pagamento', 1)
-    pdf.ln()
-
-    pdf.set_font('Arial', '', 12)
-    total_a_pagar = 0
-    for i in range(len(parcelas)):
-        numero_parcela = str(i + 1)
-        valor_parcela = formatar_valor(parcelas.iloc[i]['valor_parcela'])
-        data_vencimento = datetime.strptime(parcelas.iloc[i]['data_pagamento'], '%d/%m/%Y').strftime('%d/%m/%Y')
-        pagamento = 'Sim' if parcelas.iloc[i]['pago'] else 'Não'
-        data_pagamento = datetime.strptime(parcelas.iloc[i]['data_pagamento'], '%d/%m/%Y').strftime('%d/%m/%Y') if parcelas.iloc[i]['pago'] else ''
-        total_a_pagar += parcelas.iloc[i]['valor_parcela'] if not parcelas.iloc[i]['pago'] else 0
-
-        pdf.cell(30, 10, numero_parcela, 1)
-        pdf.cell(30, 10, valor_parcela, 1)
-        pdf.cell(50, 10, data_vencimento, 1)
-        pdf.cell(30, 10, pagamento, 1)
-        pdf.cell(50, 10, data_pagamento, 1)
-        pdf.ln()
-
-    # Total a pagar
-    pdf.ln(10)
-    pdf.set_font('Arial', 'B', 12)
-    pdf.cell(0, 10, f"Total a Pagar: {formatar_valor(total_a_pagar)}", 0, 1, 'L')
-
-    # Salvar PDF
-    pdf_file = 'relatorio_parcelas.pdf'
-    pdf.output(pdf_file)
-
-    return pdf_file
-
-# Criar ou atualizar a tabela
-create_or_update_table()
-
-# Carregar dados existentes
-df_clients = load_data()
+# Snapshots automáticos do banco e relatórios calculados em segundo plano (uma thread de cada por processo)
+snapshot_scheduler.start()
+tarefas_agendador.start()
 
 # Configuração da página principal
 logo_path = resource_path('LOGO.png')
@@ -344,8 +61,15 @@ if 'valor_parcela' not in st.session_state:
 if 'adicionando_parcela' not in st.session_state:
     st.session_state.adicionando_parcela = False
 
+# Variáveis da renegociação: clientes escolhidos e a prévia ainda não confirmada
+if 'clientes_renegociacao' not in st.session_state:
+    st.session_state.clientes_renegociacao = []
+
+if 'previa_renegociacao' not in st.session_state:
+    st.session_state.previa_renegociacao = None
+
 # Barra lateral para seleção de página
-with st.sidebar:
+with st.sidebar, medir('barra lateral'):
     if st.button('CADASTRO DE CLIENTE'):
         st.session_state.page = 'CADASTRO DE CLIENTE'
         st.session_state.cliente_selecionado = None
@@ -358,18 +82,82 @@ with st.sidebar:
         st.session_state.page = 'PARCELAS PAGAS'
     if st.button('VALORES A RECEBER'):
         st.session_state.page = 'VALORES A RECEBER'
+    if st.button('PREVISÃO DE RECEBIMENTOS'):
+        st.session_state.page = 'PREVISÃO DE RECEBIMENTOS'
+    if st.button('RENEGOCIAÇÃO DE PARCELAS'):
+        st.session_state.page = 'RENEGOCIAÇÃO DE PARCELAS'
+    if st.button('EXTRATOS EM LOTE'):
+        st.session_state.page = 'EXTRATOS EM LOTE'
     if st.session_state.page == 'CONTROLE FINANCEIRO' or st.session_state.page == 'DETALHE FINANCEIRO':
         if st.button('VOLTAR'):
             st.session_state.page = 'CONSULTA DE CLIENTES'
             st.session_state.cliente_selecionado = None
 
+    # Situação do backup Excel feito em segundo plano
+    st.write('---')
+    backup_status = excel_backup.status()
+    if backup_status['last_backup']:
+        st.caption(f"ÚLTIMO BACKUP EXCEL: {backup_status['last_backup'].strftime('%d/%m/%Y %H:%M:%S')}")
+    else:
+        st.caption('ÚLTIMO BACKUP EXCEL: NENHUM NESTA SESSÃO')
+    if backup_status['running']:
+        st.caption('BACKUP EM ANDAMENTO...')
+    elif backup_status['pending']:
+        st.caption(f"ALTERAÇÕES PENDENTES DE BACKUP: {backup_status['pending']}")
+    if backup_status['last_error']:
+        st.caption(f"FALHA NO BACKUP: {backup_status['last_error']}")
+
+    # Snapshots do banco (cópia online pelo SQLite, sem passar pelo Excel)
+    if st.button('SNAPSHOT DO BANCO AGORA'):
+        try:
+            snapshot_scheduler.snapshot_now()
+        except Exception:
+            pass  # A falha aparece logo abaixo
+    snapshot_status = snapshot_scheduler.status()
+    if snapshot_status['last_snapshot']:
+        st.caption(f"ÚLTIMO SNAPSHOT: {snapshot_status['last_snapshot'].strftime('%d/%m/%Y %H:%M:%S')}")
+    else:
+        st.caption('ÚLTIMO SNAPSHOT: NENHUM NESTA SESSÃO')
+    if snapshot_status['last_error']:
+        st.caption(f"FALHA NO SNAPSHOT: {snapshot_status['last_error']}")
+    for nome, erro in tarefas_agendador.status()['errors'].items():
+        st.caption(f'FALHA NA TAREFA {nome.upper()}: {erro}')
+
+    # Estatísticas do cache de consultas
+    cache_stats = query_cache.stats()
+    st.caption(f"CACHE DE CONSULTAS: {cache_stats['hits']} ACERTOS / {cache_stats['misses']} FALHAS, "
+               f"{cache_stats['entries']} ITENS ({cache_stats['bytes'] / 1024:.0f} KB)")
+    lock_stats = retry_on_lock.stats()
+    if lock_stats['lock_waits']:
+        st.caption(f"ESPERAS POR BANCO BLOQUEADO: {lock_stats['lock_waits']} ({lock_stats['lock_wait_seconds']:.1f}s), "
+                   f"{lock_stats['failures']} FALHA(S)")
+
+    # Painel de depuração: onde foi gasto o tempo do rerun anterior (SQL, blocos da página, Excel)
+    if st.checkbox('DEPURAÇÃO', key='depuracao'):
+        ultimo_rerun = st.session_state.ultimo_rerun
+        if ultimo_rerun is None:
+            st.caption('NENHUM RERUN ANTERIOR NESTA SESSÃO.')
+        else:
+            situacao = '' if ultimo_rerun.concluido else ' (INTERROMPIDO)'
+            st.caption(f"ÚLTIMO RERUN{situacao}: {ultimo_rerun.nome} EM {ultimo_rerun.duracao * 1000:.0f} ms")
+            st.caption(' / '.join(f'{tipo.upper()}: {segundos * 1000:.0f} ms' for tipo, segundos in ultimo_rerun.totais_por_tipo().items()))
+            st.dataframe(pd.DataFrame(ultimo_rerun.linhas()), hide_index=True)
+        st.caption(f'OPERAÇÕES ACIMA DE {instrumentacao.LIMITE_LENTO_MS:.0f} ms VÃO PARA {instrumentacao.SLOW_LOG_PATH}')
+
 page = st.session_state.page
 
 if page == 'CADASTRO DE CLIENTE':
     st.header('CADASTRO DE CLIENTES')
 
-    # Gerar código do cliente
-    codigo = generate_code(df_clients)
+    # Com mais de um escritório, o cliente é cadastrado no banco do escritório escolhido
+    lista_escritorios = escritorios()
+    escritorio = None
+    if len(lista_escritorios) > 1:
+        escritorio = st.selectbox('ESCRITÓRIO', [e.prefixo for e in lista_escritorios],
+                                  format_func=lambda prefixo: next(e.nome for e in lista_escritorios if e.prefixo == prefixo))
+
+    # O código do cliente é reservado na gravação; aqui só informamos o próximo livre
+    st.write(f'CÓDIGO DO CLIENTE: {proximo_codigo(escritorio)}')
 
     # Campos de entrada
     nome = st.text_input('NOME').upper()
@@ -395,20 +183,39 @@ if page == 'CADASTRO DE CLIENTE':
         elif len(cpf) != 14:
             st.error('FORMATO DE CPF INVÁLIDO. CERTIFIQUE-SE DE INSERIR 11 DÍGITOS NUMÉRICOS.')
         else:
-            add_cliente(codigo, nome, telefone, cpf, senha_egov, tipo_acao, valor_honorarios_contratados, resumo_caso, data_cadastro)
-            st.success(f'CLIENTE {nome} CADASTRADO COM SUCESSO!')
-            df_clients = load_data()
+            codigo = add_cliente(None, nome, telefone, cpf, senha_egov, tipo_acao, valor_honorarios_contratados, resumo_caso, data_cadastro,
+                                 escritorio=escritorio)
+            st.success(f'CLIENTE {nome} CADASTRADO COM SUCESSO! CÓDIGO: {codigo}')
 
 elif page == 'CONSULTA DE CLIENTES':
     st.header('CLIENTES CADASTRADOS')
-    search_term = st.text_input('PESQUISAR POR NOME', on_change=lambda: st.session_state.update(cliente_selecionado=None))
-    
+    # Só o necessário para a listagem; os dados completos são lidos quando um cliente é escolhido
+    with medir('carregar clientes'):
+        df_clients = load_lista_clientes()
+    # Um termo novo volta para a primeira página, sem cliente escolhido
+    def nova_busca():
+        st.session_state.cliente_selecionado = None
+        st.session_state.pop('pagina_busca', None)
+    search_term = st.text_input('PESQUISAR POR NOME, CPF, TIPO DE AÇÃO OU RESUMO DO CASO', on_change=nova_busca)
+
     if search_term:
-        filtered_df = df_clients[df_clients['nome'].str.contains(search_term.upper(), case=False, na=False)]
+        # Busca no índice de texto completo, ordenada por relevância e paginada
+        pagina = st.session_state.get('pagina_busca', 1)
+        with medir('buscar clientes'):
+            filtered_df, total_resultados = buscar_clientes(search_term, pagina, RESULTADOS_POR_PAGINA)
+            total_paginas = max(1, -(-total_resultados // RESULTADOS_POR_PAGINA))
+            if pagina > total_paginas:
+                # A página guardada não existe mais (menos resultados que antes): vai para a última
+                pagina = st.session_state.pagina_busca = total_paginas
+                filtered_df, total_resultados = buscar_clientes(search_term, pagina, RESULTADOS_POR_PAGINA)
+        st.write(f'{total_resultados} CLIENTE(S) ENCONTRADO(S)')
+        if total_paginas > 1:
+            st.number_input('PÁGINA', min_value=1, max_value=total_paginas, key='pagina_busca')
     else:
         filtered_df = df_clients
 
-    st.dataframe(filtered_df[['codigo', 'nome', 'tipo_acao']].reset_index(drop=True))
+    with medir('tabela de clientes'):
+        st.dataframe(filtered_df[['codigo', 'nome', 'tipo_acao']].reset_index(drop=True))
 
     cliente_selecionado = st.selectbox('SELECIONE UM CLIENTE PARA EDITAR OU EXCLUIR', [''] + list(filtered_df['codigo'].values))
 
@@ -416,13 +223,13 @@ elif page == 'CONSULTA DE CLIENTES':
         st.session_state.cliente_selecionado = cliente_selecionado
 
     if st.session_state.cliente_selecionado:
-        cliente_info = filtered_df[filtered_df['codigo'] == st.session_state.cliente_selecionado].iloc[0]
+        with medir('carregar cliente'):
+            cliente_info = load_cliente(st.session_state.cliente_selecionado).iloc[0]
 
         if st.button('EXCLUIR CLIENTE'):
             delete_cliente(st.session_state.cliente_selecionado)
             st.success(f'CLIENTE {cliente_info["nome"]} EXCLUÍDO COM SUCESSO!')
             st.session_state.cliente_selecionado = None
-            df_clients = load_data()
             st.experimental_rerun()
         
         with st.form(key='edit_form'):
@@ -437,7 +244,7 @@ elif page == 'CONSULTA DE CLIENTES':
             tipo_acao_edit = st.text_input('TIPO DE AÇÃO', cliente_info['tipo_acao'], key='tipo_acao_edit').upper()
             valor_honorarios_contratados_edit = st.number_input('VALOR DOS HONORÁRIOS CONTRATADOS (R$)', min_value=0.0, format='%.2f', value=cliente_info['valor_honorarios'], key='valor_honorarios_edit')
             resumo_caso_edit = st.text_area('RESUMO DO CASO', cliente_info['resumo_caso'], key='resumo_caso_edit').upper()
-            data_cadastro_edit = st.date_input('DATA', datetime.strptime(cliente_info['data_cadastro'], '%d/%m/%Y'), key='data_cadastro_edit')
+            data_cadastro_edit = st.date_input('DATA', datetime.strptime(cliente_info['data_cadastro'], '%Y-%m-%d'), key='data_cadastro_edit')
 
             st.write(f'VALOR DOS HONORÁRIOS: {formatar_valor(valor_honorarios_contratados_edit)}')
 
@@ -448,7 +255,6 @@ elif page == 'CONSULTA DE CLIENTES':
                 update_cliente(st.session_state.cliente_selecionado, nome_edit, telefone_edit, cpf_edit, senha_egov_edit, tipo_acao_edit, valor_honorarios_contratados_edit, resumo_caso_edit, data_cadastro_edit)
                 st.success(f'CLIENTE {nome_edit} ATUALIZADO COM SUCESSO!')
                 st.session_state.cliente_selecionado = None
-                df_clients = load_data()
                 st.experimental_rerun()
 
             if controle_button:
@@ -457,7 +263,7 @@ elif page == 'CONSULTA DE CLIENTES':
 
 elif page == 'CONTROLE FINANCEIRO':
     if st.session_state.cliente_selecionado:
-        cliente_info = df_clients[df_clients['codigo'] == st.session_state.cliente_selecionado].iloc[0]
+        cliente_info = load_cliente(st.session_state.cliente_selecionado).iloc[0]
         st.header('CONTROLE FINANCEIRO')
         st.write(f"**NOME:** {cliente_info['nome']}")
         st.write(f"**TIPO DE AÇÃO:** {cliente_info['tipo_acao']}")
@@ -481,37 +287,62 @@ elif page == 'CONTROLE FINANCEIRO':
 
 elif page == 'DETALHE FINANCEIRO':
     if st.session_state.cliente_selecionado:
-        cliente_info = df_clients[df_clients['codigo'] == st.session_state.cliente_selecionado].iloc[0]
+        cliente_info = load_cliente(st.session_state.cliente_selecionado).iloc[0]
         st.header('DETALHAMENTO DAS PARCELAS')
         st.write(f"**NOME:** {cliente_info['nome']}")
         st.write(f"**TIPO DE AÇÃO:** {cliente_info['tipo_acao']}")
         st.write(f"**VALOR DOS HONORÁRIOS CONTRATADOS:** {formatar_valor(cliente_info['valor_honorarios'])}")
 
-        parcelas = load_parcelas(cliente_info['codigo'])
-        total_parcelas = 0
-        saldo_a_pagar = 0
-
-        for i in range(len(parcelas)):
-            with st.form(key=f'parcela_form_{i+1}'):
-                st.write(f"**PARCELA {i+1}**")
-                valor_parcela = st.number_input('VALOR DA PARCELA', min_value=0.0, format='%.2f', value=parcelas.iloc[i]['valor_parcela'], key=f'valor_parcela_{i+1}')
-                total_parcelas += valor_parcela
-                pago = st.checkbox('PAGO', value=parcelas.iloc[i]['pago'], key=f'pago_{i+1}')
-                if not pago:
-                    saldo_a_pagar += valor_parcela
-                data_pagamento = st.date_input('DATA DO PAGAMENTO', value=datetime.strptime(parcelas.iloc[i]['data_pagamento'], '%d/%m/%Y') if parcelas.iloc[i]['data_pagamento'] else datetime.today() + timedelta(days=30*i), key=f'data_pagamento_{i+1}')
-                conta_deposito = st.text_input('CONTA DE DEPÓSITO', value=parcelas.iloc[i]['conta_deposito'] if parcelas.iloc[i]['conta_deposito'] else '', key=f'conta_deposito_{i+1}')
-                salvar_button = st.form_submit_button(label='SALVAR')
-
-                st.write(f'VALOR DA PARCELA: {formatar_valor(valor_parcela)}')
-
-                if salvar_button:
-                    update_parcela(cliente_info['codigo'], i+1, valor_parcela, data_pagamento.strftime('%d/%m/%Y'), None, conta_deposito, pago)
-                    st.success(f'PARCELA {i+1} ATUALIZADA COM SUCESSO!')
+        with medir('carregar parcelas'):
+            parcelas = load_parcelas(cliente_info['codigo'])
+
+        # Tabela editável com todas as parcelas do cliente; só as linhas alteradas são gravadas
+        colunas_editaveis = ['valor_parcela', 'pago', 'data_pagamento', 'conta_deposito']
+        parcelas_originais = pd.DataFrame({
+            'numero_parcela': parcelas['numero_parcela'],
+            'valor_parcela': parcelas['valor_parcela'].astype(float),
+            'pago': parcelas['pago'].fillna(False).astype(bool),
+            'data_pagamento': pd.to_datetime(parcelas['data_pagamento'], format='%Y-%m-%d').dt.date,
+            'conta_deposito': parcelas['conta_deposito'].fillna('').astype(str),
+        })
+
+        with st.form(key='parcelas_form'):
+            parcelas_editadas = st.data_editor(
+                parcelas_originais,
+                hide_index=True,
+                disabled=['numero_parcela'],
+                column_config={
+                    'numero_parcela': st.column_config.NumberColumn('PARCELA', format='%d'),
+                    'valor_parcela': st.column_config.NumberColumn('VALOR DA PARCELA', min_value=0.0, format='R$ %.2f', required=True),
+                    'pago': st.column_config.CheckboxColumn('PAGO'),
+                    'data_pagamento': st.column_config.DateColumn('DATA DO PAGAMENTO', format='DD/MM/YYYY', required=True),
+                    'conta_deposito': st.column_config.TextColumn('CONTA DE DEPÓSITO'),
+                },
+            )
+            salvar_button = st.form_submit_button(label='SALVAR ALTERAÇÕES')
+
+        # Totais e validação calculados uma vez sobre a tabela inteira
+        total_parcelas = parcelas_editadas['valor_parcela'].sum()
+        saldo_a_pagar = parcelas_editadas.loc[~parcelas_editadas['pago'], 'valor_parcela'].sum()
+
+        if salvar_button:
+            alteradas = parcelas_alteradas(parcelas_originais, parcelas_editadas, colunas_editaveis)
+            if alteradas[['valor_parcela', 'data_pagamento']].isna().any(axis=None):
+                st.error('PREENCHA O VALOR E A DATA DE TODAS AS PARCELAS.')
+            elif alteradas.empty:
+                st.info('NENHUMA PARCELA FOI ALTERADA.')
+            else:
+                tipos_pagamento = parcelas.set_index('numero_parcela')['tipo_pagamento']
+                with medir('gravar parcelas'):
+                    update_parcelas(cliente_info['codigo'], [
+                        (numero_parcela, valor_parcela, data_pagamento, tipos_pagamento.get(numero_parcela), conta_deposito, pago)
+                        for numero_parcela, valor_parcela, pago, data_pagamento, conta_deposito in alteradas.itertuples(index=False)
+                    ])
+                st.success(f"{len(alteradas)} PARCELA(S) ATUALIZADA(S) COM SUCESSO: {', '.join(str(n) for n in alteradas['numero_parcela'])}")
 
         st.write(f"**SALDO A PAGAR:** {formatar_valor(saldo_a_pagar)}")
 
-        if total_parcelas != cliente_info['valor_honorarios']:
+        if abs(total_parcelas - cliente_info['valor_honorarios']) >= 0.005:
             st.error(f"A SOMA DAS PARCELAS ({formatar_valor(total_parcelas)}) NÃO CORRESPONDE AO VALOR TOTAL DOS HONORÁRIOS CONTRATADOS ({formatar_valor(cliente_info['valor_honorarios'])}). POR FAVOR, AJUSTE OS VALORES DAS PARCELAS.")
 
         st.write('---')
@@ -536,42 +367,53 @@ elif page == 'DETALHE FINANCEIRO':
                         st.session_state.adicionando_parcela = False
                         st.experimental_rerun()
 
+        if st.button('RENEGOCIAR PARCELAS EM ABERTO'):
+            st.session_state.clientes_renegociacao = [cliente_info['codigo']]
+            st.session_state.previa_renegociacao = None
+            st.session_state.page = 'RENEGOCIAÇÃO DE PARCELAS'
+            st.rerun()
+
         # Adicionar o botão de impressão
         if st.button('IMPRIMIR'):
-            pdf_file = generate_pdf(cliente_info, parcelas)
-            with open(pdf_file, 'rb') as f:
-                st.download_button('Baixar PDF', f, file_name=pdf_file)
+            with medir('gerar PDF'):
+                from relatorio_pdf import generate_pdf  # fpdf só é carregado quando um relatório é pedido
+                pdf_bytes = generate_pdf(cliente_info, parcelas)
+            st.download_button('Baixar PDF', pdf_bytes, file_name=f"relatorio_parcelas_{cliente_info['codigo']}.pdf", mime='application/pdf')
 
 elif page == 'PARCELAS VENCIDAS':
     st.header('PARCELAS VENCIDAS NÃO PAGAS')
 
-    todas_parcelas = load_all_parcelas_with_client_details()
-    hoje = datetime.today()
-
-    # Filtro de parcelas vencidas e não pagas
-    todas_parcelas['data_pagamento'] = pd.to_datetime(todas_parcelas['data_pagamento'], format='%d/%m/%Y')
-    parcelas_vencidas = todas_parcelas[(todas_parcelas['data_pagamento'] < hoje) & (todas_parcelas['pago'] == False)]
-
-    # Selecionar as colunas desejadas
-    parcelas_vencidas = parcelas_vencidas[['nome', 'numero_parcela', 'valor_parcela', 'data_pagamento', 'conta_deposito']]
-
-    # Formatar os valores das parcelas
-    parcelas_vencidas['valor_parcela'] = parcelas_vencidas['valor_parcela'].apply(lambda x: formatar_valor(x))
-
-    # Calcular o total das parcelas vencidas e não pagas
-    total_vencido = parcelas_vencidas['valor_parcela'].apply(lambda x: float(x.replace('R$', '').replace('.', '').replace(',', '.'))).sum()
-
-    st.dataframe(parcelas_vencidas.reset_index(drop=True))
+    # Lista calculada em segundo plano (ver tarefas.py); o botão recalcula na hora
+    if st.button('ATUALIZAR AGORA', key='atualizar_vencidas'):
+        with medir('recalcular parcelas vencidas'):
+            executar_tarefa('parcelas_vencidas')
+    with medir('carregar parcelas vencidas'):
+        parcelas_vencidas, calculado_em, desatualizado = resultado_pronto('parcelas_vencidas')
+    st.caption(f"CALCULADO EM {calculado_em.strftime('%d/%m/%Y %H:%M:%S')}")
+    if desatualizado:
+        st.caption('OS DADOS MUDARAM DEPOIS DESTE CÁLCULO; ATUALIZANDO EM SEGUNDO PLANO (OU USE ATUALIZAR AGORA)')
+
+    # Calcular o total das parcelas vencidas e não pagas, ainda sobre os valores numéricos
+    with medir('totalizar e formatar'):
+        total_vencido = parcelas_vencidas['valor_parcela'].sum()
+
+        # Formatar os valores das parcelas
+        parcelas_vencidas['valor_parcela'] = formatar_valores(parcelas_vencidas['valor_parcela'])
+
+    with medir('tabela de parcelas vencidas'):
+        st.dataframe(parcelas_vencidas.reset_index(drop=True))
     st.write(f"**TOTAL VENCIDO:** {formatar_valor(total_vencido)}")
 
 elif page == 'PARCELAS PAGAS':
     st.header('PARCELAS PAGAS AGRUPADAS POR MÊS E ANO')
 
     # Carregar parcelas pagas agrupadas
-    df_parcelas_pagas = load_parcelas_pagas_agrupadas_from_excel()
+    with medir('carregar parcelas pagas'):
+        df_parcelas_pagas = load_parcelas_pagas_agrupadas()
 
     # Formatar os valores recebidos
-    df_parcelas_pagas['valor_parcela'] = df_parcelas_pagas['valor_parcela'].apply(lambda x: formatar_valor(x))
+    with medir('formatar'):
+        df_parcelas_pagas['valor_parcela'] = formatar_valores(df_parcelas_pagas['valor_parcela'])
 
     # Opções de filtragem
     meses = df_parcelas_pagas['mes'].unique().tolist()
@@ -592,18 +434,20 @@ elif page == 'PARCELAS PAGAS':
 elif page == 'VALORES A RECEBER':
     st.header('VALORES A RECEBER')
 
-    # Carregar parcelas não pagas
-    df_agrupado, df_parcelas_nao_pagas = load_parcelas_nao_pagas_from_excel()
+    # Carregar totais não pagos por mês e ano
+    with medir('carregar totais a receber'):
+        df_agrupado = load_parcelas_nao_pagas_agrupadas()
+
+    # Calcular o total dos valores a receber, ainda sobre os valores numéricos
+    with medir('totalizar e formatar'):
+        total_a_receber = df_agrupado['valor_parcela'].sum()
 
-    # Formatar os valores das parcelas
-    df_agrupado['valor_parcela'] = df_agrupado['valor_parcela'].apply(lambda x: formatar_valor(x))
+        # Formatar os valores das parcelas
+        df_agrupado['valor_parcela'] = formatar_valores(df_agrupado['valor_parcela'])
 
     # Selecionar as colunas desejadas
     df_agrupado = df_agrupado[['mes', 'ano', 'valor_parcela']]
 
-    # Calcular o total dos valores a receber
-    total_a_receber = df_agrupado['valor_parcela'].apply(lambda x: float(x.replace('R$', '').replace('.', '').replace(',', '.'))).sum()
-
     st.dataframe(df_agrupado.reset_index(drop=True))
     st.write(f"**TOTAL A RECEBER:** {formatar_valor(total_a_receber)}")
 
@@ -611,26 +455,131 @@ elif page == 'VALORES A RECEBER':
     filtro_mes = st.selectbox('FILTRAR POR MÊS', ['TODOS'] + df_agrupado['mes'].unique().tolist())
     filtro_ano = st.selectbox('FILTRAR POR ANO', ['TODOS'] + df_agrupado['ano'].unique().tolist())
 
-    df_detalhado = df_parcelas_nao_pagas.copy()
-
-    if filtro_mes != 'TODOS':
-        df_detalhado = df_detalhado[df_detalhado['mes'] == datetime.strptime(filtro_mes, '%B').month]
-    if filtro_ano != 'TODOS':
-        df_detalhado = df_detalhado[df_detalhado['ano'] == int(filtro_ano)]
-
-    # Convertendo 'codigo_cliente' e 'codigo' para string
-    df_detalhado['codigo_cliente'] = df_detalhado['codigo_cliente'].astype(str)
-    df_clients['codigo'] = df_clients['codigo'].astype(str)
-
-    # Merge com os dados dos clientes para obter o nome
-    df_detalhado = df_detalhado.merge(df_clients[['codigo', 'nome']], left_on='codigo_cliente', right_on='codigo')
+    # Detalhamento calculado em segundo plano (ver tarefas.py), filtrado aqui por mês e ano
+    if st.button('ATUALIZAR AGORA', key='atualizar_a_receber'):
+        with medir('recalcular detalhamento'):
+            executar_tarefa('parcelas_a_receber')
+    with medir('carregar detalhamento'):
+        df_detalhado, calculado_em, desatualizado = resultado_pronto('parcelas_a_receber')
+        if filtro_mes != 'TODOS':
+            df_detalhado = df_detalhado[df_detalhado['data_pagamento'].dt.month == numero_mes(filtro_mes)]
+        if filtro_ano != 'TODOS':
+            df_detalhado = df_detalhado[df_detalhado['data_pagamento'].dt.year == int(filtro_ano)]
 
     # Selecionar colunas desejadas
     df_detalhado = df_detalhado[['nome', 'valor_parcela', 'data_pagamento']]
     
     # Formatar os valores das parcelas e as datas
-    df_detalhado['valor_parcela'] = df_detalhado['valor_parcela'].apply(lambda x: formatar_valor(x))
-    df_detalhado['data_pagamento'] = df_detalhado['data_pagamento'].apply(lambda x: x.strftime('%d/%m/%Y'))
+    with medir('formatar detalhamento'):
+        df_detalhado['valor_parcela'] = formatar_valores(df_detalhado['valor_parcela'])
+        df_detalhado['data_pagamento'] = formatar_datas(df_detalhado['data_pagamento'])
     
     st.write('**DETALHAMENTO DOS VALORES A RECEBER**')
-    st.dataframe(df_detalhado.reset_index(drop=True))
+    st.caption(f"CALCULADO EM {calculado_em.strftime('%d/%m/%Y %H:%M:%S')}")
+    if desatualizado:
+        st.caption('OS DADOS MUDARAM DEPOIS DESTE CÁLCULO; ATUALIZANDO EM SEGUNDO PLANO (OU USE ATUALIZAR AGORA)')
+    with medir('tabela do detalhamento'):
+        st.dataframe(df_detalhado.reset_index(drop=True))
+
+elif page == 'PREVISÃO DE RECEBIMENTOS':
+    st.header('PREVISÃO DE RECEBIMENTOS E PARCELAS EM ATRASO')
+
+    # Atrasos e projeção calculados sobre as parcelas em aberto carregadas uma vez (ver previsao.py)
+    with medir('atrasos e projeção'):
+        atrasos_geral, atrasos_cliente, projecao = relatorio_previsao()
+
+    total_em_aberto = atrasos_geral['VALOR'].sum()
+    total_em_atraso = atrasos_geral['VALOR'].iloc[1:].sum()
+    atrasos_geral['VALOR'] = formatar_valores(atrasos_geral['VALOR'])
+    st.write('**PARCELAS EM ABERTO POR FAIXA DE ATRASO**')
+    st.dataframe(atrasos_geral, hide_index=True)
+    st.write(f"**TOTAL EM ABERTO:** {formatar_valor(total_em_aberto)} / **EM ATRASO:** {formatar_valor(total_em_atraso)}")
+
+    st.write(f'**PROJEÇÃO DE RECEBIMENTOS DOS PRÓXIMOS {len(projecao)} MESES (PARCELAS A VENCER)**')
+    st.bar_chart(pd.DataFrame({'VALOR': projecao['valor_parcela'].to_numpy()},
+                              index=[f'{ano}-{numero_mes(mes):02d}' for mes, ano in zip(projecao['mes'], projecao['ano'])]))
+    total_projecao = projecao['valor_parcela'].sum()
+    projecao['valor_parcela'] = formatar_valores(projecao['valor_parcela'])
+    st.dataframe(projecao, hide_index=True)
+    st.write(f"**TOTAL PROJETADO:** {formatar_valor(total_projecao)}")
+
+    # Clientes com parcelas em atraso, os maiores valores primeiro
+    with medir('atrasos por cliente'):
+        atrasos_cliente = atrasos_cliente[atrasos_cliente['EM ATRASO'] > 0].sort_values('EM ATRASO', ascending=False)
+        atrasos_cliente = atrasos_cliente[['codigo', 'nome'] + list(FAIXAS) + ['EM ATRASO', 'TOTAL']]
+        for coluna in list(FAIXAS) + ['EM ATRASO', 'TOTAL']:
+            atrasos_cliente[coluna] = formatar_valores(atrasos_cliente[coluna])
+    st.write(f'**CLIENTES COM PARCELAS EM ATRASO: {len(atrasos_cliente)}**')
+    st.dataframe(atrasos_cliente.reset_index(drop=True), hide_index=True)
+
+elif page == 'RENEGOCIAÇÃO DE PARCELAS':
+    st.header('RENEGOCIAÇÃO DE PARCELAS EM ABERTO')
+
+    with medir('carregar clientes'):
+        df_clients = load_lista_clientes()
+        nomes_clientes = dict(zip(df_clients['codigo'], df_clients['nome']))
+    if st.button('SELECIONAR CLIENTES COM PARCELAS EM ATRASO'):
+        with medir('clientes em atraso'):
+            _, atrasos_cliente, _ = relatorio_previsao()
+        st.session_state.clientes_renegociacao = list(atrasos_cliente.loc[atrasos_cliente['EM ATRASO'] > 0, 'codigo'])
+    codigos = st.multiselect('CLIENTES', list(nomes_clientes), key='clientes_renegociacao',
+                             format_func=lambda codigo: f'{codigo} - {nomes_clientes.get(codigo, "")}')
+    meses = st.number_input('ADIAR AS PARCELAS EM ABERTO (MESES)', min_value=0, max_value=120, value=1, step=1)
+    redividir = st.checkbox('REDIVIDIR O SALDO EM ABERTO EM PARCELAS MENSAIS')
+    quantidade = 0
+    if redividir:
+        quantidade = st.number_input('NÚMERO DE PARCELAS (0 = MANTER A QUANTIDADE EM ABERTO)', min_value=0, max_value=360, value=0, step=1)
+
+    # A prévia só vale para os clientes e parâmetros com que foi gerada
+    parametros = (tuple(codigos), int(meses), redividir, int(quantidade))
+    if st.button('VER PRÉVIA', disabled=not codigos):
+        diferenca, resumo = previa_renegociacao(codigos, int(meses), redividir, int(quantidade) or None)
+        st.session_state.previa_renegociacao = (parametros, diferenca, resumo)
+    previa = st.session_state.previa_renegociacao
+    if previa is not None and previa[0] == parametros:
+        _, diferenca, resumo = previa
+        resumo = resumo.assign(nome=resumo['codigo_cliente'].map(nomes_clientes))
+        for coluna in ('saldo_antes', 'saldo_depois'):
+            resumo[coluna] = formatar_valores(resumo[coluna])
+        st.write(f'**RESUMO POR CLIENTE ({len(resumo)})**')
+        st.dataframe(resumo[['codigo_cliente', 'nome', 'parcelas_antes', 'saldo_antes', 'parcelas_depois', 'saldo_depois']], hide_index=True)
+
+        contagem = diferenca['acao'].value_counts()
+        st.write(f"**PARCELAS ALTERADAS:** {contagem.get('ALTERAR', 0)} / **INCLUÍDAS:** {contagem.get('INCLUIR', 0)} / "
+                 f"**EXCLUÍDAS:** {contagem.get('EXCLUIR', 0)}")
+        exibicao = diferenca.copy()
+        for coluna in ('valor_antes', 'valor_depois'):
+            exibicao[coluna] = formatar_valores(exibicao[coluna])  # parcela incluída/excluída: lado vazio
+        for coluna in ('data_antes', 'data_depois'):
+            exibicao[coluna] = formatar_datas(exibicao[coluna])
+        st.dataframe(exibicao, hide_index=True)
+
+        if diferenca.empty:
+            st.info('NENHUMA PARCELA SERÁ ALTERADA.')
+        elif st.button('CONFIRMAR RENEGOCIAÇÃO'):
+            try:
+                with medir('gravar renegociação'):
+                    feitas = aplicar_renegociacao(diferenca)
+            except ErroRenegociacao as exc:
+                st.error(str(exc))
+            else:
+                st.session_state.previa_renegociacao = None
+                st.success(f"RENEGOCIAÇÃO GRAVADA: {feitas['ALTERAR']} PARCELA(S) ALTERADA(S), {feitas['INCLUIR']} INCLUÍDA(S) "
+                           f"E {feitas['EXCLUIR']} EXCLUÍDA(S).")
+
+elif page == 'EXTRATOS EM LOTE':
+    st.header('EXTRATOS DOS CLIENTES COM PARCELAS EM ABERTO')
+
+    if st.button('GERAR EXTRATOS'):
+        from extratos_lote import gerar_extratos_zip, processos_padrao
+        barra = st.progress(0.0)
+        zip_buffer = io.BytesIO()
+        with medir('gerar extratos'):
+            resultado = gerar_extratos_zip(zip_buffer, processos_padrao(),
+                                           lambda feitos, total: barra.progress(feitos / total, text=f'{feitos}/{total} EXTRATOS'))
+        st.success(f'{resultado.extratos} EXTRATOS ({resultado.paginas} PÁGINAS) GERADOS EM {resultado.segundos:.1f}s '
+                   f'({resultado.paginas_por_segundo:.1f} PÁGINAS/S)')
+        st.download_button('Baixar ZIP', zip_buffer.getvalue(), file_name=f"extratos_{datetime.today().strftime('%Y_%m')}.zip", mime='application/zip')
+
+st.session_state.rerun_atual.finalizar()
+marcar_primeira_renderizacao()
@@ -0,0 +1,957 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import random
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backup_excel import ExcelBackupWriter
+from query_cache import QueryCache
+from formatacao import nomes_meses
+from instrumentacao import medir, cronometrar
+
+# Tamanho máximo do pool de conexões por arquivo de banco
+POOL_SIZE = 8
+
+# Configuração aplicada a cada conexão nova do pool.
+# WAL permite leituras simultâneas a uma escrita, e com ele synchronous=NORMAL
+# continua seguro contra corrupção (só o último commit pode ser perdido numa queda de energia).
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-32000',     # ~32 MB de cache de páginas por conexão
+    'PRAGMA mmap_size=268435456',   # 256 MB mapeados em memória
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=2000',     # espera curta no SQLite; acima disso entra a política de retentativa
+)
+
+# Número de comandos preparados mantidos em cache por conexão. Como as conexões
+# do pool vivem o processo inteiro, as consultas abaixo (sempre o mesmo texto SQL)
+# são compiladas uma única vez por conexão e reaproveitadas nas execuções seguintes.
+CACHED_STATEMENTS = 256
+
+# Função para obter o caminho relativo ao executável
+def resource_path(relative_path):
+    """ Get the absolute path to the resource, works for dev and for PyInstaller """
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+DB_PATH = resource_path('clientes.db')
+EXCEL_BACKUP_PATH = 'backup_clientes.xlsx'
+
+# Escritórios: um arquivo de banco por escritório, listados em escritorios.json (ou no arquivo
+# indicado em HONORARIOS_ESCRITORIOS), por exemplo:
+#   [{"prefixo": "", "nome": "MATRIZ", "banco": "clientes.db"},
+#    {"prefixo": "SP", "nome": "SÃO PAULO", "banco": "clientes_sp.db"}]
+# O código de cada cliente começa com o prefixo do seu escritório (SP0001) e é por ele que
+# leituras e gravações de um cliente vão para o banco certo. Sem o arquivo, há um único
+# escritório, sem prefixo, no DB_PATH.
+ESCRITORIOS_PATH = os.environ.get('HONORARIOS_ESCRITORIOS', resource_path('escritorios.json'))
+
+Escritorio = namedtuple('Escritorio', 'prefixo nome banco')
+
+# Função para ler a configuração dos escritórios (lista vazia se o arquivo não existir)
+def carregar_escritorios(path=ESCRITORIOS_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    escritorios = []
+    for item in config:
+        prefixo = item.get('prefixo', '').upper()
+        if not re.fullmatch(r'[A-Z]*', prefixo):
+            raise ValueError(f'Prefixo de escritório inválido: {prefixo!r} (use apenas letras)')
+        if any(e.prefixo == prefixo for e in escritorios):
+            raise ValueError(f'Prefixo de escritório repetido: {prefixo!r}')
+        banco = os.path.join(os.path.dirname(os.path.abspath(path)), item['banco'])
+        escritorios.append(Escritorio(prefixo, item.get('nome', prefixo), banco))
+    return escritorios
+
+ESCRITORIOS = carregar_escritorios()
+if ESCRITORIOS:
+    DB_PATH = ESCRITORIOS[0].banco  # O primeiro escritório é o padrão de quem não escolhe um
+
+def escritorios():
+    return ESCRITORIOS or [Escritorio('', 'ESCRITÓRIO', DB_PATH)]
+
+# Prefixo de um código de cliente: as letras antes dos dígitos ('SP0001' -> 'SP')
+def prefixo_do_codigo(codigo):
+    return re.match(r'\D*', str(codigo)).group().upper()
+
+def escritorio_por_prefixo(prefixo=None):
+    lista = escritorios()
+    if prefixo is None or len(lista) == 1:
+        return lista[0]
+    for escritorio in lista:
+        if escritorio.prefixo == prefixo:
+            return escritorio
+    raise ValueError(f'Nenhum escritório com o prefixo {prefixo!r}')
+
+# Banco do escritório dono do cliente
+def banco_do_codigo(codigo):
+    return escritorio_por_prefixo(prefixo_do_codigo(codigo)).banco
+
+# Threads das consultas feitas em todos os escritórios ao mesmo tempo
+_executor = None
+_executor_lock = threading.Lock()
+
+def _executor_escritorios():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='escritorios')
+    return _executor
+
+# Executa `consulta(escritorio)` em todos os escritórios ao mesmo tempo e devolve os resultados
+# na ordem dos escritórios. O SQLite libera o GIL enquanto lê, então o tempo total fica perto
+# do tempo do escritório mais lento. Com um só escritório, roda direto nesta thread.
+def consultar_escritorios(consulta):
+    lista = escritorios()
+    if len(lista) == 1:
+        return [consulta(lista[0])]
+    with medir('consultar escritórios', 'escritorios') as span:
+        resultados = list(_executor_escritorios().map(consulta, lista))
+        span.linhas = len(lista)
+    return resultados
+
+
+# Conexão que cronometra cada comando executado diretamente (execute/executemany/commit).
+# As leituras via pandas passam por read_sql_conn, que também conta as linhas devolvidas.
+class TimedConnection(sqlite3.Connection):
+    def execute(self, sql, parameters=()):
+        with medir('execute', 'sql', sql) as span:
+            cursor = super().execute(sql, parameters)
+            if cursor.rowcount >= 0:
+                span.linhas = cursor.rowcount
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        with medir('executemany', 'sql', sql) as span:
+            cursor = super().executemany(sql, seq_of_parameters)
+            span.linhas = cursor.rowcount
+        return cursor
+
+    def commit(self):
+        with medir('COMMIT', 'sql'):
+            super().commit()
+
+
+# Pool de conexões SQLite compartilhado pelas threads do Streamlit
+class ConnectionPool:
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                               cached_statements=CACHED_STATEMENTS, factory=TimedConnection)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if not create:
+            # Pool esgotado: espera uma conexão ser devolvida
+            return self._idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_local = threading.local()
+
+# Função para obter o pool de um arquivo de banco (um por processo)
+def get_pool(path=None):
+    path = path or DB_PATH
+    pool = _pools.get(path)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(path)
+            if pool is None:
+                pool = _pools[path] = ConnectionPool(path)
+    return pool
+
+# Empresta uma conexão do pool. Chamadas aninhadas na mesma thread reutilizam a
+# mesma conexão, para que uma função de dados possa chamar outra sem esgotar o pool.
+@contextmanager
+def get_connection(path=None):
+    pool = get_pool(path)
+    held = getattr(_local, 'held', None)
+    if held is None:
+        held = _local.held = {}
+    entry = held.get(pool.path)
+    if entry is not None:
+        entry[1] += 1
+        try:
+            yield entry[0]
+        finally:
+            entry[1] -= 1
+        return
+    conn = pool.acquire()
+    held[pool.path] = [conn, 1]
+    try:
+        yield conn
+    finally:
+        del held[pool.path]
+        pool.release(conn)
+
+# Executa um bloco de escrita numa transação: commit ao sair, rollback em caso de erro.
+# A transação começa com BEGIN IMMEDIATE, que reserva a escrita logo no início; assim leituras
+# feitas dentro dela (ex.: o próximo código) não podem ser invalidadas por outro escritor.
+# Transações aninhadas na mesma thread participam da transação externa.
+@contextmanager
+def transaction(path=None):
+    with get_connection(path) as conn:
+        depth = getattr(_local, 'tx_depth', 0)
+        if depth == 0:
+            conn.execute('BEGIN IMMEDIATE')
+        _local.tx_depth = depth + 1
+        try:
+            yield conn
+            if depth == 0:
+                conn.commit()
+                bump_write_generation()
+        except BaseException:
+            if depth == 0:
+                conn.rollback()
+            raise
+        finally:
+            _local.tx_depth = depth
+
+# Política de retentativa para gravações que encontram o banco bloqueado por outro usuário:
+# espera exponencial com jitter, limitada em tentativas e no tempo de cada espera.
+class RetryPolicy:
+    def __init__(self, attempts=8, base_delay=0.05, max_delay=2.0):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self.lock_waits = 0
+        self.lock_wait_seconds = 0.0
+        self.failures = 0
+
+    def delay(self, attempt):
+        # "Full jitter": sorteia entre zero e o teto exponencial, para escritores não colidirem de novo
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def __call__(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(self.attempts):
+                try:
+                    return func(*args, **kwargs)
+                except sqlite3.OperationalError as exc:
+                    # Dentro de uma transação externa quem decide é o bloco externo
+                    if not is_lock_error(exc) or getattr(_local, 'tx_depth', 0) or attempt == self.attempts - 1:
+                        if is_lock_error(exc):
+                            with self._lock:
+                                self.failures += 1
+                        raise
+                    started = time.perf_counter()
+                    time.sleep(self.delay(attempt))
+                    with self._lock:
+                        self.lock_waits += 1
+                        self.lock_wait_seconds += time.perf_counter() - started
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            return {
+                'lock_waits': self.lock_waits,
+                'lock_wait_seconds': self.lock_wait_seconds,
+                'failures': self.failures,
+            }
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'locked' in message or 'busy' in message
+
+retry_on_lock = RetryPolicy()
+
+
+_write_generation = 0
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+# Contador incrementado a cada commit feito por este processo
+def bump_write_generation():
+    global _write_generation
+    with _watchers_lock:
+        _write_generation += 1
+
+# Versão atual dos dados: o contador de gravações deste processo somado ao PRAGMA data_version
+# de uma conexão que só lê. O data_version muda sempre que outra conexão (deste ou de outro
+# processo) faz commit no arquivo, então também detecta gravações feitas fora do app.
+def data_version(path=None):
+    path = path or DB_PATH
+    with _watchers_lock:
+        watcher = _watchers.get(path)
+        if watcher is None:
+            watcher = _watchers[path] = sqlite3.connect(path, check_same_thread=False)
+        return (_write_generation, watcher.execute('PRAGMA data_version').fetchone()[0])
+
+# Versão dos dados de todos os escritórios
+def versao_escritorios():
+    lista = escritorios()
+    if len(lista) == 1:
+        return data_version(lista[0].banco)
+    return tuple(data_version(escritorio.banco) for escritorio in lista)
+
+# Cache das funções de leitura, invalidado quando a versão dos dados muda
+query_cache = QueryCache(versao_escritorios)
+
+# Função para executar uma consulta e devolver um DataFrame
+def read_sql(query, params=(), path=None):
+    with get_connection(path) as conn:
+        return read_sql_conn(conn, query, params)
+
+# Mesma coisa numa conexão já aberta, cronometrando a consulta e registrando as linhas devolvidas
+def read_sql_conn(conn, query, params=()):
+    with medir('read_sql', 'sql', query) as span:
+        df = pd.read_sql_query(query, conn, params=params)
+        span.linhas = len(df)
+    return df
+
+# Mesma consulta em todos os escritórios, ao mesmo tempo, com os resultados juntados. Com mais
+# de um escritório entra a coluna 'escritorio' e, se informada, a ordenação é refeita em `ordem`.
+def read_sql_escritorios(query, params=(), ordem=None):
+    if len(escritorios()) == 1:
+        return read_sql(query, params)
+    def consulta(escritorio):
+        df = read_sql(query, params, escritorio.banco)
+        df.insert(0, 'escritorio', escritorio.nome)
+        return df
+    df = pd.concat(consultar_escritorios(consulta), ignore_index=True)
+    if ordem:
+        df = df.sort_values(ordem, kind='stable', ignore_index=True)
+    return df
+
+
+SQL_INSERT_CLIENTE = ('INSERT INTO clientes (codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro) '
+                      'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+SQL_UPDATE_CLIENTE = ('UPDATE clientes SET nome=?, contato=?, cpf=?, senha_egov=?, tipo_acao=?, valor_honorarios=?, resumo_caso=?, data_cadastro=? '
+                      'WHERE codigo=?')
+SQL_DELETE_CLIENTE = 'DELETE FROM clientes WHERE codigo=?'
+SQL_INSERT_PARCELA = ('INSERT INTO parcelas (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, conta_deposito, pago) '
+                      'VALUES (?, ?, ?, ?, ?, COALESCE(?, 0))')
+SQL_MAX_PARCELA = 'SELECT MAX(numero_parcela) FROM parcelas WHERE codigo_cliente = ?'
+SQL_UPDATE_PARCELA = ('UPDATE parcelas SET valor_parcela=?, data_pagamento=?, tipo_pagamento=?, conta_deposito=?, pago=COALESCE(?, 0) '
+                      'WHERE codigo_cliente=? AND numero_parcela=?')
+SQL_SELECT_CLIENTES = 'SELECT * FROM clientes'
+SQL_LISTA_CLIENTES = 'SELECT codigo, nome, tipo_acao FROM clientes ORDER BY codigo'
+SQL_SELECT_CLIENTE = 'SELECT * FROM clientes WHERE codigo = ?'
+SQL_SELECT_PARCELAS_CLIENTE = 'SELECT * FROM parcelas WHERE codigo_cliente = ? ORDER BY numero_parcela'
+SQL_SELECT_PARCELAS = 'SELECT * FROM parcelas'
+SQL_SELECT_PARCELAS_COM_CLIENTE = '''
+    SELECT p.codigo_cliente, p.numero_parcela, p.valor_parcela, p.data_pagamento, p.conta_deposito, p.pago, c.nome
+    FROM parcelas p
+    JOIN clientes c ON p.codigo_cliente = c.codigo
+    '''
+
+# Função para criar ou atualizar a tabela no banco de dados
+# (as migrações numeradas em MIGRACOES, mais o prefixo dos códigos do escritório)
+def create_or_update_table(path=None, prefixo=''):
+    migrar(path)
+    if prefixo:
+        with get_connection(path) as conn:
+            pendente = prefixo_pendente(conn)
+        if pendente:
+            backup_antes_de_migrar(path, 'prefixo')
+            with transaction(path) as conn:
+                aplicar_prefixo_codigos(conn, prefixo)
+
+def create_tables(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS clientes
+                 (codigo TEXT PRIMARY KEY, nome TEXT, contato TEXT, cpf TEXT, senha_egov TEXT, tipo_acao TEXT,
+                  valor_honorarios REAL, resumo_caso TEXT, data_cadastro TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS parcelas
+                 (codigo_cliente TEXT, numero_parcela INTEGER, valor_parcela REAL, data_pagamento TEXT, tipo_pagamento TEXT, conta_deposito TEXT, pago BOOLEAN, PRIMARY KEY (codigo_cliente, numero_parcela))''')
+
+def create_indexes(conn):
+    for sql in INDEXES:
+        conn.execute(sql)
+
+def versao_esquema(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+# Função para aplicar as migrações pendentes de um banco; devolve as versões aplicadas
+def migrar(path=None):
+    with get_connection(path) as conn:
+        atual = versao_esquema(conn)
+    if atual > VERSAO_ESQUEMA:
+        raise RuntimeError(f'O banco {path or DB_PATH} está na versão {atual} do esquema, mais nova que a deste '
+                           f'programa ({VERSAO_ESQUEMA}). Atualize o programa.')
+    aplicadas = []
+    for migracao in MIGRACOES:
+        if migracao.versao <= atual:
+            continue
+        with get_connection(path) as conn:
+            destrutiva = migracao.destrutiva(conn) if versao_esquema(conn) < migracao.versao else False
+        if destrutiva:
+            backup_antes_de_migrar(path, f'v{migracao.versao}')
+        with medir(f'migração {migracao.versao}: {migracao.descricao}', 'migracao'), transaction(path) as conn:
+            # Outro processo pode ter aplicado esta migração enquanto esperávamos pela escrita
+            if versao_esquema(conn) >= migracao.versao:
+                continue
+            migracao.aplicar(conn)
+            conn.execute(f'PRAGMA user_version = {int(migracao.versao)}')
+        aplicadas.append(migracao.versao)
+    return aplicadas
+
+# Snapshot do banco antes de uma migração que reescreve dados (ver snapshots.py)
+def backup_antes_de_migrar(path, motivo):
+    from snapshots import criar_snapshot
+    return criar_snapshot(motivo=f'antes_migracao_{motivo}', banco=path)
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
+# Cria/atualiza o esquema uma única vez por processo e arquivo de banco (de cada escritório).
+# O script do Streamlit roda de novo a cada interação; só o primeiro rerun abre as transações.
+def ensure_schema():
+    for escritorio in escritorios():
+        if escritorio.banco in _schema_ready:
+            continue
+        with _schema_lock:
+            if escritorio.banco not in _schema_ready:
+                create_or_update_table(escritorio.banco, escritorio.prefixo)
+                _schema_ready.add(escritorio.banco)
+
+# Índices das consultas de relatório. A chave primária de parcelas já atende as buscas por
+# codigo_cliente; o índice parcial cobre só as parcelas em aberto, que é o que os relatórios varrem.
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_parcelas_pago_data ON parcelas (pago, data_pagamento)',
+    'CREATE INDEX IF NOT EXISTS idx_parcelas_abertas ON parcelas (data_pagamento, codigo_cliente) WHERE pago = 0',
+)
+
+def datas_pendentes(conn):
+    return conn.execute("""SELECT 1 FROM parcelas WHERE data_pagamento LIKE '__/__/____'
+                           UNION ALL SELECT 1 FROM clientes WHERE data_cadastro LIKE '__/__/____' LIMIT 1""").fetchone() is not None
+
+# Função para converter as datas gravadas como 'dd/mm/YYYY' para o formato ISO 'YYYY-MM-DD',
+# que ordena como texto e permite filtrar intervalos de datas direto no SQL
+def migrate_dates_to_iso(conn):
+    if not datas_pendentes(conn):
+        return
+    # Os gatilhos do resumo mensal não devem contar a conversão como alteração de valores
+    for nome in RESUMO_MENSAL_TRIGGERS:
+        conn.execute(f'DROP TRIGGER IF EXISTS {nome}')
+    conn.execute("""UPDATE parcelas
+                    SET data_pagamento = substr(data_pagamento, 7, 4) || '-' || substr(data_pagamento, 4, 2) || '-' || substr(data_pagamento, 1, 2)
+                    WHERE data_pagamento LIKE '__/__/____'""")
+    conn.execute("""UPDATE clientes
+                    SET data_cadastro = substr(data_cadastro, 7, 4) || '-' || substr(data_cadastro, 4, 2) || '-' || substr(data_cadastro, 1, 2)
+                    WHERE data_cadastro LIKE '__/__/____'""")
+
+# Totais de parcelas pagas e não pagas por mês/ano, mantidos pelos gatilhos da tabela parcelas.
+# As páginas PARCELAS PAGAS e VALORES A RECEBER leem daqui em vez de agrupar todas as parcelas.
+# A linha do mês é criada com INSERT ... WHERE NOT EXISTS em vez de INSERT OR IGNORE porque,
+# dentro de um gatilho, a política de conflito do comando externo (ex.: um upsert) prevalece.
+RESUMO_MENSAL_TRIGGERS = {
+    'trg_parcelas_resumo_insert': '''
+        CREATE TRIGGER trg_parcelas_resumo_insert AFTER INSERT ON parcelas
+        WHEN NEW.data_pagamento IS NOT NULL
+        BEGIN
+            INSERT INTO resumo_mensal (pago, mes, ano, total, quantidade)
+            SELECT COALESCE(NEW.pago, 0) <> 0, CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER), CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER), 0, 0
+            WHERE NOT EXISTS (SELECT 1 FROM resumo_mensal
+                              WHERE pago = (COALESCE(NEW.pago, 0) <> 0)
+                                AND mes = CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER)
+                                AND ano = CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER));
+            UPDATE resumo_mensal SET total = total + COALESCE(NEW.valor_parcela, 0), quantidade = quantidade + 1
+            WHERE pago = (COALESCE(NEW.pago, 0) <> 0)
+              AND mes = CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER)
+              AND ano = CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER);
+        END''',
+    'trg_parcelas_resumo_delete': '''
+        CREATE TRIGGER trg_parcelas_resumo_delete AFTER DELETE ON parcelas
+        WHEN OLD.data_pagamento IS NOT NULL
+        BEGIN
+            UPDATE resumo_mensal SET total = total - COALESCE(OLD.valor_parcela, 0), quantidade = quantidade - 1
+            WHERE pago = (COALESCE(OLD.pago, 0) <> 0)
+              AND mes = CAST(substr(OLD.data_pagamento, 6, 2) AS INTEGER)
+              AND ano = CAST(substr(OLD.data_pagamento, 1, 4) AS INTEGER);
+        END''',
+    'trg_parcelas_resumo_update': '''
+        CREATE TRIGGER trg_parcelas_resumo_update AFTER UPDATE OF valor_parcela, data_pagamento, pago ON parcelas
+        BEGIN
+            UPDATE resumo_mensal SET total = total - COALESCE(OLD.valor_parcela, 0), quantidade = quantidade - 1
+            WHERE OLD.data_pagamento IS NOT NULL
+              AND pago = (COALESCE(OLD.pago, 0) <> 0)
+              AND mes = CAST(substr(OLD.data_pagamento, 6, 2) AS INTEGER)
+              AND ano = CAST(substr(OLD.data_pagamento, 1, 4) AS INTEGER);
+            INSERT INTO resumo_mensal (pago, mes, ano, total, quantidade)
+            SELECT COALESCE(NEW.pago, 0) <> 0, CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER), CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER), 0, 0
+            WHERE NEW.data_pagamento IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM resumo_mensal
+                              WHERE pago = (COALESCE(NEW.pago, 0) <> 0)
+                                AND mes = CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER)
+                                AND ano = CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER));
+            UPDATE resumo_mensal SET total = total + COALESCE(NEW.valor_parcela, 0), quantidade = quantidade + 1
+            WHERE NEW.data_pagamento IS NOT NULL
+              AND pago = (COALESCE(NEW.pago, 0) <> 0)
+              AND mes = CAST(substr(NEW.data_pagamento, 6, 2) AS INTEGER)
+              AND ano = CAST(substr(NEW.data_pagamento, 1, 4) AS INTEGER);
+        END''',
+}
+
+# Índice de texto completo da CONSULTA DE CLIENTES, mantido pelos gatilhos da tabela clientes.
+# O rowid de cada linha do índice é o rowid do cliente; o CPF é indexado só com os dígitos e
+# o tokenizador ignora acentos, então 'joao' encontra 'JOÃO'.
+BUSCA_CPF_DIGITOS = "replace(replace(replace({0}.cpf, '.', ''), '-', ''), ' ', '')"
+BUSCA_TRIGGERS = {
+    'trg_clientes_busca_insert': f'''
+        CREATE TRIGGER trg_clientes_busca_insert AFTER INSERT ON clientes
+        BEGIN
+            INSERT INTO clientes_busca (rowid, codigo, nome, cpf, tipo_acao, resumo_caso)
+            VALUES (NEW.rowid, NEW.codigo, NEW.nome, {BUSCA_CPF_DIGITOS.format('NEW')}, NEW.tipo_acao, NEW.resumo_caso);
+        END''',
+    'trg_clientes_busca_delete': '''
+        CREATE TRIGGER trg_clientes_busca_delete AFTER DELETE ON clientes
+        BEGIN
+            DELETE FROM clientes_busca WHERE rowid = OLD.rowid;
+        END''',
+    'trg_clientes_busca_update': f'''
+        CREATE TRIGGER trg_clientes_busca_update AFTER UPDATE ON clientes
+        BEGIN
+            DELETE FROM clientes_busca WHERE rowid = OLD.rowid;
+            INSERT INTO clientes_busca (rowid, codigo, nome, cpf, tipo_acao, resumo_caso)
+            VALUES (NEW.rowid, NEW.codigo, NEW.nome, {BUSCA_CPF_DIGITOS.format('NEW')}, NEW.tipo_acao, NEW.resumo_caso);
+        END''',
+}
+
+# Função para criar o índice de busca e preenchê-lo a partir dos clientes existentes
+def create_busca_clientes(conn):
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clientes_busca'").fetchone()
+    if not existe:
+        conn.execute('''CREATE VIRTUAL TABLE clientes_busca USING fts5
+                     (codigo UNINDEXED, nome, cpf, tipo_acao, resumo_caso,
+                      tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')''')
+        rebuild_busca_clientes(conn)
+    for nome, sql in BUSCA_TRIGGERS.items():
+        atual = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nome,)).fetchone()
+        if atual is None or atual[0] != sql.strip():
+            conn.execute(f'DROP TRIGGER IF EXISTS {nome}')
+            conn.execute(sql)
+
+# Função para reconstruir o índice de busca (necessário se os rowids de clientes mudarem, ex.: após VACUUM)
+def rebuild_busca_clientes(conn):
+    conn.execute('DELETE FROM clientes_busca')
+    conn.execute(f'''INSERT INTO clientes_busca (rowid, codigo, nome, cpf, tipo_acao, resumo_caso)
+                     SELECT rowid, codigo, nome, {BUSCA_CPF_DIGITOS.format('clientes')}, tipo_acao, resumo_caso FROM clientes''')
+
+# Função para criar a tabela de resumo mensal e preenchê-la a partir das parcelas existentes
+def create_resumo_mensal(conn):
+    existe = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'resumo_mensal'").fetchone()
+    if not existe:
+        conn.execute('''CREATE TABLE resumo_mensal
+                     (pago INTEGER, mes INTEGER, ano INTEGER, total REAL, quantidade INTEGER, PRIMARY KEY (pago, mes, ano)) WITHOUT ROWID''')
+        conn.execute('''INSERT INTO resumo_mensal (pago, mes, ano, total, quantidade)
+                     SELECT COALESCE(pago, 0) <> 0, CAST(substr(data_pagamento, 6, 2) AS INTEGER), CAST(substr(data_pagamento, 1, 4) AS INTEGER),
+                            SUM(COALESCE(valor_parcela, 0)), COUNT(*)
+                     FROM parcelas WHERE data_pagamento IS NOT NULL
+                     GROUP BY 1, 2, 3''')
+    # Recria os gatilhos que não existem ou cuja definição mudou
+    for nome, sql in RESUMO_MENSAL_TRIGGERS.items():
+        atual = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (nome,)).fetchone()
+        if atual is None or atual[0] != sql.strip():
+            conn.execute(f'DROP TRIGGER IF EXISTS {nome}')
+            conn.execute(sql)
+
+def prefixo_pendente(conn):
+    return conn.execute("SELECT 1 FROM clientes WHERE codigo GLOB '[0-9]*' LIMIT 1").fetchone() is not None
+
+# Função para acrescentar o prefixo do escritório aos códigos antigos, só com dígitos (um banco
+# que existia antes de o escritório entrar na configuração)
+def aplicar_prefixo_codigos(conn, prefixo):
+    if not prefixo_pendente(conn):
+        return
+    conn.execute("UPDATE parcelas SET codigo_cliente = ? || codigo_cliente WHERE codigo_cliente GLOB '[0-9]*'", (prefixo,))
+    conn.execute("UPDATE clientes SET codigo = ? || codigo WHERE codigo GLOB '[0-9]*'", (prefixo,))
+
+# Sequência dos códigos de cliente. O próximo código é reservado dentro da própria transação
+# de inclusão, então dois cadastros simultâneos nunca recebem o mesmo código.
+def create_sequencias(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS sequencias (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)')
+    conn.execute('''INSERT INTO sequencias (nome, valor)
+                    SELECT 'clientes', (SELECT COALESCE(MAX(CAST(ltrim(upper(codigo), 'ABCDEFGHIJKLMNOPQRSTUVWXYZ') AS INTEGER)), 0) FROM clientes)
+                    WHERE NOT EXISTS (SELECT 1 FROM sequencias WHERE nome = 'clientes')''')
+
+# Parcelas com pago NULL (cadastros antigos, planilhas importadas) contam como em aberto. Em vez de
+# COALESCE em cada consulta, o NULL vira 0 no banco: os relatórios, o índice parcial das parcelas
+# em aberto (pago = 0) e o resumo mensal passam a ver as mesmas parcelas. As gravações do
+# aplicativo também gravam 0 no lugar de NULL (COALESCE nos INSERT/UPDATE de parcelas).
+def pago_nulo_pendente(conn):
+    return conn.execute('SELECT 1 FROM parcelas WHERE pago IS NULL LIMIT 1').fetchone() is not None
+
+def normalizar_pago_nulo(conn):
+    conn.execute('UPDATE parcelas SET pago = 0 WHERE pago IS NULL')
+
+# Migrações do esquema, em ordem. O número da última aplicada fica no PRAGMA user_version do
+# arquivo, gravado na mesma transação da migração: cada uma roda uma única vez por banco, e um
+# banco já atualizado não abre nenhuma transação ao iniciar. Bancos de antes das migrações
+# (user_version 0) passam por todas; os passos já existentes nesses bancos não mudam nada.
+# `destrutiva` diz se a migração vai reescrever dados neste banco; se sim, um snapshot é feito antes.
+# Uma mudança de esquema nova entra como uma migração nova no fim da lista, nunca editando as antigas.
+Migracao = namedtuple('Migracao', 'versao descricao aplicar destrutiva')
+
+def _nunca(conn):
+    return False
+
+MIGRACOES = (
+    Migracao(1, 'tabelas clientes e parcelas', create_tables, _nunca),
+    Migracao(2, 'datas no formato ISO', migrate_dates_to_iso, datas_pendentes),
+    Migracao(3, 'resumo mensal e gatilhos', create_resumo_mensal, _nunca),
+    Migracao(4, 'índice de busca de clientes', create_busca_clientes, _nunca),
+    Migracao(5, 'sequência dos códigos de cliente', create_sequencias, _nunca),
+    Migracao(6, 'índices dos relatórios', create_indexes, _nunca),
+    Migracao(7, 'pago nulo como parcela em aberto', normalizar_pago_nulo, pago_nulo_pendente),
+)
+VERSAO_ESQUEMA = MIGRACOES[-1].versao
+
+# Função para reservar `quantidade` códigos de cliente; deve ser chamada dentro de transaction().
+# O prefixo padrão é o do escritório padrão (o banco de transaction() sem argumento).
+def reservar_codigos(conn, quantidade=1, prefixo=None):
+    prefixo = escritorio_por_prefixo().prefixo if prefixo is None else prefixo
+    conn.execute("UPDATE sequencias SET valor = valor + ? WHERE nome = 'clientes'", (quantidade,))
+    ultimo = conn.execute("SELECT valor FROM sequencias WHERE nome = 'clientes'").fetchone()[0]
+    return [f'{prefixo}{codigo:04d}' for codigo in range(ultimo - quantidade + 1, ultimo + 1)]
+
+# Função para avançar a sequência quando um código é informado explicitamente (ex.: importação)
+def avancar_sequencia(conn, codigos):
+    numericos = [int(m.group(1)) for m in (re.fullmatch(r'[A-Za-z]*(\d+)', str(codigo)) for codigo in codigos) if m]
+    if numericos:
+        conn.execute("UPDATE sequencias SET valor = MAX(valor, ?) WHERE nome = 'clientes'", (max(numericos),))
+
+# Função para mostrar o próximo código livre (só informativo; o código é reservado ao gravar)
+def proximo_codigo(prefixo=None):
+    escritorio = escritorio_por_prefixo(prefixo)
+    with get_connection(escritorio.banco) as conn:
+        row = conn.execute("SELECT valor FROM sequencias WHERE nome = 'clientes'").fetchone()
+    return f'{escritorio.prefixo}{(row[0] if row else 0) + 1:04d}'
+
+# Função para adicionar cliente no banco de dados. Sem código informado, o próximo da sequência
+# do escritório escolhido (prefixo; padrão: o primeiro) é reservado na mesma transação.
+# Devolve o código gravado.
+@retry_on_lock
+def add_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro, escritorio=None):
+    data_cadastro_str = data_cadastro.strftime('%Y-%m-%d')  # Convertendo datetime.date para string
+    escritorio = escritorio_por_prefixo(escritorio if codigo is None else prefixo_do_codigo(codigo))
+    with transaction(escritorio.banco) as conn:
+        if codigo is None:
+            codigo = reservar_codigos(conn, prefixo=escritorio.prefixo)[0]
+        else:
+            avancar_sequencia(conn, [codigo])
+        conn.execute(SQL_INSERT_CLIENTE,
+                     (codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro_str))
+    excel_backup.request()
+    return codigo
+
+# Função para carregar dados do banco de dados
+@query_cache.cached
+def load_data():
+    return read_sql_escritorios(SQL_SELECT_CLIENTES)
+
+# Texto em memória contígua do Arrow quando o pyarrow está instalado; sem ele, strings repetidas
+# passam a ser o mesmo objeto Python
+try:
+    import pyarrow  # noqa: F401
+    TEXTO_COMPACTO = 'string[pyarrow]'
+except ImportError:
+    TEXTO_COMPACTO = None
+
+def texto_compacto(serie):
+    if TEXTO_COMPACTO:
+        return serie.astype(TEXTO_COMPACTO)
+    codigos, unicos = pd.factorize(serie)
+    return pd.Series(unicos.take(codigos), index=serie.index, dtype=object).where(codigos >= 0, None)
+
+# Função para carregar a listagem de clientes (código, nome e tipo de ação), sem o resumo do caso
+# e a senha. tipo_acao tem poucos valores diferentes e vira categoria.
+@query_cache.cached
+def load_lista_clientes():
+    df = read_sql_escritorios(SQL_LISTA_CLIENTES, ordem='codigo')
+    df['codigo'] = texto_compacto(df['codigo'])
+    df['nome'] = texto_compacto(df['nome'])
+    df['tipo_acao'] = df['tipo_acao'].astype('category')
+    return df
+
+# Função para carregar todos os dados de um cliente, pela chave primária no banco do escritório dele
+@query_cache.cached
+def load_cliente(codigo):
+    return read_sql(SQL_SELECT_CLIENTE, (codigo,), banco_do_codigo(codigo))
+
+# Função para carregar parcelas do banco de dados
+@query_cache.cached
+def load_parcelas(codigo_cliente):
+    return read_sql(SQL_SELECT_PARCELAS_CLIENTE, (codigo_cliente,), banco_do_codigo(codigo_cliente))
+
+# Função para carregar todas as parcelas do banco de dados
+@query_cache.cached
+def load_all_parcelas():
+    return read_sql_escritorios(SQL_SELECT_PARCELAS)
+
+# Função para carregar todas as parcelas com detalhes dos clientes
+@query_cache.cached
+def load_all_parcelas_with_client_details():
+    df = read_sql_escritorios(SQL_SELECT_PARCELAS_COM_CLIENTE)
+    df['data_pagamento'] = pd.to_datetime(df['data_pagamento'], format='%Y-%m-%d')
+    return df
+
+SQL_RESUMO_MENSAL = 'SELECT mes, ano, total AS valor_parcela FROM resumo_mensal WHERE pago = ? AND quantidade > 0 ORDER BY mes, ano'
+SQL_SELECT_PARCELAS_VENCIDAS = '''
+    SELECT c.nome, p.numero_parcela, p.valor_parcela, p.data_pagamento, p.conta_deposito
+    FROM parcelas p
+    JOIN clientes c ON p.codigo_cliente = c.codigo
+    WHERE p.pago = 0 AND p.data_pagamento <= ?
+    ORDER BY p.data_pagamento
+    '''
+SQL_SELECT_A_RECEBER = '''
+    SELECT c.nome, p.valor_parcela, p.data_pagamento
+    FROM parcelas p
+    JOIN clientes c ON p.codigo_cliente = c.codigo
+    WHERE p.pago = 0 AND p.data_pagamento BETWEEN ? AND ? AND (? IS NULL OR substr(p.data_pagamento, 6, 2) = ?)
+    ORDER BY p.data_pagamento
+    '''
+
+SQL_BUSCA_CLIENTES = '''
+    SELECT c.codigo, c.nome, c.tipo_acao, bm25(clientes_busca, 0.0, 10.0, 8.0, 3.0, 1.0) AS relevancia
+    FROM clientes_busca b
+    JOIN clientes c ON c.rowid = b.rowid
+    WHERE clientes_busca MATCH ?
+    ORDER BY relevancia, c.codigo
+    LIMIT ? OFFSET ?
+    '''
+SQL_BUSCA_CLIENTES_TOTAL = 'SELECT COUNT(*) FROM clientes_busca WHERE clientes_busca MATCH ?'
+
+# Função para transformar o texto digitado numa consulta FTS5: cada palavra vira um prefixo
+# ("joa"*) e todas precisam aparecer. Pontuação de CPF é removida para casar com os dígitos indexados.
+def montar_consulta_busca(termo):
+    palavras = []
+    for palavra in termo.split():
+        palavra = ''.join(ch for ch in palavra if ch.isalnum())
+        if palavra:
+            palavras.append(f'"{palavra}"*')
+    return ' '.join(palavras)
+
+# Função para buscar clientes por nome, CPF, tipo de ação ou resumo do caso, ordenados por relevância.
+# Devolve a página pedida (começando em 1) e o total de resultados.
+@query_cache.cached
+def buscar_clientes(termo, pagina=1, por_pagina=50):
+    consulta = montar_consulta_busca(termo)
+    if not consulta:
+        return pd.DataFrame(columns=['codigo', 'nome', 'tipo_acao']), 0
+    def buscar(escritorio, limite, inicio):
+        with get_connection(escritorio.banco) as conn:
+            total = conn.execute(SQL_BUSCA_CLIENTES_TOTAL, (consulta,)).fetchone()[0]
+            df = read_sql_conn(conn, SQL_BUSCA_CLIENTES, (consulta, limite, inicio))
+        return df, total
+    inicio = (pagina - 1) * por_pagina
+    if len(escritorios()) == 1:
+        df, total = buscar(escritorios()[0], por_pagina, inicio)
+    else:
+        # Cada escritório devolve seus melhores resultados até o fim da página pedida; a página
+        # sai da junção deles, ordenada pela mesma relevância
+        resultados = consultar_escritorios(lambda escritorio: buscar(escritorio, inicio + por_pagina, 0))
+        df = pd.concat([df for df, _ in resultados], ignore_index=True)
+        df = df.sort_values(['relevancia', 'codigo'], kind='stable', ignore_index=True).iloc[inicio:inicio + por_pagina]
+        total = sum(total for _, total in resultados)
+    return df.drop(columns='relevancia').reset_index(drop=True), total
+
+# Função para carregar o resumo mensal já agrupado, com o nome do mês por extenso
+@query_cache.cached
+def load_resumo_mensal(pago):
+    df = read_sql_escritorios(SQL_RESUMO_MENSAL, (int(pago),))
+    if 'escritorio' in df:
+        df = df.groupby(['mes', 'ano'], as_index=False)['valor_parcela'].sum()
+    df['mes'] = nomes_meses(df['mes'])
+    return df
+
+# Função para carregar parcelas pagas agrupadas por mês e ano
+def load_parcelas_pagas_agrupadas():
+    return load_resumo_mensal(True)
+
+# Função para carregar os totais não pagos agrupados por mês e ano
+def load_parcelas_nao_pagas_agrupadas():
+    return load_resumo_mensal(False)
+
+# Função para carregar as parcelas não pagas com vencimento até a data informada (padrão: hoje)
+def load_parcelas_vencidas(ate=None):
+    return _load_parcelas_vencidas((ate or datetime.today()).strftime('%Y-%m-%d'))
+
+@query_cache.cached
+def _load_parcelas_vencidas(ate):
+    df = read_sql_escritorios(SQL_SELECT_PARCELAS_VENCIDAS, (ate,), ordem='data_pagamento')
+    df['data_pagamento'] = pd.to_datetime(df['data_pagamento'], format='%Y-%m-%d')
+    return df
+
+# Função para carregar as parcelas a receber, filtradas por mês e/ou ano no próprio SQL
+@query_cache.cached
+def load_parcelas_a_receber(mes=None, ano=None):
+    inicio, fim = '0000-01-01', '9999-12-31'
+    if ano is not None:
+        inicio, fim = f'{ano:04d}-01-01', f'{ano:04d}-12-31'
+        if mes is not None:
+            inicio, fim = f'{ano:04d}-{mes:02d}-01', f'{ano:04d}-{mes:02d}-31'
+    mes_str = None if mes is None else f'{mes:02d}'
+    df = read_sql_escritorios(SQL_SELECT_A_RECEBER, (inicio, fim, mes_str, mes_str), ordem='data_pagamento')
+    df['data_pagamento'] = pd.to_datetime(df['data_pagamento'], format='%Y-%m-%d')
+    return df
+
+# Função para atualizar cliente no banco de dados
+@retry_on_lock
+def update_cliente(codigo, nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro):
+    data_cadastro_str = data_cadastro.strftime('%Y-%m-%d')  # Convertendo datetime.date para string
+    with transaction(banco_do_codigo(codigo)) as conn:
+        conn.execute(SQL_UPDATE_CLIENTE,
+                     (nome, contato, cpf, senha_egov, tipo_acao, valor_honorarios, resumo_caso, data_cadastro_str, codigo))
+    excel_backup.request()
+
+# Função para excluir cliente do banco de dados
+@retry_on_lock
+def delete_cliente(codigo):
+    with transaction(banco_do_codigo(codigo)) as conn:
+        conn.execute(SQL_DELETE_CLIENTE, (codigo,))
+    excel_backup.request()
+
+# Função para adicionar parcelas no banco de dados
+@retry_on_lock
+def add_parcelas(codigo_cliente, numero_parcelas, valor_parcela):
+    with transaction(banco_do_codigo(codigo_cliente)) as conn:
+        conn.executemany(SQL_INSERT_PARCELA, gerar_parcelas(codigo_cliente, numero_parcelas, valor_parcela))
+    excel_backup.request()
+
+# Função para gerar as linhas de um plano de parcelas (uma por mês, no mesmo dia de `inicio`),
+# no formato de SQL_INSERT_PARCELA
+def gerar_parcelas(codigo_cliente, numero_parcelas, valor_parcela, inicio=None):
+    inicio = np.datetime64((inicio or datetime.today()).strftime('%Y-%m-%d'), 'D')
+    datas = somar_meses(inicio, np.arange(numero_parcelas)).astype(str)
+    return [(codigo_cliente, i, valor_parcela, data, None, False) for i, data in enumerate(datas.tolist(), start=1)]
+
+# Função para somar meses de calendário a datas (arrays datetime64[D] ou escalares). O dia é
+# mantido; quando o mês de destino é mais curto, vai para o último dia (31/01 + 1 mês = 28/02 ou 29/02).
+def somar_meses(datas, meses):
+    datas = np.asarray(datas, dtype='datetime64[D]')
+    mes = datas.astype('datetime64[M]')
+    dia = (datas - mes.astype('datetime64[D]')).astype(np.int64)
+    destino = mes + np.asarray(meses, dtype=np.int64)
+    dias_no_mes = ((destino + 1).astype('datetime64[D]') - destino.astype('datetime64[D]')).astype(np.int64)
+    return destino.astype('datetime64[D]') + np.minimum(dia, dias_no_mes - 1)
+
+# Função para adicionar uma única parcela no banco de dados
+@retry_on_lock
+def add_single_parcela(codigo_cliente, valor_parcela, data_pagamento, conta_deposito):
+    with transaction(banco_do_codigo(codigo_cliente)) as conn:
+        max_parcela = conn.execute(SQL_MAX_PARCELA, (codigo_cliente,)).fetchone()[0]
+        if max_parcela is None:
+            max_parcela = 0
+        numero_parcela = max_parcela + 1
+        conn.execute(SQL_INSERT_PARCELA,
+                     (codigo_cliente, numero_parcela, valor_parcela, data_pagamento.strftime('%Y-%m-%d'), conta_deposito, False))
+    excel_backup.request()
+
+# Função para atualizar parcela no banco de dados
+@retry_on_lock
+def update_parcela(codigo_cliente, numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago):
+    data_pagamento_str = data_pagamento.strftime('%Y-%m-%d')  # Convertendo datetime.date para string
+    with transaction(banco_do_codigo(codigo_cliente)) as conn:
+        conn.execute(SQL_UPDATE_PARCELA,
+                     (valor_parcela, data_pagamento_str, tipo_pagamento, conta_deposito, pago, codigo_cliente, numero_parcela))
+    excel_backup.request()
+
+# Linhas da tabela editada que mudaram em alguma das `colunas`. Valores ausentes nos dois lados
+# (NaN/NaT/None) contam como iguais; com `!=` puro, NaN != NaN faria a linha parecer alterada.
+def parcelas_alteradas(originais, editadas, colunas):
+    antes, depois = originais[colunas], editadas[colunas]
+    diferentes = antes.ne(depois) & ~(antes.isna() & depois.isna())
+    return editadas[diferentes.any(axis=1)]
+
+# Função para atualizar várias parcelas de um cliente numa única transação.
+# Cada item é (numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago).
+@retry_on_lock
+def update_parcelas(codigo_cliente, parcelas):
+    rows = [(float(valor_parcela), data_pagamento.strftime('%Y-%m-%d'), tipo_pagamento, conta_deposito, bool(pago), codigo_cliente, int(numero_parcela))
+            for numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago in parcelas]
+    if not rows:
+        return
+    with transaction(banco_do_codigo(codigo_cliente)) as conn:
+        conn.executemany(SQL_UPDATE_PARCELA, rows)
+    excel_backup.request()
+
+# Função para salvar os dados em um arquivo Excel.
+# Grava num arquivo temporário e troca de nome no final, para que o backup nunca fique pela metade.
+@cronometrar('excel')
+def save_to_excel(path=EXCEL_BACKUP_PATH, banco=None):
+    tmp_path = path[:-len('.xlsx')] + '.tmp.xlsx'
+    with get_connection(banco) as conn:
+        df_clientes = read_sql_conn(conn, SQL_SELECT_CLIENTES)
+        df_parcelas = read_sql_conn(conn, SQL_SELECT_PARCELAS)
+
+    # Datas vão como datas de verdade para a planilha
+    df_clientes['data_cadastro'] = pd.to_datetime(df_clientes['data_cadastro'], format='%Y-%m-%d')
+    df_parcelas['data_pagamento'] = pd.to_datetime(df_parcelas['data_pagamento'], format='%Y-%m-%d')
+
+    with pd.ExcelWriter(tmp_path, date_format='DD/MM/YYYY', datetime_format='DD/MM/YYYY') as writer:
+        df_clientes.to_excel(writer, sheet_name='Clientes', index=False)
+        df_parcelas.to_excel(writer, sheet_name='Parcelas', index=False)
+
+    for _ in range(5):  # Tenta 5 vezes
+        try:
+            os.replace(tmp_path, path)
+            return
+        except PermissionError:
+            time.sleep(1)  # Planilha aberta no Excel: espera 1 segundo antes de tentar novamente
+    raise PermissionError(f'Não foi possível substituir {path}: arquivo em uso')
+
+# Função para salvar o backup Excel de cada escritório (backup_clientes_SP.xlsx etc.; o escritório
+# sem prefixo continua em backup_clientes.xlsx)
+def save_all_to_excel():
+    for escritorio in escritorios():
+        path = f'backup_clientes_{escritorio.prefixo}.xlsx' if escritorio.prefixo else EXCEL_BACKUP_PATH
+        save_to_excel(path, escritorio.banco)
+
+# Backup Excel em segundo plano, disparado pelas funções de gravação após o commit
+excel_backup = ExcelBackupWriter(save_all_to_excel).register_atexit()
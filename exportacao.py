@@ -0,0 +1,198 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from datetime import date
+
+import pandas as pd
+
+from database import get_connection, ensure_schema, escritorios
+from instrumentacao import medir
+
+# Linhas lidas do banco e gravadas por vez; a memória usada não depende do tamanho da tabela
+TAMANHO_LOTE = 50_000
+
+# Colunas que podem ser exportadas de cada tabela/visão e o tipo de cada uma. Só nomes desta
+# lista entram no SQL; senha_egov não está em nenhuma e por isso nunca é exportada.
+COLUNAS = {
+    'clientes': {
+        'codigo': 'texto', 'nome': 'texto', 'contato': 'texto', 'cpf': 'texto', 'tipo_acao': 'texto',
+        'valor_honorarios': 'real', 'resumo_caso': 'texto', 'data_cadastro': 'data',
+    },
+    'parcelas': {
+        'codigo_cliente': 'texto', 'numero_parcela': 'inteiro', 'valor_parcela': 'real', 'data_pagamento': 'data',
+        'tipo_pagamento': 'texto', 'conta_deposito': 'texto', 'pago': 'inteiro',
+    },
+    # Valores a receber: parcelas em aberto com os dados de contato do cliente
+    'a_receber': {
+        'codigo_cliente': 'texto', 'nome': 'texto', 'contato': 'texto', 'numero_parcela': 'inteiro',
+        'valor_parcela': 'real', 'data_pagamento': 'data', 'conta_deposito': 'texto',
+    },
+}
+
+# Origem de cada tabela/visão: (FROM ... WHERE, coluna de data para --de/--ate, ORDER BY)
+ORIGENS = {
+    'clientes': ('clientes WHERE 1 = 1', 'data_cadastro', 'codigo'),
+    'parcelas': ('parcelas WHERE 1 = 1', 'data_pagamento', 'codigo_cliente, numero_parcela'),
+    'a_receber': ('parcelas p JOIN clientes c ON p.codigo_cliente = c.codigo WHERE p.pago = 0',
+                  'p.data_pagamento', 'p.data_pagamento, p.codigo_cliente, p.numero_parcela'),
+}
+
+# Na visão a_receber as colunas vêm de duas tabelas
+PREFIXOS_A_RECEBER = {'nome': 'c', 'contato': 'c'}
+
+COLUNAS_PROIBIDAS = {'senha_egov'}
+
+
+class ErroExportacao(ValueError):
+    pass
+
+
+# Função para montar a consulta da exportação a partir das colunas permitidas
+def montar_consulta(tabela, colunas=None, de=None, ate=None):
+    permitidas = COLUNAS[tabela]
+    colunas = list(colunas or permitidas)
+    proibidas = [c for c in colunas if c in COLUNAS_PROIBIDAS]
+    if proibidas:
+        raise ErroExportacao(f'A coluna {proibidas[0]} não pode ser exportada.')
+    desconhecidas = [c for c in colunas if c not in permitidas]
+    if desconhecidas:
+        raise ErroExportacao(f"Coluna(s) desconhecida(s) para {tabela}: {', '.join(desconhecidas)}. "
+                             f"Disponíveis: {', '.join(permitidas)}")
+
+    origem, coluna_data, ordem = ORIGENS[tabela]
+    if tabela == 'a_receber':
+        selecao = ', '.join(f"{PREFIXOS_A_RECEBER.get(c, 'p')}.{c}" for c in colunas)
+    else:
+        selecao = ', '.join(colunas)
+    sql = f'SELECT {selecao} FROM {origem}'
+    params = []
+    if de:
+        sql += f' AND {coluna_data} >= ?'
+        params.append(de.strftime('%Y-%m-%d'))
+    if ate:
+        sql += f' AND {coluna_data} <= ?'
+        params.append(ate.strftime('%Y-%m-%d'))
+    return sql + f' ORDER BY {ordem}', params, colunas
+
+# Lê a consulta em lotes de `tamanho_lote` linhas (fetchmany por baixo), sem carregar tudo, um
+# escritório depois do outro. Com mais de um escritório entra a coluna 'escritorio'.
+def ler_em_lotes(sql, params, tamanho_lote=TAMANHO_LOTE):
+    lista = escritorios()
+    for escritorio in lista:
+        with get_connection(escritorio.banco) as conn:
+            for lote in pd.read_sql_query(sql, conn, params=params, chunksize=tamanho_lote):
+                if len(lista) > 1:
+                    lote.insert(0, 'escritorio', escritorio.nome)
+                yield lote
+
+
+# Gravadores: recebem os lotes e escrevem no arquivo aberto
+
+class GravadorCSV:
+    def __init__(self, caminho, colunas, tipos, separador=';', decimal=','):
+        self.arquivo = open(caminho, 'w', encoding='utf-8-sig', newline='')
+        self.separador = separador
+        self.decimal = decimal
+        csv.writer(self.arquivo, delimiter=separador).writerow(colunas)
+
+    def gravar(self, lote):
+        lote.to_csv(self.arquivo, sep=self.separador, decimal=self.decimal, header=False, index=False)
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+class GravadorParquet:
+    TIPOS_ARROW = {'texto': 'string', 'real': 'float64', 'inteiro': 'int64', 'data': 'date32'}
+
+    def __init__(self, caminho, colunas, tipos, **_):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ErroExportacao('A exportação em Parquet precisa do pacote pyarrow (pip install pyarrow).')
+        self.pa = pa
+        self.tipos = tipos
+        # Esquema fixo: um lote só com valores nulos não pode mudar o tipo da coluna
+        self.esquema = pa.schema([(c, getattr(pa, self.TIPOS_ARROW[tipos[c]])()) for c in colunas])
+        self.escritor = pq.ParquetWriter(caminho, self.esquema, compression='snappy')
+
+    def gravar(self, lote):
+        for coluna, tipo in self.tipos.items():
+            if tipo == 'data':
+                lote[coluna] = pd.to_datetime(lote[coluna], format='%Y-%m-%d', errors='coerce').dt.date
+            elif tipo == 'inteiro':
+                # Inteiro com nulos (ex.: pago NULL de cadastros antigos): vira nulo no Parquet
+                lote[coluna] = lote[coluna].astype('Int64')
+        self.escritor.write_table(self.pa.Table.from_pandas(lote, schema=self.esquema, preserve_index=False))
+
+    def fechar(self):
+        self.escritor.close()
+
+
+GRAVADORES = {'csv': GravadorCSV, 'parquet': GravadorParquet}
+
+# Função para exportar uma tabela/visão em lotes. Grava num arquivo temporário e troca de nome
+# no final, como o backup Excel. Devolve o número de linhas exportadas.
+def exportar(tabela, caminho, formato=None, colunas=None, de=None, ate=None, tamanho_lote=TAMANHO_LOTE,
+             separador=';', decimal=',', progresso=None):
+    formato = formato or ('parquet' if caminho.lower().endswith('.parquet') else 'csv')
+    sql, params, colunas = montar_consulta(tabela, colunas, de, ate)
+    tipos = {c: COLUNAS[tabela][c] for c in colunas}
+    if len(escritorios()) > 1:
+        colunas = ['escritorio'] + colunas
+        tipos = {'escritorio': 'texto', **tipos}
+
+    raiz, extensao = os.path.splitext(caminho)
+    tmp_path = f'{raiz}.tmp{extensao}'
+    linhas = 0
+    with medir(f'exportar {tabela}', 'exportacao', sql) as span:
+        gravador = GRAVADORES[formato](tmp_path, colunas, tipos, separador=separador, decimal=decimal)
+        try:
+            for lote in ler_em_lotes(sql, params, tamanho_lote):
+                gravador.gravar(lote)
+                linhas += len(lote)
+                if progresso:
+                    progresso(linhas)
+        except BaseException:
+            gravador.fechar()
+            os.remove(tmp_path)
+            raise
+        gravador.fechar()
+        span.linhas = linhas
+    os.replace(tmp_path, caminho)
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Exporta clientes, parcelas ou valores a receber para CSV ou Parquet.')
+    parser.add_argument('tabela', choices=sorted(COLUNAS))
+    parser.add_argument('saida', help='arquivo de saída (.csv ou .parquet)')
+    parser.add_argument('--formato', choices=sorted(GRAVADORES), help='padrão: pela extensão do arquivo')
+    parser.add_argument('--colunas', help='colunas separadas por vírgula (padrão: todas as permitidas)')
+    parser.add_argument('--de', type=date.fromisoformat, help='data inicial (AAAA-MM-DD)')
+    parser.add_argument('--ate', type=date.fromisoformat, help='data final (AAAA-MM-DD)')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='linhas lidas por vez')
+    parser.add_argument('--separador', default=';', help='separador do CSV (padrão: ;)')
+    parser.add_argument('--decimal', default=',', help='separador decimal do CSV (padrão: ,)')
+    args = parser.parse_args(argv)
+
+    ensure_schema()
+    colunas = [c.strip() for c in args.colunas.split(',')] if args.colunas else None
+    inicio = time.perf_counter()
+    try:
+        linhas = exportar(args.tabela, args.saida, args.formato, colunas, args.de, args.ate, args.lote,
+                          args.separador, args.decimal,
+                          progresso=lambda n: print(f'\r{n} LINHAS', end='', flush=True))
+    except ErroExportacao as exc:
+        print(exc, file=sys.stderr)
+        return 2
+    segundos = time.perf_counter() - inicio
+    print(f'\r{linhas} LINHAS EXPORTADAS EM {segundos:.1f}s ({linhas / max(segundos, 1e-9):.0f} LINHAS/S) -> {args.saida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,114 @@
+import argparse
+import os
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from database import read_sql_escritorios, ensure_schema
+from relatorio_pdf import render_pdf
+
+# Todos os clientes com parcelas em aberto e as suas parcelas, numa única consulta
+SQL_EXTRATOS = '''
+    SELECT c.codigo, c.nome, c.tipo_acao, c.valor_honorarios,
+           p.numero_parcela, p.valor_parcela, p.data_pagamento, p.pago
+    FROM clientes c
+    JOIN parcelas p ON p.codigo_cliente = c.codigo
+    WHERE c.codigo IN (SELECT DISTINCT codigo_cliente FROM parcelas WHERE pago = 0)
+    ORDER BY c.codigo, p.numero_parcela
+    '''
+
+# Clientes enviados de uma vez para cada processo
+CLIENTES_POR_TAREFA = 8
+
+
+# Função para carregar os dados de todos os extratos, de todos os escritórios: lista de
+# (dados do cliente, parcelas)
+def carregar_extratos():
+    df = read_sql_escritorios(SQL_EXTRATOS, ordem=['codigo', 'numero_parcela'])
+    extratos = []
+    for codigo, grupo in df.groupby('codigo', sort=False):
+        primeira = grupo.iloc[0]
+        cliente_info = {'codigo': codigo, 'nome': primeira['nome'], 'tipo_acao': primeira['tipo_acao'],
+                        'valor_honorarios': primeira['valor_honorarios']}
+        extratos.append((cliente_info, grupo[['numero_parcela', 'valor_parcela', 'data_pagamento', 'pago']].reset_index(drop=True)))
+    return extratos
+
+# Gera um extrato; roda dentro dos processos do pool
+def gerar_extrato(extrato):
+    cliente_info, parcelas = extrato
+    pdf = render_pdf(cliente_info, parcelas)
+    return cliente_info['codigo'], cliente_info['nome'], pdf.to_bytes(), pdf.page_no()
+
+def nome_arquivo(codigo, nome):
+    nome = ''.join(ch if ch.isalnum() else '_' for ch in str(nome)).strip('_')
+    return f'extrato_{codigo}_{nome}.pdf'
+
+# Resultado de uma execução em lote
+class ResultadoLote:
+    def __init__(self):
+        self.extratos = 0
+        self.paginas = 0
+        self.inicio = time.perf_counter()
+        self.segundos = 0.0
+
+    @property
+    def paginas_por_segundo(self):
+        return self.paginas / max(self.segundos, 1e-9)
+
+# Função para gerar os extratos de todos os clientes com parcelas em aberto e gravá-los num ZIP.
+# `destino` pode ser um caminho ou um arquivo aberto (ex.: io.BytesIO). Os PDFs entram no ZIP à
+# medida que ficam prontos; `progresso(feitos, total)` é chamado a cada extrato.
+def gerar_extratos_zip(destino, processos=None, progresso=None):
+    resultado = ResultadoLote()
+    extratos = carregar_extratos()
+    total = len(extratos)
+
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if processos == 1:
+            gerados = map(gerar_extrato, extratos)
+            executor = None
+        else:
+            executor = ProcessPoolExecutor(max_workers=processos)
+            gerados = executor.map(gerar_extrato, extratos, chunksize=CLIENTES_POR_TAREFA)
+        try:
+            for codigo, nome, pdf_bytes, paginas in gerados:
+                zf.writestr(nome_arquivo(codigo, nome), pdf_bytes)
+                resultado.extratos += 1
+                resultado.paginas += paginas
+                if progresso:
+                    progresso(resultado.extratos, total)
+        finally:
+            if executor:
+                executor.shutdown()
+
+    resultado.segundos = time.perf_counter() - resultado.inicio
+    return resultado
+
+# Número de processos padrão. No executável do PyInstaller os extratos são gerados no próprio
+# processo, porque um processo filho reabriria o aplicativo inteiro.
+def processos_padrao():
+    return 1 if getattr(sys, 'frozen', False) else os.cpu_count()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera os extratos em PDF de todos os clientes com parcelas em aberto.')
+    parser.add_argument('--saida', default=f"extratos_{datetime.today().strftime('%Y_%m')}.zip", help='arquivo ZIP de saída')
+    parser.add_argument('--processos', type=int, default=processos_padrao(), help='processos usados para gerar os PDFs')
+    args = parser.parse_args(argv)
+
+    ensure_schema()
+
+    def progresso(feitos, total):
+        print(f'\r{feitos}/{total} EXTRATOS', end='', flush=True)
+
+    resultado = gerar_extratos_zip(args.saida, args.processos, progresso)
+    print()
+    print(f'{resultado.extratos} EXTRATOS, {resultado.paginas} PÁGINAS EM {resultado.segundos:.1f}s '
+          f'({resultado.paginas_por_segundo:.1f} PÁGINAS/S) -> {args.saida}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
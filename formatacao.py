@@ -0,0 +1,122 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Nomes dos meses em português, sem depender do locale instalado no sistema
+MESES = ('janeiro', 'fevereiro', 'março', 'abril', 'maio', 'junho',
+         'julho', 'agosto', 'setembro', 'outubro', 'novembro', 'dezembro')
+
+# Função para formatar o telefone
+def formatar_telefone(telefone):
+    telefone = ''.join(filter(str.isdigit, telefone))
+    if len(telefone) == 11:
+        return f'({telefone[:2]}) {telefone[2:7]}-{telefone[7:]}'
+    else:
+        return telefone
+
+# Função para formatar o CPF
+def formatar_cpf(cpf):
+    cpf = ''.join(filter(str.isdigit, cpf))
+    if len(cpf) == 11:
+        return f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+    else:
+        return cpf
+
+# Função para formatar valores monetários. Mesma regra de formatar_valores: meio centavo
+# arredonda para cima (0,125 -> 'R$ 0,13'), valores que arredondam para zero não levam sinal e
+# valores nulos viram ''
+def formatar_valor(valor):
+    if pd.isnull(valor):
+        return ''
+    centavos = int(np.floor(round(abs(float(valor)) * 100, 6) + 0.5))
+    sinal = '-' if valor < 0 and centavos else ''
+    return f'R$ {sinal}{centavos // 100:,}'.replace(',', '.') + f',{centavos % 100:02d}'
+
+# Função para formatar data para exibição
+def formatar_data(data):
+    if pd.isnull(data):
+        return ''
+    else:
+        return datetime.strptime(data, '%Y-%m-%d').strftime('%d/%m/%Y')
+
+
+# Formatadores vetorizados: recebem uma Series (ou array) e devolvem uma Series de textos com o
+# mesmo índice. Os caracteres são montados numa matriz de bytes com operações do NumPy, sem
+# chamar uma função Python por linha. Valores nulos viram ''.
+
+# Converte uma matriz de bytes ASCII (uma linha por texto, completada com zeros) em textos
+def _matriz_para_textos(matriz, nulos, index):
+    largura = matriz.shape[1]
+    textos = np.ascontiguousarray(matriz).view(f'S{largura}').ravel().astype(f'U{largura}').astype(object)
+    textos[nulos] = ''
+    return pd.Series(textos, index=index, dtype=object)
+
+def _como_series(valores):
+    return valores if isinstance(valores, pd.Series) else pd.Series(valores)
+
+# Versão vetorizada de formatar_valor: 1234.5 -> 'R$ 1.234,50'
+def formatar_valores(valores):
+    valores = _como_series(valores)
+    numeros = pd.to_numeric(valores, errors='coerce').to_numpy(dtype=float)
+    nulos = np.isnan(numeros)
+    # Arredonda meio centavo para cima; o round(…, 6) absorve o erro binário (12.345 * 100 = 1234.4999…)
+    centavos = np.floor(np.round(np.abs(np.where(nulos, 0.0, numeros)) * 100, 6) + 0.5).astype(np.int64)
+    inteiros = centavos // 100
+    negativos = (numeros < 0) & (centavos > 0)
+
+    digitos = np.ones(len(inteiros), dtype=np.int64)
+    potencia = 10
+    while potencia <= inteiros.max(initial=0):
+        digitos += inteiros >= potencia
+        potencia *= 10
+
+    # 'R$ ' + sinal + dígitos com pontos de milhar + ',cc'
+    inicio = 3 + negativos
+    fim_inteiros = inicio + digitos + (digitos - 1) // 3 - 1
+    largura = int((fim_inteiros + 4).max(initial=7))
+    matriz = np.zeros((len(inteiros), largura), dtype=np.uint8)
+    matriz[:, :3] = np.frombuffer(b'R$ ', dtype=np.uint8)
+    matriz[negativos, 3] = ord('-')
+
+    linhas = np.arange(len(inteiros))
+    resto = inteiros.copy()
+    for k in range(int(digitos.max(initial=1))):
+        presentes = digitos > k
+        posicao = fim_inteiros - k - k // 3
+        matriz[linhas[presentes], posicao[presentes]] = ord('0') + resto[presentes] % 10
+        if k and k % 3 == 0:
+            matriz[linhas[presentes], posicao[presentes] + 1] = ord('.')
+        resto //= 10
+    matriz[linhas, fim_inteiros + 1] = ord(',')
+    matriz[linhas, fim_inteiros + 2] = ord('0') + centavos % 100 // 10
+    matriz[linhas, fim_inteiros + 3] = ord('0') + centavos % 10
+    return _matriz_para_textos(matriz, nulos, valores.index)
+
+# Versão vetorizada de formatar_data: aceita datas (datetime64) ou textos ISO e devolve dd/mm/YYYY
+def formatar_datas(datas):
+    datas = _como_series(datas)
+    datas = pd.to_datetime(datas, format='%Y-%m-%d') if not pd.api.types.is_datetime64_any_dtype(datas) else datas
+    dias = datas.to_numpy(dtype='datetime64[D]')
+    nulos = np.isnat(dias)
+    dias = np.where(nulos, np.datetime64('1970-01-01'), dias)
+    meses = dias.astype('datetime64[M]')
+    ano = dias.astype('datetime64[Y]').astype(np.int64) + 1970
+    mes = meses.astype(np.int64) % 12 + 1
+    dia = (dias - meses).astype(np.int64) + 1
+
+    matriz = np.empty((len(dias), 10), dtype=np.uint8)
+    matriz[:, [2, 5]] = ord('/')
+    for coluna, numero, casas in ((0, dia, 2), (3, mes, 2), (6, ano, 4)):
+        for k in range(casas):
+            matriz[:, coluna + casas - 1 - k] = ord('0') + numero // 10 ** k % 10
+    return _matriz_para_textos(matriz, nulos, datas.index)
+
+# Nome por extenso de uma Series de números de mês (1 a 12)
+def nomes_meses(meses):
+    meses = _como_series(meses)
+    return pd.Series(np.asarray(MESES, dtype=object)[meses.astype(int).to_numpy() - 1], index=meses.index, dtype=object)
+
+# Número (1 a 12) de um mês escrito por extenso
+def numero_mes(nome):
+    return MESES.index(nome.lower()) + 1
@@ -0,0 +1,377 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import unicodedata
+from datetime import date, datetime
+
+from collections import defaultdict
+
+from database import (transaction, ensure_schema, gerar_parcelas, excel_backup, reservar_codigos, avancar_sequencia,
+                      escritorio_por_prefixo, prefixo_do_codigo, SQL_INSERT_CLIENTE, SQL_INSERT_PARCELA)
+from formatacao import formatar_cpf, formatar_telefone
+
+# Quantidade de linhas gravadas por transação
+TAMANHO_LOTE = 1000
+
+COLUNAS_CLIENTE = ('codigo', 'nome', 'contato', 'cpf', 'senha_egov', 'tipo_acao', 'valor_honorarios', 'resumo_caso', 'data_cadastro')
+COLUNAS_PARCELA = ('codigo_cliente', 'numero_parcela', 'valor_parcela', 'data_pagamento', 'tipo_pagamento', 'conta_deposito', 'pago')
+
+# Nomes alternativos aceitos no cabeçalho das planilhas de outros escritórios
+SINONIMOS = {
+    'telefone': 'contato',
+    'celular': 'contato',
+    'honorarios': 'valor_honorarios',
+    'valor': 'valor_honorarios',
+    'acao': 'tipo_acao',
+    'resumo': 'resumo_caso',
+    'data': 'data_cadastro',
+    'parcelas': 'numero_parcelas',
+    'vencimento': 'primeiro_vencimento',
+}
+
+SQL_UPSERT_CLIENTE = SQL_INSERT_CLIENTE + ''' ON CONFLICT (codigo) DO UPDATE SET
+    nome=excluded.nome, contato=excluded.contato, cpf=excluded.cpf, senha_egov=excluded.senha_egov, tipo_acao=excluded.tipo_acao,
+    valor_honorarios=excluded.valor_honorarios, resumo_caso=excluded.resumo_caso, data_cadastro=excluded.data_cadastro'''
+SQL_INSERT_PARCELA_COMPLETA = ('INSERT INTO parcelas (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, tipo_pagamento, conta_deposito, pago) '
+                               'VALUES (?, ?, ?, ?, ?, ?, COALESCE(?, 0))')
+SQL_UPSERT_PARCELA = SQL_INSERT_PARCELA_COMPLETA + ''' ON CONFLICT (codigo_cliente, numero_parcela) DO UPDATE SET
+    valor_parcela=excluded.valor_parcela, data_pagamento=excluded.data_pagamento, tipo_pagamento=excluded.tipo_pagamento,
+    conta_deposito=excluded.conta_deposito, pago=excluded.pago'''
+
+
+# Erro de validação de uma linha do arquivo; a mensagem vai para o arquivo de rejeitados
+class LinhaInvalida(ValueError):
+    pass
+
+
+# Função para padronizar o nome de uma coluna do cabeçalho ('Valor Honorários' -> 'valor_honorarios')
+def normalizar_coluna(nome):
+    nome = unicodedata.normalize('NFKD', str(nome or '')).encode('ascii', 'ignore').decode()
+    nome = '_'.join(nome.strip().lower().split())
+    return SINONIMOS.get(nome, nome)
+
+# Função para ler um CSV linha a linha, detectando o separador (',' ou ';')
+def ler_csv(caminho):
+    with open(caminho, newline='', encoding='utf-8-sig') as f:
+        amostra = f.read(4096)
+        f.seek(0)
+        try:
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+        except csv.Error:
+            dialeto = csv.excel
+        leitor = csv.reader(f, dialeto)
+        cabecalho = [normalizar_coluna(c) for c in next(leitor, [])]
+        for linha in leitor:
+            if any(linha):
+                yield dict(zip(cabecalho, linha))
+
+# Função para ler uma aba de planilha em modo somente leitura (sem carregar o arquivo inteiro)
+def ler_xlsx(caminho, aba=None):
+    from openpyxl import load_workbook
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        ws = wb[aba] if aba else wb.worksheets[0]
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = [normalizar_coluna(c) for c in next(linhas, ())]
+        for linha in linhas:
+            if any(v not in (None, '') for v in linha):
+                yield dict(zip(cabecalho, linha))
+    finally:
+        wb.close()
+
+# Função para listar as abas de uma planilha
+def abas_xlsx(caminho):
+    from openpyxl import load_workbook
+    wb = load_workbook(caminho, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+def texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+# Função para converter valores monetários ('1.234,56', '1234.56', 1234.56)
+def converter_valor(valor, campo):
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    valor = texto(valor).replace('R$', '').replace(' ', '')
+    if ',' in valor:
+        valor = valor.replace('.', '').replace(',', '.')
+    try:
+        return float(valor)
+    except ValueError:
+        raise LinhaInvalida(f'{campo.upper()} INVÁLIDO: {valor!r}')
+
+# Função para converter datas ('dd/mm/YYYY', 'YYYY-MM-DD' ou células de data) para o formato do banco
+def converter_data(valor, campo, padrao=None):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    valor = texto(valor)
+    if not valor:
+        if padrao is None:
+            raise LinhaInvalida(f'{campo.upper()} NÃO INFORMADA')
+        return padrao
+    for formato in ('%d/%m/%Y', '%Y-%m-%d', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(valor, formato).date()
+        except ValueError:
+            pass
+    raise LinhaInvalida(f'{campo.upper()} INVÁLIDA: {valor!r}')
+
+def converter_pago(valor):
+    if isinstance(valor, bool):
+        return valor
+    return texto(valor).lower() in ('1', 'true', 'verdadeiro', 'sim', 's', 'x', 'pago')
+
+# Função para normalizar o código do cliente ('1' -> '0001'), mantendo códigos não numéricos
+def converter_codigo(valor):
+    valor = texto(valor)
+    return f'{int(valor):04d}' if valor.isdigit() else valor
+
+# Função para validar uma linha de cliente com as mesmas regras da tela de cadastro
+def validar_cliente(linha):
+    nome = texto(linha.get('nome')).upper()
+    if not nome:
+        raise LinhaInvalida('NOME NÃO INFORMADO')
+    contato = formatar_telefone(texto(linha.get('contato')))
+    if len(contato) != 15:
+        raise LinhaInvalida('FORMATO DE TELEFONE INVÁLIDO')
+    cpf = formatar_cpf(texto(linha.get('cpf')))
+    if len(cpf) != 14:
+        raise LinhaInvalida('FORMATO DE CPF INVÁLIDO')
+    valor_honorarios = converter_valor(linha.get('valor_honorarios') or 0, 'valor_honorarios')
+    data_cadastro = converter_data(linha.get('data_cadastro'), 'data_cadastro', padrao=date.today())
+    numero_parcelas = texto(linha.get('numero_parcelas'))
+    if numero_parcelas and not numero_parcelas.isdigit():
+        raise LinhaInvalida(f'NÚMERO DE PARCELAS INVÁLIDO: {numero_parcelas!r}')
+    primeiro_vencimento = converter_data(linha.get('primeiro_vencimento'), 'primeiro_vencimento', padrao=data_cadastro)
+    cliente = [converter_codigo(linha.get('codigo')), nome, contato, cpf, texto(linha.get('senha_egov')).upper(),
+               texto(linha.get('tipo_acao')).upper(), valor_honorarios, texto(linha.get('resumo_caso')).upper(),
+               data_cadastro.strftime('%Y-%m-%d')]
+    return cliente, int(numero_parcelas or 0), primeiro_vencimento
+
+# Função para validar uma linha da aba de parcelas do backup
+def validar_parcela(linha):
+    codigo_cliente = converter_codigo(linha.get('codigo_cliente'))
+    if not codigo_cliente:
+        raise LinhaInvalida('CÓDIGO DO CLIENTE NÃO INFORMADO')
+    numero_parcela = texto(linha.get('numero_parcela'))
+    if not numero_parcela.isdigit():
+        raise LinhaInvalida(f'NÚMERO DA PARCELA INVÁLIDO: {numero_parcela!r}')
+    return (codigo_cliente, int(numero_parcela), converter_valor(linha.get('valor_parcela') or 0, 'valor_parcela'),
+            converter_data(linha.get('data_pagamento'), 'data_pagamento').strftime('%Y-%m-%d'),
+            texto(linha.get('tipo_pagamento')) or None, texto(linha.get('conta_deposito')) or None, converter_pago(linha.get('pago')))
+
+
+# Acompanha o andamento de uma importação e grava as linhas rejeitadas num CSV
+class Relatorio:
+    def __init__(self, caminho_rejeitados=None, progresso=print):
+        self.caminho_rejeitados = caminho_rejeitados
+        self.progresso = progresso
+        self.lidas = 0
+        self.clientes = 0
+        self.parcelas = 0
+        self.rejeitadas = 0
+        self.inicio = time.perf_counter()
+        self._arquivo = None
+        self._escritor = None
+
+    def rejeitar(self, origem, linha, motivo):
+        self.rejeitadas += 1
+        if not self.caminho_rejeitados:
+            return
+        if self._escritor is None:
+            self._arquivo = open(self.caminho_rejeitados, 'w', newline='', encoding='utf-8-sig')
+            self._escritor = csv.writer(self._arquivo, delimiter=';')
+            self._escritor.writerow(['origem', 'motivo', 'linha'])
+        self._escritor.writerow([origem, motivo, json.dumps(linha, default=str, ensure_ascii=False)])
+
+    @property
+    def linhas_por_segundo(self):
+        return self.lidas / max(time.perf_counter() - self.inicio, 1e-9)
+
+    def informar(self):
+        if self.progresso:
+            self.progresso(f'{self.lidas} LINHAS LIDAS, {self.clientes} CLIENTES E {self.parcelas} PARCELAS IMPORTADOS, '
+                           f'{self.rejeitadas} REJEITADAS ({self.linhas_por_segundo:.0f} LINHAS/S)')
+
+    def fechar(self):
+        if self._arquivo:
+            self._arquivo.close()
+
+
+def em_lotes(linhas, tamanho):
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def codigos_existentes(conn, codigos):
+    if not codigos:
+        return set()
+    rows = conn.execute('SELECT codigo FROM clientes WHERE codigo IN (SELECT value FROM json_each(?))', (json.dumps(list(codigos)),))
+    return {r[0] for r in rows}
+
+def parcelas_existentes(conn, codigos):
+    if not codigos:
+        return set()
+    rows = conn.execute('SELECT codigo_cliente, numero_parcela FROM parcelas WHERE codigo_cliente IN (SELECT value FROM json_each(?))',
+                        (json.dumps(list(codigos)),))
+    return {(r[0], r[1]) for r in rows}
+
+# Separa as linhas válidas de um lote pelo escritório dono do código (sem código: o escritório
+# padrão, que reserva os próximos códigos da sua sequência). Códigos com prefixo de um escritório
+# não configurado são rejeitados.
+def por_escritorio(validas, codigo, relatorio, origem):
+    grupos = defaultdict(list)
+    for item in validas:
+        linha = item[0]
+        try:
+            escritorio = escritorio_por_prefixo(prefixo_do_codigo(codigo(item)) if codigo(item) else None)
+        except ValueError as exc:
+            relatorio.rejeitar(origem, linha, str(exc).upper())
+            continue
+        grupos[escritorio].append(item)
+    return grupos.items()
+
+# Função para importar clientes (e gerar seus planos de parcelas) em transações por lote,
+# uma por escritório
+def importar_clientes(linhas, relatorio, tamanho_lote=TAMANHO_LOTE, substituir=False, origem='clientes'):
+    vistos = set()
+    for lote in em_lotes(linhas, tamanho_lote):
+        validos = []
+        for linha in lote:
+            relatorio.lidas += 1
+            try:
+                cliente, numero_parcelas, primeiro_vencimento = validar_cliente(linha)
+            except LinhaInvalida as exc:
+                relatorio.rejeitar(origem, linha, str(exc))
+                continue
+            if cliente[0] and cliente[0] in vistos:
+                relatorio.rejeitar(origem, linha, 'CÓDIGO REPETIDO NO ARQUIVO')
+                continue
+            if cliente[0]:
+                vistos.add(cliente[0])
+            validos.append((linha, cliente, numero_parcelas, primeiro_vencimento))
+
+        for escritorio, deste in por_escritorio(validos, lambda item: item[1][0], relatorio, origem):
+            with transaction(escritorio.banco) as conn:
+                existentes = codigos_existentes(conn, [c[0] for _, c, _, _ in deste if c[0]])
+                aceitos = []
+                for linha, cliente, numero_parcelas, primeiro_vencimento in deste:
+                    if cliente[0] in existentes and not substituir:
+                        relatorio.rejeitar(origem, linha, 'CÓDIGO JÁ CADASTRADO')
+                    else:
+                        aceitos.append((cliente, numero_parcelas, primeiro_vencimento))
+                clientes = [cliente for cliente, _, _ in aceitos]
+
+                # Códigos informados avançam a sequência do escritório; os clientes sem código recebem os próximos dela
+                avancar_sequencia(conn, [c[0] for c in clientes if c[0]])
+                sem_codigo = [c for c in clientes if not c[0]]
+                if sem_codigo:
+                    for cliente, codigo in zip(sem_codigo, reservar_codigos(conn, len(sem_codigo), escritorio.prefixo)):
+                        cliente[0] = codigo
+                        vistos.add(codigo)
+
+                parcelas = []
+                for cliente, numero_parcelas, primeiro_vencimento in aceitos:
+                    if numero_parcelas:
+                        parcelas.extend(gerar_parcelas(cliente[0], numero_parcelas, cliente[6] / numero_parcelas, primeiro_vencimento))
+                conn.executemany(SQL_UPSERT_CLIENTE if substituir else SQL_INSERT_CLIENTE, clientes)
+                if substituir:
+                    conn.executemany(SQL_UPSERT_PARCELA, [p[:4] + (None,) + p[4:] for p in parcelas])
+                else:
+                    conn.executemany(SQL_INSERT_PARCELA, parcelas)
+            relatorio.clientes += len(clientes)
+            relatorio.parcelas += len(parcelas)
+        relatorio.informar()
+
+# Função para importar parcelas já existentes (aba 'Parcelas' do backup) em transações por lote
+def importar_parcelas(linhas, relatorio, tamanho_lote=TAMANHO_LOTE, substituir=False, origem='parcelas'):
+    vistas = set()
+    for lote in em_lotes(linhas, tamanho_lote):
+        validas = []
+        for linha in lote:
+            relatorio.lidas += 1
+            try:
+                parcela = validar_parcela(linha)
+            except LinhaInvalida as exc:
+                relatorio.rejeitar(origem, linha, str(exc))
+                continue
+            if parcela[:2] in vistas:
+                relatorio.rejeitar(origem, linha, 'PARCELA REPETIDA NO ARQUIVO')
+                continue
+            vistas.add(parcela[:2])
+            validas.append((linha, parcela))
+
+        for escritorio, deste in por_escritorio(validas, lambda item: item[1][0], relatorio, origem):
+            with transaction(escritorio.banco) as conn:
+                codigos = {p[0] for _, p in deste}
+                clientes = codigos_existentes(conn, codigos)
+                existentes = set() if substituir else parcelas_existentes(conn, codigos)
+                parcelas = []
+                for linha, parcela in deste:
+                    if parcela[0] not in clientes:
+                        relatorio.rejeitar(origem, linha, 'CLIENTE NÃO CADASTRADO')
+                    elif parcela[:2] in existentes:
+                        relatorio.rejeitar(origem, linha, 'PARCELA JÁ CADASTRADA')
+                    else:
+                        parcelas.append(parcela)
+                conn.executemany(SQL_UPSERT_PARCELA if substituir else SQL_INSERT_PARCELA_COMPLETA, parcelas)
+            relatorio.parcelas += len(parcelas)
+        relatorio.informar()
+
+# Função para importar um arquivo CSV ou XLSX. Uma planilha com as abas 'Clientes' e 'Parcelas'
+# (como o backup_clientes.xlsx) é importada por inteiro, mantendo códigos e parcelas.
+def importar_arquivo(caminho, caminho_rejeitados=None, tamanho_lote=TAMANHO_LOTE, substituir=False, progresso=print):
+    ensure_schema()
+    relatorio = Relatorio(caminho_rejeitados, progresso)
+    try:
+        if caminho.lower().endswith(('.xlsx', '.xlsm')):
+            abas = abas_xlsx(caminho)
+            if 'Clientes' in abas and 'Parcelas' in abas:
+                importar_clientes(ler_xlsx(caminho, 'Clientes'), relatorio, tamanho_lote, substituir, 'Clientes')
+                importar_parcelas(ler_xlsx(caminho, 'Parcelas'), relatorio, tamanho_lote, substituir, 'Parcelas')
+            else:
+                importar_clientes(ler_xlsx(caminho), relatorio, tamanho_lote, substituir)
+        else:
+            importar_clientes(ler_csv(caminho), relatorio, tamanho_lote, substituir)
+    finally:
+        relatorio.fechar()
+    if relatorio.clientes or relatorio.parcelas:
+        excel_backup.request()
+    return relatorio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Importa clientes e planos de parcelas de arquivos CSV ou XLSX.')
+    parser.add_argument('arquivo', help='arquivo .csv ou .xlsx a importar')
+    parser.add_argument('--rejeitados', help='CSV onde gravar as linhas rejeitadas (padrão: <arquivo>.rejeitados.csv)')
+    parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='linhas por transação')
+    parser.add_argument('--substituir', action='store_true', help='atualiza clientes e parcelas que já existem em vez de rejeitá-los')
+    args = parser.parse_args(argv)
+
+    rejeitados = args.rejeitados or os.path.splitext(args.arquivo)[0] + '.rejeitados.csv'
+    relatorio = importar_arquivo(args.arquivo, rejeitados, args.lote, args.substituir)
+    print(f'CONCLUÍDO EM {time.perf_counter() - relatorio.inicio:.1f}s')
+    if relatorio.rejeitadas:
+        print(f'LINHAS REJEITADAS GRAVADAS EM {rejeitados}')
+    return 1 if relatorio.rejeitadas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import logging
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from logging.handlers import RotatingFileHandler
+
+# Operações mais demoradas que isto (em milissegundos) vão para o log de operações lentas.
+# Pode ser ajustado pela variável de ambiente HONORARIOS_LIMITE_LENTO_MS ou por definir_limite().
+LIMITE_LENTO_MS = float(os.environ.get('HONORARIOS_LIMITE_LENTO_MS', 250))
+
+# Log de operações lentas: gira ao chegar em 1 MB, mantendo os 3 arquivos anteriores
+SLOW_LOG_PATH = os.environ.get('HONORARIOS_LOG_LENTO', 'operacoes_lentas.log')
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+
+# Limite de medições guardadas por rerun (um laço de gravações não deve crescer sem fim)
+MAX_SPANS_POR_RERUN = 500
+
+
+# Uma medição: consulta SQL, bloco de página ou exportação
+class Span:
+    __slots__ = ('nome', 'tipo', 'detalhe', 'linhas', 'inicio', 'duracao')
+
+    def __init__(self, nome, tipo, detalhe=None):
+        self.nome = nome
+        self.tipo = tipo
+        self.detalhe = detalhe
+        self.linhas = None
+        self.inicio = time.perf_counter()
+        self.duracao = 0.0
+
+    @property
+    def fim(self):
+        return self.inicio + self.duracao
+
+    def texto(self):
+        detalhe = ' '.join(str(self.detalhe).split()) if self.detalhe else ''
+        return detalhe or self.nome
+
+
+# Medições de uma execução do script do Streamlit (um rerun)
+class Rerun:
+    def __init__(self, nome=''):
+        self.nome = nome
+        self.spans = []
+        self.descartados = 0
+        self.inicio = time.perf_counter()
+        self.fim = None
+
+    def adicionar(self, span):
+        if len(self.spans) < MAX_SPANS_POR_RERUN:
+            self.spans.append(span)
+        else:
+            self.descartados += 1
+
+    def finalizar(self):
+        self.fim = time.perf_counter()
+        if self.duracao * 1000 >= LIMITE_LENTO_MS:
+            registrar_lento('rerun', self.nome, self.duracao)
+
+    # Um rerun interrompido (ex.: st.experimental_rerun) termina na última medição
+    @property
+    def concluido(self):
+        return self.fim is not None
+
+    @property
+    def duracao(self):
+        fim = self.fim or max((span.fim for span in self.spans), default=self.inicio)
+        return fim - self.inicio
+
+    def linhas(self):
+        return [{'tipo': span.tipo, 'operação': span.texto(), 'linhas': span.linhas,
+                 'início (ms)': round((span.inicio - self.inicio) * 1000, 1), 'duração (ms)': round(span.duracao * 1000, 1)}
+                for span in self.spans]
+
+    def totais_por_tipo(self):
+        totais = {}
+        for span in self.spans:
+            totais[span.tipo] = totais.get(span.tipo, 0.0) + span.duracao
+        return totais
+
+
+_local = threading.local()
+
+# Começa a medição de um novo rerun na thread atual e a devolve
+def iniciar_rerun(nome=''):
+    rerun = _local.rerun = Rerun(nome)
+    return rerun
+
+def rerun_atual():
+    return getattr(_local, 'rerun', None)
+
+# Cronometra um bloco. O span devolvido pode receber o número de linhas (span.linhas = ...).
+@contextmanager
+def medir(nome, tipo='bloco', detalhe=None):
+    span = Span(nome, tipo, detalhe)
+    try:
+        yield span
+    finally:
+        span.duracao = time.perf_counter() - span.inicio
+        rerun = getattr(_local, 'rerun', None)
+        if rerun is not None:
+            rerun.adicionar(span)
+        if span.duracao * 1000 >= LIMITE_LENTO_MS:
+            registrar_lento(span.tipo, span.texto(), span.duracao, span.linhas)
+
+# Decorador: cronometra cada chamada da função
+def cronometrar(tipo='bloco', nome=None):
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with medir(nome or func.__name__, tipo):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def definir_limite(milissegundos):
+    global LIMITE_LENTO_MS
+    LIMITE_LENTO_MS = float(milissegundos)
+
+
+# Marca, uma vez por processo, o fim da primeira renderização do aplicativo. O launcher.py
+# informa o arquivo em HONORARIOS_MARCA_RENDERIZACAO e o usa no relatório de inicialização.
+_primeira_renderizacao = False
+
+def marcar_primeira_renderizacao():
+    global _primeira_renderizacao
+    if _primeira_renderizacao:
+        return
+    _primeira_renderizacao = True
+    marca = os.environ.get('HONORARIOS_MARCA_RENDERIZACAO')
+    if marca:
+        try:
+            with open(marca, 'w', encoding='utf-8') as f:
+                f.write(repr(time.time()))
+        except OSError:
+            pass
+
+
+_slow_logger = None
+_slow_logger_lock = threading.Lock()
+
+def _logger_lento():
+    global _slow_logger
+    if _slow_logger is None:
+        with _slow_logger_lock:
+            if _slow_logger is None:
+                logger = logging.getLogger('honorarios.lento')
+                logger.setLevel(logging.INFO)
+                logger.propagate = False
+                handler = RotatingFileHandler(SLOW_LOG_PATH, maxBytes=SLOW_LOG_MAX_BYTES,
+                                              backupCount=SLOW_LOG_BACKUPS, encoding='utf-8', delay=True)
+                handler.setFormatter(logging.Formatter('%(asctime)s %(threadName)s %(message)s'))
+                logger.addHandler(handler)
+                _slow_logger = logger
+    return _slow_logger
+
+# Grava uma operação lenta: tipo, duração, linhas e o texto (SQL sem quebras de linha)
+def registrar_lento(tipo, texto, duracao, linhas=None):
+    texto = re.sub(r'\s+', ' ', str(texto)).strip()
+    linhas = '' if linhas is None else f' linhas={linhas}'
+    try:
+        _logger_lento().info('%s %.1fms%s %s', tipo, duracao * 1000, linhas, texto)
+    except OSError:
+        pass  # O log nunca pode derrubar a operação medida
@@ -5,6 +5,27 @@ import time
 import webbrowser
 import threading
 import socket
+import json
+import tempfile
+import urllib.request
+from datetime import datetime
+
+PORT = 8501
+HEALTH_URL = f'http://localhost:{PORT}/_stcore/health'
+
+# Intervalo entre as verificações enquanto o servidor sobe, e quanto tempo esperar no máximo
+POLL_INTERVAL = 0.05
+STARTUP_TIMEOUT = 120
+
+# API JSON local para integrações (launcher.py --api); ver api.py
+API_ENV = 'HONORARIOS_API'
+
+# Um registro (JSON por linha) com os tempos de cada inicialização
+TIMING_LOG_PATH = 'tempos_inicializacao.jsonl'
+
+# Opções do Streamlit: sem abrir o navegador por conta própria (o launcher abre), sem
+# perguntar e-mail na primeira execução e sem enviar estatísticas de uso
+STREAMLIT_OPTIONS = ['--server.headless=true', '--browser.gatherUsageStats=false', f'--server.port={PORT}']
 
 def resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
@@ -15,17 +36,120 @@ def is_port_in_use(port):
     with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
         return s.connect_ex(('localhost', port)) == 0
 
-def open_browser():
-    while not is_port_in_use(8501):
-        time.sleep(1)
-    webbrowser.open("http://localhost:8501")
+# Ignora proxies configurados no sistema: a verificação é sempre na própria máquina
+_opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+# O endpoint de saúde só responde 'ok' quando o servidor do Streamlit já aceita sessões
+def is_healthy():
+    try:
+        with _opener.open(HEALTH_URL, timeout=0.5) as resposta:
+            return resposta.status == 200
+    except (OSError, ValueError):
+        return False
+
+# Espera o servidor ficar pronto. Devolve os segundos até a porta abrir e até o endpoint de
+# saúde responder (None se não aconteceu dentro do limite).
+def wait_until_ready(inicio, timeout=STARTUP_TIMEOUT):
+    porta_aberta = None
+    while time.time() - inicio < timeout:
+        if porta_aberta is None and is_port_in_use(PORT):
+            porta_aberta = time.time() - inicio
+        if porta_aberta is not None and is_healthy():
+            return porta_aberta, time.time() - inicio
+        time.sleep(POLL_INTERVAL)
+    return porta_aberta, None
+
+# O script do Streamlit grava neste arquivo o horário em que terminou a primeira renderização
+def wait_first_render(marca, inicio, timeout=STARTUP_TIMEOUT):
+    while time.time() - inicio < timeout:
+        try:
+            with open(marca, encoding='utf-8') as f:
+                return float(f.read()) - inicio
+        except (OSError, ValueError):
+            time.sleep(POLL_INTERVAL)
+    return None
+
+def open_browser(inicio, marca):
+    porta_aberta, pronto = wait_until_ready(inicio)
+    if pronto is None:
+        print(f'O servidor não respondeu em {STARTUP_TIMEOUT}s.', file=sys.stderr)
+        return
+    webbrowser.open(f'http://localhost:{PORT}')
+    primeira_renderizacao = wait_first_render(marca, inicio)
+    registrar_tempos(porta_aberta, pronto, primeira_renderizacao)
+
+def registrar_tempos(porta_aberta, pronto, primeira_renderizacao):
+    registro = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'executavel': bool(getattr(sys, 'frozen', False)),
+        'porta_aberta_s': round(porta_aberta, 3),
+        'servidor_pronto_s': round(pronto, 3),
+        'primeira_renderizacao_s': None if primeira_renderizacao is None else round(primeira_renderizacao, 3),
+    }
+    print(f"INICIALIZAÇÃO: porta aberta em {registro['porta_aberta_s']}s, servidor pronto em {registro['servidor_pronto_s']}s, "
+          f"primeira renderização em {registro['primeira_renderizacao_s']}s")
+    try:
+        with open(TIMING_LOG_PATH, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro) + '\n')
+    except OSError:
+        pass
+
+# Resumo das últimas inicializações registradas (launcher.py --tempos)
+def relatorio_tempos(quantidade=10):
+    try:
+        with open(TIMING_LOG_PATH, encoding='utf-8') as f:
+            registros = [json.loads(linha) for linha in f if linha.strip()][-quantidade:]
+    except OSError:
+        registros = []
+    if not registros:
+        print('Nenhuma inicialização registrada.')
+        return
+    colunas = ('porta_aberta_s', 'servidor_pronto_s', 'primeira_renderizacao_s')
+    print(f"{'DATA':<20} {'PORTA':>8} {'PRONTO':>8} {'1ª RENDER':>10}")
+    for registro in registros:
+        valores = ['-' if registro.get(c) is None else f'{registro[c]:.2f}' for c in colunas]
+        print(f"{registro['data']:<20} {valores[0]:>8} {valores[1]:>8} {valores[2]:>10}")
+    medianas = []
+    for coluna in colunas:
+        valores = sorted(r[coluna] for r in registros if r.get(coluna) is not None)
+        medianas.append(f'{valores[len(valores) // 2]:.2f}' if valores else '-')
+    print(f"{'MEDIANA':<20} {medianas[0]:>8} {medianas[1]:>8} {medianas[2]:>10}")
+
+# Sobe a API local numa thread deste processo. A importação (pandas) acontece em paralelo com a
+# subida do Streamlit, sem atrasar a abertura do navegador.
+def start_api():
+    try:
+        from api import iniciar_em_segundo_plano
+        servidor = iniciar_em_segundo_plano()
+        print(f'API local em http://{servidor.server_address[0]}:{servidor.server_address[1]}/')
+    except OSError as exc:
+        print(f'Não foi possível iniciar a API local: {exc}', file=sys.stderr)
+
+if '--tempos' in sys.argv:
+    relatorio_tempos()
+    sys.exit(0)
+
+inicio = time.time()
 
 # Caminho para o script principal
 script_path = resource_path('controle_financeiro.py')
 
+# Arquivo onde o script marca a primeira renderização
+marca = os.path.join(tempfile.gettempdir(), f'honorarios_render_{os.getpid()}.txt')
+if os.path.exists(marca):
+    os.remove(marca)
+env = dict(os.environ, HONORARIOS_MARCA_RENDERIZACAO=marca)
+
 # Iniciar o navegador em um thread separado
-browser_thread = threading.Thread(target=open_browser)
+browser_thread = threading.Thread(target=open_browser, args=(inicio, marca), daemon=True)
 browser_thread.start()
 
+if '--api' in sys.argv or os.environ.get(API_ENV) == '1':
+    threading.Thread(target=start_api, name='api-start', daemon=True).start()
+
 # Iniciar o Streamlit e esperar o processo terminar
-subprocess.run([sys.executable, '-m', 'streamlit', 'run', script_path])
+try:
+    subprocess.run([sys.executable, '-m', 'streamlit', 'run', script_path] + STREAMLIT_OPTIONS, env=env)
+finally:
+    if os.path.exists(marca):
+        os.remove(marca)
@@ -0,0 +1,119 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from database import read_sql_escritorios, query_cache
+from formatacao import MESES
+from instrumentacao import medir
+
+# Motor de atrasos e previsão de recebimentos. As parcelas em aberto são lidas do banco uma vez
+# (e guardadas no cache até a próxima gravação) como arrays NumPy: índice do cliente, vencimento
+# em dias e valor. Os relatórios são contas sobre esses arrays, sem laços em Python.
+
+# Faixas de atraso, em dias depois do vencimento: a vencer (inclui vencendo hoje), 1–30, 31–60,
+# 61–90 e mais de 90
+FAIXAS = ('A VENCER', '1 A 30 DIAS', '31 A 60 DIAS', '61 A 90 DIAS', 'MAIS DE 90 DIAS')
+LIMITES_FAIXAS = np.array([0, 30, 60, 90])
+
+# Meses da projeção de recebimentos, a partir do mês atual
+MESES_PROJECAO = 12
+
+SQL_PARCELAS_EM_ABERTO = 'SELECT codigo_cliente, valor_parcela, data_pagamento FROM parcelas WHERE pago = 0'
+SQL_NOMES_CLIENTES = 'SELECT codigo, nome FROM clientes'
+
+
+# Função para carregar as parcelas em aberto como arrays: (códigos dos clientes, índice do
+# cliente de cada parcela, vencimentos em datetime64[D], valores)
+@query_cache.cached
+def load_parcelas_em_aberto():
+    df = read_sql_escritorios(SQL_PARCELAS_EM_ABERTO)
+    with medir('arrays das parcelas em aberto', 'previsao') as span:
+        indices, codigos = pd.factorize(df['codigo_cliente'], sort=True)
+        vencimentos = pd.to_datetime(df['data_pagamento'], format='%Y-%m-%d').to_numpy().astype('datetime64[D]')
+        arrays = (np.asarray(codigos, dtype=object), indices.astype(np.int32), vencimentos,
+                  df['valor_parcela'].to_numpy(dtype=np.float64, na_value=0.0))
+        span.linhas = len(df)
+    # O cache devolve os mesmos arrays a todos os reruns; ninguém pode alterá-los
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+@query_cache.cached
+def load_nomes_clientes():
+    return read_sql_escritorios(SQL_NOMES_CLIENTES)[['codigo', 'nome']]
+
+
+# Parcelas em aberto de todo o escritório, prontas para os relatórios
+class Carteira:
+    def __init__(self, codigos, clientes, vencimentos, valores):
+        self.codigos = codigos
+        self.clientes = clientes
+        self.vencimentos = vencimentos
+        self.valores = valores
+
+    @classmethod
+    def carregar(cls):
+        return cls(*load_parcelas_em_aberto())
+
+    def __len__(self):
+        return len(self.valores)
+
+    # Faixa de atraso (índice em FAIXAS) de cada parcela na data `hoje`
+    def faixas(self, hoje):
+        dias_atraso = (np.datetime64(hoje, 'D') - self.vencimentos).astype(np.int64)
+        return np.searchsorted(LIMITES_FAIXAS, dias_atraso, side='left')
+
+    # Totais por faixa de atraso do escritório inteiro: FAIXA, QUANTIDADE, VALOR
+    def atrasos_geral(self, hoje=None):
+        faixas = self.faixas(hoje or date.today())
+        return pd.DataFrame({
+            'FAIXA': FAIXAS,
+            'QUANTIDADE': np.bincount(faixas, minlength=len(FAIXAS)),
+            'VALOR': np.bincount(faixas, weights=self.valores, minlength=len(FAIXAS)),
+        })
+
+    # Totais por faixa de atraso de cada cliente com parcelas em aberto: codigo, uma coluna por
+    # faixa, EM ATRASO (soma das faixas vencidas) e TOTAL
+    def atrasos_por_cliente(self, hoje=None):
+        faixas = self.faixas(hoje or date.today())
+        n_clientes, n_faixas = len(self.codigos), len(FAIXAS)
+        totais = np.bincount(self.clientes.astype(np.int64) * n_faixas + faixas, weights=self.valores,
+                             minlength=n_clientes * n_faixas).reshape(n_clientes, n_faixas)
+        df = pd.DataFrame(totais, columns=list(FAIXAS))
+        df.insert(0, 'codigo', self.codigos)
+        df['EM ATRASO'] = totais[:, 1:].sum(axis=1)
+        df['TOTAL'] = totais.sum(axis=1)
+        return df
+
+    # Projeção do que entra nos próximos `meses` meses (o primeiro é o mês atual): parcelas
+    # ainda não vencidas somadas pelo mês do vencimento. As vencidas ficam nas faixas de atraso.
+    def projecao(self, hoje=None, meses=MESES_PROJECAO):
+        hoje = np.datetime64(hoje or date.today(), 'D')
+        mes_atual = hoje.astype('datetime64[M]')
+        a_vencer = self.vencimentos >= hoje
+        deslocamento = (self.vencimentos[a_vencer].astype('datetime64[M]') - mes_atual).astype(np.int64)
+        dentro = deslocamento < meses
+        valores = self.valores[a_vencer][dentro]
+        deslocamento = deslocamento[dentro]
+        numeros = (mes_atual + np.arange(meses)).astype(object)
+        return pd.DataFrame({
+            'mes': [MESES[m.month - 1] for m in numeros],
+            'ano': [m.year for m in numeros],
+            'quantidade': np.bincount(deslocamento, minlength=meses),
+            'valor_parcela': np.bincount(deslocamento, weights=valores, minlength=meses),
+        })
+
+
+# Relatório completo da página PREVISÃO DE RECEBIMENTOS: (atrasos do escritório, atrasos por
+# cliente com nome, projeção mensal)
+def relatorio_previsao(hoje=None):
+    hoje = hoje or date.today()
+    carteira = Carteira.carregar()
+    with medir('relatório de atrasos e projeção', 'previsao') as span:
+        geral = carteira.atrasos_geral(hoje)
+        por_cliente = carteira.atrasos_por_cliente(hoje)
+        projecao = carteira.projecao(hoje)
+        span.linhas = len(carteira)
+    por_cliente = por_cliente.merge(load_nomes_clientes(), on='codigo', how='left')
+    return geral, por_cliente, projecao
@@ -0,0 +1,112 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+# Limites padrão do cache de consultas
+MAX_ENTRIES = 128
+MAX_ENTRY_BYTES = 32 * 1024 * 1024    # resultados maiores que isto não são guardados
+MAX_TOTAL_BYTES = 256 * 1024 * 1024
+
+
+# Função para estimar a memória ocupada por um resultado
+def result_size(result):
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, np.ndarray):
+        return result.nbytes
+    if isinstance(result, tuple):
+        return sum(result_size(item) for item in result)
+    return sys.getsizeof(result)
+
+# Função para devolver uma cópia do resultado, já que as páginas alteram os DataFrames recebidos.
+# Arrays NumPy são devolvidos como estão; quem os guarda no cache os marca como somente leitura.
+def copy_result(result):
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return result.copy()
+    if isinstance(result, tuple):
+        return tuple(copy_result(item) for item in result)
+    return result
+
+
+# Cache LRU em memória para as funções de leitura do banco.
+# Cada leitura consulta a versão atual dos dados (função `version`); se ela mudou desde a
+# última consulta, todas as entradas são descartadas. Assim os reruns do Streamlit são
+# atendidos da memória até que alguém grave algo no banco.
+class QueryCache:
+    def __init__(self, version, max_entries=MAX_ENTRIES, max_entry_bytes=MAX_ENTRY_BYTES, max_total_bytes=MAX_TOTAL_BYTES):
+        self.version = version
+        self.max_entries = max_entries
+        self.max_entry_bytes = max_entry_bytes
+        self.max_total_bytes = max_total_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = None
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._total_bytes = 0
+            self._generation = generation
+
+    def get_or_compute(self, key, compute):
+        generation = self.version()
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return copy_result(entry[0])
+            self.misses += 1
+
+        result = compute()
+        size = result_size(result)
+        if size > self.max_entry_bytes:
+            return result
+
+        with self._lock:
+            # Só guarda se nenhuma gravação aconteceu enquanto a consulta rodava
+            if self._generation == generation and key not in self._entries:
+                self._entries[key] = (result, size)
+                self._total_bytes += size
+                while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_total_bytes):
+                    _, (_, removed_size) = self._entries.popitem(last=False)
+                    self._total_bytes -= removed_size
+                    self.evictions += 1
+        return copy_result(result)
+
+    # Decorador para funções de leitura; a chave é o nome da função e seus argumentos
+    def cached(self, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key = (func.__qualname__, args, tuple(sorted(kwargs.items())))
+            return self.get_or_compute(key, lambda: func(*args, **kwargs))
+        wrapper.uncached = func
+        return wrapper
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
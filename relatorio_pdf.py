@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from fpdf import FPDF
+
+from formatacao import formatar_valor, formatar_valores, formatar_datas
+
+# Quantidade de relatórios gerados mantidos em memória
+MAX_PDFS_EM_CACHE = 32
+
+# Função para obter o caminho relativo ao executável
+def resource_path(relative_path):
+    """ Get the absolute path to the resource, works for dev and for PyInstaller """
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, relative_path)
+
+LOGO_PATH = resource_path('LOGO.png')
+
+_logo_info = None
+_logo_lock = threading.Lock()
+
+# Classe para criar PDF
+class PDF(FPDF):
+    def header(self):
+        self.use_logo()
+        self.image(LOGO_PATH, 10, 8, 33)
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, 'Relatório de Parcelas', 0, 1, 'C')
+        self.ln(10)
+
+    # O PNG do logotipo é decodificado uma única vez por processo e reaproveitado em todos os documentos
+    def use_logo(self):
+        global _logo_info
+        if LOGO_PATH in self.images or not hasattr(self, '_parsepng'):
+            return
+        with _logo_lock:
+            if _logo_info is None:
+                _logo_info = self._parsepng(LOGO_PATH)
+        self.images[LOGO_PATH] = dict(_logo_info, i=len(self.images) + 1)
+
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.cell(0, 10, 'Página %s de %s' % (self.page_no(), '{nb}'), 0, 0, 'C')
+        self.line(10, self.get_y() - 5, 200, self.get_y() - 5)
+
+    def chapter_title(self, title):
+        self.set_font('Arial', 'B', 12)
+        self.cell(0, 10, title, 0, 1, 'L')
+        self.ln(5)
+
+    def chapter_body(self, body):
+        self.set_font('Arial', '', 12)
+        self.multi_cell(0, 10, body)
+        self.ln()
+
+    # Devolve o documento como bytes, sem passar pelo disco
+    def to_bytes(self):
+        saida = self.output(dest='S')
+        return saida.encode('latin-1') if isinstance(saida, str) else bytes(saida)
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Chave do cache: hash dos dados do cliente e das parcelas que aparecem no relatório
+def chave_relatorio(cliente_info, parcelas):
+    dados = [cliente_info['nome'], cliente_info['tipo_acao'], cliente_info['valor_honorarios'],
+             parcelas[['valor_parcela', 'data_pagamento', 'pago']].values.tolist()]
+    return hashlib.sha256(json.dumps(dados, default=str).encode('utf-8')).hexdigest()
+
+# Função para gerar o relatório de parcelas em PDF (bytes). Um relatório idêntico a um já
+# gerado é devolvido do cache sem ser montado de novo.
+def generate_pdf(cliente_info, parcelas):
+    chave = chave_relatorio(cliente_info, parcelas)
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+    pdf_bytes = render_pdf(cliente_info, parcelas).to_bytes()
+
+    with _cache_lock:
+        _cache[chave] = pdf_bytes
+        while len(_cache) > MAX_PDFS_EM_CACHE:
+            _cache.popitem(last=False)
+    return pdf_bytes
+
+# Função para montar o documento PDF de um cliente
+def render_pdf(cliente_info, parcelas):
+    pdf = PDF()
+    pdf.alias_nb_pages()
+    pdf.add_page()
+
+    # Nome do cliente
+    pdf.chapter_title(f"Nome do Cliente: {cliente_info['nome']}")
+
+    # Tipo de Ação
+    pdf.chapter_title(f"Tipo de Ação: {cliente_info['tipo_acao']}")
+
+    # Valor dos Honorários
+    pdf.chapter_title(f"Valor Total dos Honorários: {formatar_valor(cliente_info['valor_honorarios'])}")
+
+    # Detalhamento das Parcelas
+    pdf.chapter_title("Detalhamento das Parcelas:")
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(30, 10, 'Nº da Parcela', 1)
+    pdf.cell(30, 10, 'Valor', 1)
+    pdf.cell(50, 10, 'Data de Vencimento', 1)
+    pdf.cell(30, 10, 'Pagamento', 1)
+    pdf.cell(50, 10, 'Data do Pagamento', 1)
+    pdf.ln()
+
+    pdf.set_font('Arial', '', 12)
+    # pago nulo (cadastros antigos) conta como em aberto, no total e na coluna Pagamento
+    pagas = parcelas['pago'].fillna(0).astype(bool)
+    total_a_pagar = parcelas.loc[~pagas, 'valor_parcela'].sum()
+    linhas = zip(formatar_valores(parcelas['valor_parcela']), formatar_datas(parcelas['data_pagamento']), pagas)
+    for i, (valor, data_vencimento, pago) in enumerate(linhas, start=1):
+        pdf.cell(30, 10, str(i), 1)
+        pdf.cell(30, 10, valor, 1)
+        pdf.cell(50, 10, data_vencimento, 1)
+        pdf.cell(30, 10, 'Sim' if pago else 'Não', 1)
+        pdf.cell(50, 10, data_vencimento if pago else '', 1)
+        pdf.ln()
+
+    # Total a pagar
+    pdf.ln(10)
+    pdf.set_font('Arial', 'B', 12)
+    pdf.cell(0, 10, f"Total a Pagar: {formatar_valor(total_a_pagar)}", 0, 1, 'L')
+
+    return pdf
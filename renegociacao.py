@@ -0,0 +1,164 @@
+import sqlite3
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from database import (read_sql, transaction, retry_on_lock, excel_backup, banco_do_codigo, somar_meses,
+                      SQL_INSERT_PARCELA)
+from instrumentacao import medir
+
+# Renegociação das parcelas em aberto de um ou vários clientes: adiar todas por N meses e/ou
+# redividir o saldo em aberto em novas parcelas mensais. O novo plano é calculado para todos os
+# clientes de uma vez, com arrays NumPy; a diferença para o plano atual é mostrada antes de gravar
+# e gravada numa única transação por banco de escritório.
+
+SQL_PARCELAS_CLIENTES = ('SELECT codigo_cliente, numero_parcela, valor_parcela, data_pagamento, pago FROM parcelas '
+                         'WHERE codigo_cliente IN ({}) ORDER BY codigo_cliente, numero_parcela')
+
+# As alterações só valem se a parcela ainda estiver como na prévia (em aberto, mesmo valor e data).
+# Parcelas antigas podem ter pago NULL; a prévia as trata como em aberto, e aqui também.
+SQL_REAGENDAR_PARCELA = ('UPDATE parcelas SET valor_parcela=?, data_pagamento=? '
+                         'WHERE codigo_cliente=? AND numero_parcela=? AND COALESCE(pago, 0)=0 AND valor_parcela=? AND data_pagamento=?')
+SQL_EXCLUIR_PARCELA = ('DELETE FROM parcelas '
+                       'WHERE codigo_cliente=? AND numero_parcela=? AND COALESCE(pago, 0)=0 AND valor_parcela=? AND data_pagamento=?')
+
+ACOES = {'both': 'ALTERAR', 'left_only': 'EXCLUIR', 'right_only': 'INCLUIR'}
+
+COLUNAS_DIFERENCA = ['codigo_cliente', 'numero_parcela', 'acao', 'valor_antes', 'data_antes', 'valor_depois', 'data_depois']
+
+
+class ErroRenegociacao(ValueError):
+    pass
+
+
+# Função para carregar todas as parcelas dos clientes escolhidos, lidas na hora (sem cache),
+# já que a prévia precisa do estado atual
+def load_parcelas_clientes(codigos):
+    por_banco = defaultdict(list)
+    for codigo in codigos:
+        por_banco[banco_do_codigo(codigo)].append(codigo)
+    partes = [read_sql(SQL_PARCELAS_CLIENTES.format(', '.join('?' * len(deste))), tuple(deste), banco)
+              for banco, deste in por_banco.items()]
+    if not partes:
+        return pd.DataFrame(columns=['codigo_cliente', 'numero_parcela', 'valor_parcela', 'data_pagamento', 'pago'])
+    return pd.concat(partes, ignore_index=True)
+
+# Função para calcular o novo plano das parcelas em aberto. Sem redividir, cada parcela é adiada
+# `meses` meses. Redividindo, o saldo em aberto de cada cliente vira `quantidade` parcelas (padrão:
+# as mesmas em aberto) mensais a partir do primeiro vencimento em aberto adiado `meses` meses; os
+# centavos que sobram da divisão vão para a última. Devolve codigo_cliente, numero_parcela,
+# valor_parcela e data_pagamento (texto AAAA-MM-DD) das parcelas em aberto depois da renegociação.
+def novo_plano(parcelas, meses=0, redividir=False, quantidade=None):
+    parcelas = parcelas.sort_values(['codigo_cliente', 'numero_parcela'])
+    abertas = parcelas[~parcelas['pago'].fillna(False).astype(bool)]
+    vencimentos = pd.to_datetime(abertas['data_pagamento'], format='%Y-%m-%d').to_numpy().astype('datetime64[D]')
+    if not (redividir or quantidade):
+        return pd.DataFrame({
+            'codigo_cliente': abertas['codigo_cliente'].to_numpy(),
+            'numero_parcela': abertas['numero_parcela'].to_numpy(),
+            'valor_parcela': abertas['valor_parcela'].to_numpy(dtype=np.float64),
+            'data_pagamento': somar_meses(vencimentos, meses).astype(str),
+        })
+
+    with medir('redividir saldos', 'renegociacao') as span:
+        # As parcelas em aberto de cada cliente estão juntas (ordenadas por cliente)
+        codigos, inicios, em_aberto = np.unique(abertas['codigo_cliente'].to_numpy(dtype=object), return_index=True, return_counts=True)
+        centavos = np.round(abertas['valor_parcela'].to_numpy(dtype=np.float64) * 100).astype(np.int64)
+        saldos = np.add.reduceat(centavos, inicios) if len(inicios) else centavos[:0]
+        primeiros = np.minimum.reduceat(vencimentos, inicios) if len(inicios) else vencimentos[:0]
+        novas = np.full(len(codigos), quantidade, dtype=np.int64) if quantidade else em_aberto
+
+        # Uma linha por parcela nova: cliente (índice em `codigos`) e posição dentro do plano do cliente
+        cliente = np.repeat(np.arange(len(codigos)), novas)
+        posicao = np.arange(len(cliente)) - np.repeat(np.cumsum(novas) - novas, novas)
+        base = saldos // novas
+        valores = base[cliente] + np.where(posicao == novas[cliente] - 1, (saldos - base * novas)[cliente], 0)
+
+        # Os números das parcelas em aberto são reaproveitados; as que passarem disso continuam a
+        # numeração depois da maior parcela do cliente (paga ou não)
+        numeros_abertos = abertas['numero_parcela'].to_numpy(dtype=np.int64)
+        ultimos = parcelas.groupby('codigo_cliente')['numero_parcela'].max().reindex(codigos).to_numpy(dtype=np.int64)
+        reaproveita = posicao < em_aberto[cliente]
+        numeros = np.where(reaproveita, numeros_abertos[np.minimum(inicios[cliente] + posicao, len(numeros_abertos) - 1)],
+                           ultimos[cliente] + posicao - em_aberto[cliente] + 1)
+        span.linhas = len(cliente)
+
+    return pd.DataFrame({
+        'codigo_cliente': codigos[cliente],
+        'numero_parcela': numeros,
+        'valor_parcela': valores / 100,
+        'data_pagamento': somar_meses(primeiros[cliente], meses + posicao).astype(str),
+    })
+
+# Função para comparar o plano atual com o novo: uma linha por parcela que muda, com a ação
+# (ALTERAR, INCLUIR ou EXCLUIR) e o valor e a data antes e depois
+def comparar_planos(parcelas, plano):
+    abertas = parcelas[~parcelas['pago'].fillna(False).astype(bool)]
+    antes = abertas[['codigo_cliente', 'numero_parcela', 'valor_parcela', 'data_pagamento']].astype({'numero_parcela': 'int64'})
+    depois = plano.astype({'numero_parcela': 'int64'})
+    diferenca = antes.merge(depois, on=['codigo_cliente', 'numero_parcela'], how='outer', suffixes=('_antes', '_depois'), indicator=True)
+    diferenca = diferenca.rename(columns={'valor_parcela_antes': 'valor_antes', 'data_pagamento_antes': 'data_antes',
+                                          'valor_parcela_depois': 'valor_depois', 'data_pagamento_depois': 'data_depois'})
+    diferenca['acao'] = diferenca['_merge'].astype(str).map(ACOES)
+    iguais = ((diferenca['acao'] == 'ALTERAR') & (diferenca['valor_antes'].round(2) == diferenca['valor_depois'].round(2))
+              & (diferenca['data_antes'] == diferenca['data_depois']))
+    diferenca = diferenca[~iguais].sort_values(['codigo_cliente', 'numero_parcela'])
+    return diferenca[COLUNAS_DIFERENCA].reset_index(drop=True)
+
+# Totais por cliente antes e depois da renegociação: parcelas e saldo em aberto
+def resumo_renegociacao(parcelas, plano):
+    abertas = parcelas[~parcelas['pago'].fillna(False).astype(bool)]
+    antes = abertas.groupby('codigo_cliente')['valor_parcela'].agg(parcelas_antes='count', saldo_antes='sum')
+    depois = plano.groupby('codigo_cliente')['valor_parcela'].agg(parcelas_depois='count', saldo_depois='sum')
+    return antes.join(depois, how='outer').fillna(0).reset_index()
+
+# Prévia de uma renegociação: (parcelas atuais, diferença, resumo por cliente)
+def previa_renegociacao(codigos, meses=0, redividir=False, quantidade=None):
+    with medir('prévia da renegociação', 'renegociacao') as span:
+        parcelas = load_parcelas_clientes(codigos)
+        plano = novo_plano(parcelas, meses, redividir, quantidade)
+        diferenca = comparar_planos(parcelas, plano)
+        span.linhas = len(diferenca)
+    return diferenca, resumo_renegociacao(parcelas, plano)
+
+
+# Grava a diferença de um banco numa transação. Se alguma parcela mudou desde a prévia (paga ou
+# editada por outra pessoa) ou o número de linhas gravadas não bate com o plano, nada é gravado.
+@retry_on_lock
+def _aplicar_no_banco(banco, diferenca):
+    alterar = diferenca[diferenca['acao'] == 'ALTERAR']
+    excluir = diferenca[diferenca['acao'] == 'EXCLUIR']
+    incluir = diferenca[diferenca['acao'] == 'INCLUIR']
+    with transaction(banco) as conn:
+        alteradas = conn.executemany(SQL_REAGENDAR_PARCELA, [
+            (float(valor_depois), data_depois, codigo, int(numero), float(valor_antes), data_antes)
+            for codigo, numero, valor_antes, data_antes, valor_depois, data_depois
+            in alterar[['codigo_cliente', 'numero_parcela', 'valor_antes', 'data_antes', 'valor_depois', 'data_depois']].itertuples(index=False)
+        ]).rowcount if len(alterar) else 0
+        excluidas = conn.executemany(SQL_EXCLUIR_PARCELA, [
+            (codigo, int(numero), float(valor_antes), data_antes)
+            for codigo, numero, valor_antes, data_antes in excluir[['codigo_cliente', 'numero_parcela', 'valor_antes', 'data_antes']].itertuples(index=False)
+        ]).rowcount if len(excluir) else 0
+        if alteradas != len(alterar) or excluidas != len(excluir):
+            raise ErroRenegociacao('AS PARCELAS FORAM ALTERADAS DEPOIS DA PRÉVIA. GERE A PRÉVIA NOVAMENTE.')
+        try:
+            incluidas = conn.executemany(SQL_INSERT_PARCELA, [
+                (codigo, int(numero), float(valor), data, None, False)
+                for codigo, numero, valor, data in incluir[['codigo_cliente', 'numero_parcela', 'valor_depois', 'data_depois']].itertuples(index=False)
+            ]).rowcount if len(incluir) else 0
+        except sqlite3.IntegrityError:
+            raise ErroRenegociacao('PARCELAS FORAM INCLUÍDAS DEPOIS DA PRÉVIA. GERE A PRÉVIA NOVAMENTE.')
+        if incluidas != len(incluir):
+            raise ErroRenegociacao('NEM TODAS AS PARCELAS NOVAS FORAM INCLUÍDAS. GERE A PRÉVIA NOVAMENTE.')
+
+# Função para gravar uma renegociação a partir da diferença da prévia. Cada banco de escritório
+# é gravado numa transação própria. Devolve o número de parcelas alteradas, incluídas e excluídas.
+def aplicar_renegociacao(diferenca):
+    bancos = diferenca['codigo_cliente'].map(banco_do_codigo)
+    with medir('gravar renegociação', 'renegociacao') as span:
+        for banco, deste in diferenca.groupby(bancos, sort=False):
+            _aplicar_no_banco(banco, deste)
+        span.linhas = len(diferenca)
+    excel_backup.request()
+    return diferenca['acao'].value_counts().reindex(list(ACOES.values()), fill_value=0).to_dict()
@@ -0,0 +1,292 @@
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import database
+from database import data_version, bump_write_generation, escritorios
+from instrumentacao import medir
+
+# Cópias do clientes.db feitas pela API de backup online do SQLite. A cópia anda em passos
+# de poucas páginas, liberando o banco entre eles, então o aplicativo continua gravando
+# normalmente enquanto o snapshot é feito.
+
+SNAPSHOT_DIR = 'snapshots'
+SNAPSHOT_FORMAT = '%Y%m%d_%H%M%S'
+
+# Nome dos arquivos: <banco>_<AAAAMMDD_HHMMSS>[-motivo][-n].db, em que <banco> é o nome do
+# arquivo do banco sem extensão (clientes_20250101_120000.db para o clientes.db) e -n só
+# aparece quando já existe um snapshot do mesmo banco no mesmo segundo
+SNAPSHOT_NOME = re.compile(r'^(?P<banco>.+?)_(?P<data>\d{8}_\d{6})(?:-.*)?\.db$')
+
+# Páginas copiadas por passo e pausa entre os passos
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.005
+
+# Intervalo dos snapshots automáticos (só são feitos se o banco mudou desde o último)
+INTERVALO_SEGUNDOS = 60 * 60
+
+# Retenção: os mais recentes, mais o último de cada dia e o último de cada mês
+MANTER_RECENTES = 24
+MANTER_DIAS = 14
+MANTER_MESES = 12
+
+
+# Nome de um banco nos arquivos de snapshot: o nome do arquivo sem a extensão
+def nome_banco(banco=None):
+    return os.path.splitext(os.path.basename(banco or database.DB_PATH))[0]
+
+# Banco (nome sem extensão) e data/hora de um snapshot a partir do nome do arquivo
+# ((None, None) se não for um snapshot)
+def identificar_snapshot(nome):
+    encontrado = SNAPSHOT_NOME.match(os.path.basename(nome))
+    if not encontrado:
+        return None, None
+    try:
+        return encontrado['banco'], datetime.strptime(encontrado['data'], SNAPSHOT_FORMAT)
+    except ValueError:
+        return None, None
+
+# Data/hora de um snapshot a partir do nome do arquivo (None se não for um snapshot)
+def data_snapshot(nome):
+    return identificar_snapshot(nome)[1]
+
+# Lista os snapshots do mais recente para o mais antigo: [(data, caminho)]. Com `banco`,
+# só os daquele banco.
+def listar_snapshots(pasta=None, banco=None):
+    pasta = pasta or SNAPSHOT_DIR
+    if not os.path.isdir(pasta):
+        return []
+    snapshots = []
+    for nome in os.listdir(pasta):
+        deste, data = identificar_snapshot(nome)
+        if data and (banco is None or deste == nome_banco(banco)):
+            snapshots.append((data, os.path.join(pasta, nome)))
+    # No mesmo segundo, a data de modificação desempata
+    return sorted(snapshots, key=lambda item: (item[0], os.path.getmtime(item[1])), reverse=True)
+
+# Copia `origem` para `destino` pela API de backup, em passos de PAGINAS_POR_PASSO páginas
+def copiar_banco(origem, destino, progresso=None):
+    def passo(status, restantes, total):
+        if progresso:
+            progresso(total - restantes, total)
+    origem.backup(destino, pages=PAGINAS_POR_PASSO, progress=passo, sleep=PAUSA_ENTRE_PASSOS)
+
+# Dá ao arquivo temporário o nome definitivo sem sobrescrever nenhum snapshot: se o nome já
+# existe (outro snapshot do mesmo banco no mesmo segundo), tenta -2, -3, ...
+def nomear_snapshot(tmp_path, base):
+    numero = 1
+    while True:
+        caminho = f'{base}.db' if numero == 1 else f'{base}-{numero}.db'
+        try:
+            os.link(tmp_path, caminho)  # Falha se o arquivo já existir
+        except FileExistsError:
+            numero += 1
+            continue
+        os.remove(tmp_path)
+        return caminho
+
+# Função para criar um snapshot do banco (padrão: DB_PATH). Grava num arquivo temporário,
+# confere a integridade e só então dá o nome definitivo. Devolve o caminho do snapshot.
+def criar_snapshot(pasta=None, motivo=None, progresso=None, banco=None):
+    pasta = pasta or SNAPSHOT_DIR
+    os.makedirs(pasta, exist_ok=True)
+    banco = banco or database.DB_PATH
+    sufixo = f'-{motivo}' if motivo else ''
+    base = os.path.join(pasta, f'{nome_banco(banco)}_{datetime.now().strftime(SNAPSHOT_FORMAT)}{sufixo}')
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=pasta)
+    os.close(fd)
+
+    with medir('snapshot', 'backup', base):
+        origem = sqlite3.connect(banco, timeout=10)
+        destino = sqlite3.connect(tmp_path)
+        try:
+            copiar_banco(origem, destino, progresso)
+            resultado = destino.execute('PRAGMA quick_check').fetchone()[0]
+            if resultado != 'ok':
+                raise sqlite3.DatabaseError(f'Snapshot corrompido: {resultado}')
+        except BaseException:
+            destino.close()
+            os.remove(tmp_path)
+            raise
+        finally:
+            origem.close()
+        destino.close()
+    return nomear_snapshot(tmp_path, base)
+
+# Escolhe os snapshots a manter: os MANTER_RECENTES mais novos, o mais novo de cada um dos
+# últimos MANTER_DIAS dias e o mais novo de cada um dos últimos MANTER_MESES meses
+def snapshots_a_manter(snapshots):
+    manter = set(caminho for _, caminho in snapshots[:MANTER_RECENTES])
+    dias, meses = {}, {}
+    for data, caminho in snapshots:  # do mais novo para o mais antigo
+        dias.setdefault(data.date(), caminho)
+        meses.setdefault((data.year, data.month), caminho)
+    manter.update(list(dias.values())[:MANTER_DIAS])
+    manter.update(list(meses.values())[:MANTER_MESES])
+    return manter
+
+# Apaga os snapshots fora da política de retenção, aplicada separadamente a cada banco;
+# devolve os caminhos apagados
+def aplicar_retencao(pasta=None):
+    por_banco = {}
+    for data, caminho in listar_snapshots(pasta):
+        por_banco.setdefault(identificar_snapshot(caminho)[0], []).append((data, caminho))
+    apagados = []
+    for snapshots in por_banco.values():
+        manter = snapshots_a_manter(snapshots)
+        for _, caminho in snapshots:
+            if caminho not in manter:
+                os.remove(caminho)
+                apagados.append(caminho)
+    return apagados
+
+# Banco de escritório de onde saiu um snapshot, pelo nome do arquivo
+def banco_do_snapshot(caminho):
+    deste = identificar_snapshot(caminho)[0]
+    for escritorio in escritorios():
+        if nome_banco(escritorio.banco) == deste:
+            return escritorio.banco
+    raise ValueError(f'{os.path.basename(caminho)} não é snapshot de nenhum banco de escritório; informe o banco')
+
+# Função para restaurar um snapshot sobre o banco de onde ele saiu (ou sobre `banco`). Antes,
+# o estado atual desse banco vira um snapshot ('antes_restauracao'), para que a restauração
+# também possa ser desfeita.
+def restaurar_snapshot(caminho, pasta=None, banco=None):
+    banco = banco or banco_do_snapshot(caminho)
+    origem = sqlite3.connect(f'file:{os.path.abspath(caminho)}?mode=ro', uri=True)
+    try:
+        resultado = origem.execute('PRAGMA quick_check').fetchone()[0]
+        if resultado != 'ok':
+            raise sqlite3.DatabaseError(f'Snapshot corrompido: {resultado}')
+        seguranca = criar_snapshot(pasta, motivo='antes_restauracao', banco=banco)
+        destino = sqlite3.connect(banco, timeout=30)
+        try:
+            # Uma cópia só, sem passos: as outras conexões não podem ver o banco pela metade
+            origem.backup(destino)
+        finally:
+            destino.close()
+    finally:
+        origem.close()
+    bump_write_generation()
+    return seguranca
+
+
+# Thread que faz snapshots dos bancos de todos os escritórios a cada INTERVALO_SEGUNDOS, só
+# dos que mudaram desde o último. snapshot_now() faz de todos na hora (botão da barra lateral).
+class SnapshotScheduler:
+    def __init__(self, interval=INTERVALO_SEGUNDOS, pasta=None):
+        self.interval = interval
+        self.pasta = pasta
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._thread = None
+        self._versions = {}
+        self._running = False
+        self._last_snapshot = None
+        self._last_path = None
+        self._last_error = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='snapshots', daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._snapshot(None, force=False)
+            except Exception:
+                pass  # Fica em status(); tenta de novo no próximo intervalo
+
+    # Faz os snapshots imediatamente, na thread de quem chamou, e devolve os caminhos
+    def snapshot_now(self, motivo='manual'):
+        return self._snapshot(motivo, force=True)
+
+    def _snapshot(self, motivo, force):
+        with self._snapshot_lock:
+            # Só o PRAGMA data_version de cada banco: o contador de gravações do processo é um
+            # só para todos os escritórios e faria todos parecerem alterados
+            versions = {e.banco: data_version(e.banco)[1] for e in escritorios()}
+            mudaram = [banco for banco, version in versions.items() if force or version != self._versions.get(banco)]
+            if not mudaram:
+                return []
+            with self._lock:
+                self._running = True
+            try:
+                caminhos = []
+                for banco in mudaram:
+                    caminhos.append(criar_snapshot(self.pasta, motivo, banco=banco))
+                    with self._lock:
+                        self._versions[banco] = versions[banco]
+                aplicar_retencao(self.pasta)
+            except Exception as exc:
+                with self._lock:
+                    self._last_error = f'{datetime.now():%d/%m/%Y %H:%M:%S} {exc}'
+                raise
+            else:
+                with self._lock:
+                    self._last_snapshot = datetime.now()
+                    self._last_path = caminhos[-1]
+                    self._last_error = None
+                return caminhos
+            finally:
+                with self._lock:
+                    self._running = False
+
+    def status(self):
+        with self._lock:
+            return {
+                'last_snapshot': self._last_snapshot,
+                'path': self._last_path,
+                'running': self._running,
+                'last_error': self._last_error,
+            }
+
+
+# Snapshots automáticos do processo do aplicativo (iniciados pelo controle_financeiro.py)
+agendador = SnapshotScheduler()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Snapshots dos bancos dos escritórios pela API de backup online do SQLite.')
+    sub = parser.add_subparsers(dest='comando', required=True)
+    sub.add_parser('criar', help='cria um snapshot de cada escritório agora e aplica a retenção')
+    sub.add_parser('listar', help='lista os snapshots existentes')
+    sub.add_parser('limpar', help='apaga os snapshots fora da política de retenção')
+    restaurar = sub.add_parser('restaurar', help='restaura um snapshot sobre o banco de onde ele saiu')
+    restaurar.add_argument('arquivo')
+    restaurar.add_argument('--banco', help='banco a sobrescrever (padrão: o do nome do snapshot)')
+    parser.add_argument('--pasta', default=SNAPSHOT_DIR)
+    args = parser.parse_args(argv)
+
+    if args.comando == 'criar':
+        for escritorio in escritorios():
+            inicio = time.perf_counter()
+            caminho = criar_snapshot(args.pasta, banco=escritorio.banco,
+                                     progresso=lambda feitas, total: print(f'\r{feitas}/{total} PÁGINAS', end='', flush=True))
+            print(f'\rSNAPSHOT {caminho} EM {time.perf_counter() - inicio:.1f}s')
+        apagados = aplicar_retencao(args.pasta)
+        print(f'{len(apagados)} ANTIGO(S) APAGADO(S)')
+    elif args.comando == 'listar':
+        for data, caminho in listar_snapshots(args.pasta):
+            print(f'{data:%d/%m/%Y %H:%M:%S}  {os.path.getsize(caminho) / 1024 / 1024:8.1f} MB  {caminho}')
+    elif args.comando == 'limpar':
+        for caminho in aplicar_retencao(args.pasta):
+            print(f'APAGADO {caminho}')
+    elif args.comando == 'restaurar':
+        seguranca = restaurar_snapshot(args.arquivo, args.pasta, args.banco)
+        print(f'{args.arquivo} RESTAURADO. ESTADO ANTERIOR SALVO EM {seguranca}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
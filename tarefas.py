@@ -0,0 +1,238 @@
+import io
+import os
+import threading
+import time
+import uuid
+import zlib
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+import database
+from database import (get_connection, read_sql, retry_on_lock, data_version, versao_escritorios,
+                      load_parcelas_vencidas, load_parcelas_a_receber)
+from instrumentacao import medir
+from query_cache import QueryCache
+
+# Relatórios calculados em segundo plano. Cada tarefa registrada roda a cada `intervalo` segundos
+# e/ou nos horários do dia indicados; o resultado vai para a tabela relatorios_prontos com o
+# horário do cálculo e a versão dos dados, e as páginas mostram o último resultado em vez de
+# consultar tudo de novo (avisando quando os dados mudaram depois do cálculo).
+#
+# Os resultados ficam num arquivo próprio, ao lado do banco padrão, e não nos bancos dos
+# escritórios: gravar um resultado não muda a versão dos dados e não invalida o cache das leituras.
+RELATORIOS_PATH = os.path.join(os.path.dirname(os.path.abspath(database.DB_PATH)), 'relatorios_prontos.db')
+
+# Identifica este processo na versão gravada: o PRAGMA data_version só é comparável dentro da
+# mesma conexão, então um resultado calculado por outro processo conta como desatualizado
+PROCESSO = uuid.uuid4().hex
+
+Tarefa = namedtuple('Tarefa', 'nome funcao intervalo horarios datas')
+
+# Tarefas registradas: nome -> Tarefa
+TAREFAS = {}
+
+# Espera máxima entre duas verificações da agenda
+ESPERA_MAXIMA = 60
+
+def tarefa(nome, intervalo=None, horarios=(), datas=()):
+    def registrar(func):
+        TAREFAS[nome] = Tarefa(nome, func, intervalo, tuple(horarios), tuple(datas))
+        return func
+    return registrar
+
+
+# Vencidas até hoje: recalculadas logo depois da meia-noite, quando a lista muda sem ninguém gravar
+@tarefa('parcelas_vencidas', intervalo=15 * 60, horarios=('00:05',), datas=('data_pagamento',))
+def tarefa_parcelas_vencidas():
+    return load_parcelas_vencidas()
+
+# Todas as parcelas a receber; a página filtra por mês e ano sobre este resultado
+@tarefa('parcelas_a_receber', intervalo=15 * 60, datas=('data_pagamento',))
+def tarefa_parcelas_a_receber():
+    return load_parcelas_a_receber()
+
+
+SQL_CRIAR_RELATORIOS = '''CREATE TABLE IF NOT EXISTS relatorios_prontos
+                          (nome TEXT PRIMARY KEY, calculado_em TEXT NOT NULL, versao TEXT NOT NULL, duracao REAL, dados BLOB)'''
+SQL_SALVAR_RELATORIO = 'INSERT OR REPLACE INTO relatorios_prontos (nome, calculado_em, versao, duracao, dados) VALUES (?, ?, ?, ?, ?)'
+SQL_RELATORIO = 'SELECT calculado_em, versao, dados FROM relatorios_prontos WHERE nome = ?'
+SQL_CALCULADOS = 'SELECT nome, calculado_em FROM relatorios_prontos'
+
+_tabela_criada = False
+
+# Função para criar a tabela dos resultados na primeira vez que o arquivo é usado
+def preparar_relatorios():
+    global _tabela_criada
+    if not _tabela_criada:
+        with get_connection(RELATORIOS_PATH) as conn:
+            conn.execute(SQL_CRIAR_RELATORIOS)
+        _tabela_criada = True
+
+# Versão dos dados de todos os escritórios, neste processo, como texto. A data de hoje faz parte
+# da versão: os relatórios comparam vencimentos com hoje, então um resultado de ontem está
+# desatualizado mesmo sem nenhuma gravação.
+def versao_atual():
+    return f'{PROCESSO} {date.today().isoformat()} {versao_escritorios()}'
+
+# Cache dos resultados carregados, invalidado só quando um resultado novo é gravado
+cache_relatorios = QueryCache(lambda: data_version(RELATORIOS_PATH)[1])
+
+def serializar(df):
+    return zlib.compress(df.to_json(orient='split', index=False, date_format='iso').encode('utf-8'))
+
+def desserializar(dados, datas=()):
+    df = pd.read_json(io.StringIO(zlib.decompress(dados).decode('utf-8')), orient='split', dtype=False, convert_dates=False)
+    for coluna in datas:
+        df[coluna] = pd.to_datetime(df[coluna])
+    return df
+
+# Grava sem transaction(), que contaria a gravação como alteração dos dados
+@retry_on_lock
+def salvar_resultado(nome, calculado_em, versao, duracao, dados):
+    preparar_relatorios()
+    with get_connection(RELATORIOS_PATH) as conn:
+        conn.execute(SQL_SALVAR_RELATORIO, (nome, calculado_em.isoformat(timespec='seconds'), versao, duracao, dados))
+        conn.commit()
+
+# Função para executar uma tarefa agora e gravar o resultado. A versão é lida antes do cálculo,
+# então uma gravação feita durante ele deixa o resultado como desatualizado.
+def executar_tarefa(nome):
+    tarefa = TAREFAS[nome]
+    calculado_em = datetime.now()
+    versao = versao_atual()
+    inicio = time.perf_counter()
+    with medir(f'tarefa {nome}', 'tarefa') as span:
+        resultado = tarefa.funcao()
+        dados = None
+        if resultado is not None:
+            dados = serializar(resultado)
+            span.linhas = len(resultado)
+    salvar_resultado(nome, calculado_em, versao, time.perf_counter() - inicio, dados)
+
+@cache_relatorios.cached
+def _carregar_resultado(nome):
+    preparar_relatorios()
+    df = read_sql(SQL_RELATORIO, (nome,), RELATORIOS_PATH)
+    if df.empty:
+        return None
+    dados = df['dados'].iloc[0]
+    resultado = None if dados is None else desserializar(dados, TAREFAS[nome].datas)
+    return resultado, datetime.fromisoformat(df['calculado_em'].iloc[0]), df['versao'].iloc[0]
+
+# Último resultado de uma tarefa: (DataFrame, horário do cálculo, desatualizado). Se a tarefa
+# ainda não rodou nenhuma vez, roda agora. Se os dados mudaram depois do cálculo, o resultado
+# vem marcado como desatualizado e o agendador é avisado para recalcular.
+def resultado_pronto(nome):
+    resultado = _carregar_resultado(nome)
+    if resultado is None:
+        executar_tarefa(nome)
+        resultado = _carregar_resultado(nome)
+    df, calculado_em, versao = resultado
+    desatualizado = versao != versao_atual()
+    if desatualizado:
+        agendador.solicitar(nome)
+    return df, calculado_em, desatualizado
+
+def ultimas_execucoes():
+    preparar_relatorios()
+    df = read_sql(SQL_CALCULADOS, (), RELATORIOS_PATH)
+    return {nome: datetime.fromisoformat(calculado_em) for nome, calculado_em in zip(df['nome'], df['calculado_em'])}
+
+# Próxima execução de uma tarefa que rodou pela última vez em `ultima` (None: nunca rodou)
+def proxima_execucao(tarefa, ultima, agora):
+    if ultima is None:
+        return agora
+    candidatos = []
+    if tarefa.intervalo:
+        candidatos.append(ultima + timedelta(seconds=tarefa.intervalo))
+    for horario in tarefa.horarios:
+        hora, minuto = (int(parte) for parte in horario.split(':'))
+        quando = ultima.replace(hour=hora, minute=minuto, second=0, microsecond=0)
+        candidatos.append(quando if quando > ultima else quando + timedelta(days=1))
+    return min(candidatos) if candidatos else None
+
+
+# Thread que executa as tarefas na hora marcada. A agenda vem do horário do último cálculo
+# gravado no banco, então tarefas atrasadas (aplicativo fechado) rodam logo ao iniciar.
+# solicitar() pede que uma tarefa rode assim que possível (resultado desatualizado).
+class TaskScheduler:
+    def __init__(self, tarefas=TAREFAS):
+        self.tarefas = tarefas
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = None
+        self._errors = {}
+        self._solicitadas = set()
+        self._acordar = threading.Event()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='tarefas', daemon=True)
+                self._thread.start()
+        return self
+
+    def solicitar(self, nome):
+        with self._lock:
+            if nome == self._running or nome in self._solicitadas:
+                return
+            self._solicitadas.add(nome)
+        self._acordar.set()
+
+    def _run(self):
+        while True:
+            self._acordar.clear()
+            try:
+                espera = self._executar_devidas()
+            except Exception:
+                espera = ESPERA_MAXIMA  # Banco indisponível: tenta de novo mais tarde
+            self._acordar.wait(min(max(espera, 1), ESPERA_MAXIMA))
+
+    # Executa as tarefas vencidas ou solicitadas e devolve os segundos até a próxima
+    def _executar_devidas(self):
+        with self._lock:
+            solicitadas, self._solicitadas = self._solicitadas, set()
+        ultimas = ultimas_execucoes()
+        agora = datetime.now()
+        proximas = {}
+        for nome, tarefa in self.tarefas.items():
+            quando = proxima_execucao(tarefa, ultimas.get(nome), agora)
+            if nome in solicitadas:
+                quando = agora
+            if quando is None:
+                continue
+            if quando <= agora:
+                self._executar(nome)
+                quando = proxima_execucao(tarefa, datetime.now(), datetime.now())
+            proximas[nome] = quando
+        if not proximas:
+            return ESPERA_MAXIMA
+        return (min(proximas.values()) - datetime.now()).total_seconds()
+
+    def _executar(self, nome):
+        with self._lock:
+            self._running = nome
+        try:
+            executar_tarefa(nome)
+        except Exception as exc:
+            with self._lock:
+                self._errors[nome] = f'{datetime.now():%d/%m/%Y %H:%M:%S} {exc}'
+        else:
+            with self._lock:
+                self._errors.pop(nome, None)
+        finally:
+            with self._lock:
+                self._running = None
+
+    def status(self):
+        with self._lock:
+            return {
+                'running': self._running,
+                'errors': dict(self._errors),
+            }
+
+
+# Tarefas do processo do aplicativo (iniciadas pelo controle_financeiro.py)
+agendador = TaskScheduler()
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from database import Escritorio, transaction, SQL_INSERT_CLIENTE, SQL_INSERT_PARCELA
+
+
+# Dois escritórios (MATRIZ sem prefixo e SÃO PAULO com prefixo SP), cada um no seu banco vazio
+@pytest.fixture
+def dois_escritorios(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    lista = [Escritorio('', 'MATRIZ', str(tmp_path / 'matriz.db')),
+             Escritorio('SP', 'SÃO PAULO', str(tmp_path / 'sp.db'))]
+    monkeypatch.setattr(database, 'ESCRITORIOS', lista)
+    monkeypatch.setattr(database, 'DB_PATH', lista[0].banco)
+    database.ensure_schema()
+    return lista
+
+
+# Grava um cliente e as suas parcelas [(número, valor, data, pago)] no banco do escritório
+def gravar_cliente(banco, codigo, nome, parcelas=()):
+    with transaction(banco) as conn:
+        conn.execute(SQL_INSERT_CLIENTE, (codigo, nome, '', '', '', 'CÍVEL', 1000.0, '', '2025-01-01'))
+        conn.executemany(SQL_INSERT_PARCELA, [(codigo, numero, valor, data, None, pago)
+                                              for numero, valor, data, pago in parcelas])
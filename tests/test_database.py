@@ -0,0 +1,53 @@
+import sqlite3
+from datetime import date
+
+import pandas as pd
+
+import database
+from conftest import gravar_cliente
+from database import parcelas_alteradas, read_sql, load_parcelas_vencidas, load_parcelas_a_receber, load_parcelas_nao_pagas_agrupadas
+
+
+def test_pago_nulo_conta_como_em_aberto(dois_escritorios):
+    matriz, sp = dois_escritorios
+    gravar_cliente(matriz.banco, '0001', 'ANA', [(1, 100.0, '2025-01-10', None), (2, 50.0, '2025-02-10', 1)])
+    gravar_cliente(sp.banco, 'SP0001', 'BRUNO', [(1, 200.0, '2025-01-20', 0)])
+
+    assert read_sql('SELECT pago FROM parcelas ORDER BY numero_parcela', path=matriz.banco)['pago'].tolist() == [0, 1]
+    assert load_parcelas_vencidas()['valor_parcela'].tolist() == [100.0, 200.0]
+    assert load_parcelas_a_receber()['valor_parcela'].sum() == 300.0
+    assert load_parcelas_nao_pagas_agrupadas()['valor_parcela'].sum() == 300.0
+
+
+def test_migracao_normaliza_pago_nulo(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    banco = str(tmp_path / 'antigo.db')
+    conn = sqlite3.connect(banco)
+    database.create_tables(conn)
+    conn.execute("INSERT INTO parcelas (codigo_cliente, numero_parcela, valor_parcela, data_pagamento, pago) "
+                 "VALUES ('0001', 1, 100.0, '2025-01-10', NULL)")
+    conn.commit()
+    conn.close()
+
+    database.migrar(banco)
+    assert read_sql('SELECT pago FROM parcelas', path=banco)['pago'].tolist() == [0]
+    assert read_sql('SELECT total FROM resumo_mensal WHERE pago = 0', path=banco)['total'].tolist() == [100.0]
+
+
+def test_parcela_sem_data_nao_conta_como_alterada():
+    colunas = ['valor_parcela', 'pago', 'data_pagamento', 'conta_deposito']
+    originais = pd.DataFrame({
+        'numero_parcela': [1, 2],
+        'valor_parcela': [100.0, 200.0],
+        'pago': [False, False],
+        'data_pagamento': pd.to_datetime(pd.Series([None, '2025-02-10']), format='%Y-%m-%d').dt.date,
+        'conta_deposito': ['', ''],
+    })
+    # A tabela editada devolve a data ausente como None; a parcela 2 foi marcada como paga
+    editadas = originais.copy()
+    editadas['data_pagamento'] = [None, date(2025, 2, 10)]
+    editadas.loc[1, 'pago'] = True
+
+    alteradas = parcelas_alteradas(originais, editadas, colunas)
+    assert alteradas['numero_parcela'].tolist() == [2]
+    assert not alteradas[['valor_parcela', 'data_pagamento']].isna().any(axis=None)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from conftest import gravar_cliente
+from exportacao import exportar
+
+
+def test_exporta_todos_os_escritorios(dois_escritorios, tmp_path):
+    matriz, sp = dois_escritorios
+    gravar_cliente(matriz.banco, '0001', 'ANA', [(1, 100.0, '2025-02-01', 0)])
+    gravar_cliente(sp.banco, 'SP0001', 'BRUNO', [(1, 200.0, '2025-02-01', 0), (2, 200.0, '2025-03-01', 1)])
+
+    saida = tmp_path / 'parcelas.csv'
+    assert exportar('parcelas', str(saida), tamanho_lote=1) == 3
+
+    df = pd.read_csv(saida, sep=';', decimal=',', encoding='utf-8-sig', dtype={'codigo_cliente': str})
+    assert list(df.columns[:2]) == ['escritorio', 'codigo_cliente']
+    assert df[['escritorio', 'codigo_cliente']].values.tolist() == [
+        ['MATRIZ', '0001'], ['SÃO PAULO', 'SP0001'], ['SÃO PAULO', 'SP0001']]
+
+
+def test_exporta_parquet_com_a_coluna_do_escritorio(dois_escritorios, tmp_path):
+    matriz, sp = dois_escritorios
+    gravar_cliente(matriz.banco, '0001', 'ANA')
+    gravar_cliente(sp.banco, 'SP0001', 'BRUNO')
+
+    saida = tmp_path / 'clientes.parquet'
+    assert exportar('clientes', str(saida), colunas=['codigo', 'nome']) == 2
+
+    df = pd.read_parquet(saida)
+    assert df.values.tolist() == [['MATRIZ', '0001', 'ANA'], ['SÃO PAULO', 'SP0001', 'BRUNO']]
@@ -0,0 +1,32 @@
+import math
+
+import pytest
+
+from formatacao import formatar_valor, formatar_valores
+
+# Meios centavos exatos (e quase exatos em binário) arredondam para cima nas duas funções
+CASOS = [
+    (0.005, 'R$ 0,01'),
+    (0.015, 'R$ 0,02'),
+    (0.125, 'R$ 0,13'),
+    (1.005, 'R$ 1,01'),
+    (2.675, 'R$ 2,68'),
+    (12.345, 'R$ 12,35'),
+    (1234567.895, 'R$ 1.234.567,90'),
+    (-0.125, 'R$ -0,13'),
+    (-0.004, 'R$ 0,00'),
+    (0.0, 'R$ 0,00'),
+    (1234.5, 'R$ 1.234,50'),
+    (math.nan, ''),
+]
+
+
+@pytest.mark.parametrize('valor, esperado', CASOS)
+def test_formatar_valor(valor, esperado):
+    assert formatar_valor(valor) == esperado
+
+
+def test_formatar_valores_igual_a_formatar_valor():
+    valores = [valor for valor, _ in CASOS]
+    assert formatar_valores(valores).tolist() == [esperado for _, esperado in CASOS]
+    assert formatar_valores(valores).tolist() == [formatar_valor(valor) for valor in valores]
@@ -0,0 +1,21 @@
+from datetime import date
+
+import tarefas
+
+
+class Amanha(date):
+    @classmethod
+    def today(cls):
+        return date.today().fromordinal(date.today().toordinal() + 1)
+
+
+def test_resultado_de_ontem_fica_desatualizado(dois_escritorios, tmp_path, monkeypatch):
+    monkeypatch.setattr(tarefas, 'RELATORIOS_PATH', str(tmp_path / 'relatorios_prontos.db'))
+    monkeypatch.setattr(tarefas.agendador, 'solicitar', lambda nome: None)
+
+    _, _, desatualizado = tarefas.resultado_pronto('parcelas_vencidas')
+    assert not desatualizado
+
+    monkeypatch.setattr(tarefas, 'date', Amanha)
+    _, _, desatualizado = tarefas.resultado_pronto('parcelas_vencidas')
+    assert desatualizado